@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import numpy as np
+
+# LLM scores run from 1 to 5; index 0 stands for "no score" (the data prep
+# fills missing sentiment with 0) and for anything that is not a whole score.
+N_SCORES = 6
+
+# action directions, first axis of the table
+SELL, HOLD, BUY = 0, 1, 2
+
+
+class ActionShaping:
+    """Action multipliers looked up by (direction, sentiment, risk).
+
+    ``table[direction, sentiment, risk]`` is the factor applied to an action
+    of that direction (``SELL``, ``HOLD`` for a zero action, ``BUY``) on a
+    ticker with those LLM scores.  The env turns the scores of every
+    (day, ticker) into flat table offsets once with :meth:`encode`, so shaping
+    a step is one gather and one multiply instead of a set of boolean masks.
+    """
+
+    def __init__(self, table):
+        table = np.asarray(table, dtype=np.float64)
+        if table.shape != (3, N_SCORES, N_SCORES):
+            raise ValueError(
+                f"shaping table must have shape (3, {N_SCORES}, {N_SCORES}), got {table.shape}"
+            )
+        self.table = table
+        self._flat = {}  # action dtype -> flat copy of the table in that dtype
+
+    @classmethod
+    def from_sentiment(
+        cls,
+        strong_mismatch: float,
+        moderate_mismatch: float,
+        strong_match: float,
+        moderate_match: float,
+        neutral: float = 1.0,
+    ) -> ActionShaping:
+        """Sentiment-only shaping as done by the original env variants.
+
+        Buying on a sell sentiment (1, 2) or selling on a buy sentiment
+        (4, 5) is scaled by the ``*_mismatch`` factors, trading along the
+        sentiment by the ``*_match`` factors, and every action on a neutral
+        sentiment (3) by ``neutral``.  The risk score is ignored.
+        """
+        table = np.ones((3, N_SCORES, N_SCORES))
+        table[BUY, 1] = table[SELL, 5] = strong_mismatch
+        table[BUY, 2] = table[SELL, 4] = moderate_mismatch
+        table[SELL, 1] = table[BUY, 5] = strong_match
+        table[SELL, 2] = table[BUY, 4] = moderate_match
+        table[:, 3] = neutral
+        return cls(table)
+
+    @staticmethod
+    def encode(sentiment, risk=None) -> np.ndarray:
+        """Flat table offsets of arrays of (sentiment, risk) scores."""
+
+        def codes(scores):
+            scores = np.asarray(scores, dtype=np.float64)
+            whole = (scores >= 1) & (scores < N_SCORES) & (scores == np.round(scores))
+            return np.where(whole, scores, 0).astype(np.intp)
+
+        offsets = codes(sentiment) * N_SCORES
+        if risk is not None:
+            offsets += codes(risk)
+        return offsets
+
+    def apply(self, actions: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """Scale ``actions`` in place by their factors and return them.
+
+        ``offsets`` come from :meth:`encode` and match ``actions`` in shape.
+        The factors are taken in the dtype of ``actions``, so float32 actions
+        are rounded exactly as ``actions[mask] *= factor`` would round them.
+        """
+        direction = (actions > 0) * BUY + (actions == 0)
+        actions *= self.flat_table(actions.dtype).take(offsets + direction * N_SCORES**2)
+        return actions
+
+    def flat_table(self, dtype) -> np.ndarray:
+        """The table raveled in ``dtype``, as indexed by ``encode`` offsets
+        plus ``direction * N_SCORES**2``."""
+        dtype = np.dtype(dtype)
+        flat = self._flat.get(dtype)
+        if flat is None:
+            flat = self._flat[dtype] = self.table.astype(dtype).ravel()
+        return flat
+
+
+# shaping of the env_stocktrading_<variant>.py envs
+SHAPING_PRESETS = {
+    "llm": ActionShaping.from_sentiment(0.9, 0.95, 1.1, 1.05, neutral=0.98),
+    "llm_risk": ActionShaping.from_sentiment(0.9, 0.95, 1.1, 1.05),
+    "llm_1": ActionShaping.from_sentiment(0.99, 0.995, 1.01, 1.005),
+    "llm_risk_1": ActionShaping.from_sentiment(0.99, 0.995, 1.01, 1.005),
+    "llm_01": ActionShaping.from_sentiment(0.999, 0.9995, 1.001, 1.0005),
+    "llm_risk_01": ActionShaping.from_sentiment(0.999, 0.9995, 1.001, 1.0005),
+    "llama": ActionShaping.from_sentiment(0.99, 0.995, 1.01, 1.005),
+    "llama_risk": ActionShaping.from_sentiment(0.99, 0.995, 1.01, 1.005),
+}
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Compares loading a train/trade dataset from the CSV with loading its
+# columnar copies (see dataset_cache.py): wall time of read_dataset() and the
+# resident memory it adds, each measured in a fresh process.
+#
+#   python dataset_cache.py train_data_deepseek_risk_2013_2018.csv
+#   python dataset_cache.py train_data_deepseek_risk_2013_2018.csv --format parquet
+#   python benchmark_dataset_load.py train_data_deepseek_risk_2013_2018.csv
+#
+# Columnar copies next to the CSV (same name, .arrow / .parquet) are picked up
+# automatically.  With --market the time to build the env's MarketTensor from
+# the loaded frame is included.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+def current_rss_mb():
+    # resident set size of this process, from /proc (Linux)
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def measure(path, market):
+    # runs in the child process
+    import time
+
+    from finrl.config import INDICATORS
+
+    from dataset_cache import SCORE_FILL, read_dataset
+    from market_tensor import MarketTensor
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    df = read_dataset(path)
+    if market:
+        MarketTensor(df, INDICATORS, llm_cols=[col for col in SCORE_FILL if col in df.columns])
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "rss_mb": current_rss_mb() - rss_before, "rows": len(df)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('csv', nargs='?', default='train_data_deepseek_risk_2013_2018.csv')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--market', action='store_true')
+    parser.add_argument('--child', type=str, default=None)  # internal: measure one file
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args.market)))
+        sys.exit()
+
+    stem = os.path.splitext(args.csv)[0]
+    paths = [args.csv] + [stem + ext for ext in (".arrow", ".parquet") if os.path.exists(stem + ext)]
+    for path in paths:
+        runs = []
+        for _ in range(args.repeat):
+            cmd = [sys.executable, __file__, '--child', path] + (['--market'] if args.market else [])
+            runs.append(json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout))
+        best = min(runs, key=lambda run: run["seconds"])
+        print(f"{path}: {os.path.getsize(path) / 2**20:.1f} MB on disk, {best['rows']} rows, "
+              f"load {best['seconds']:.3f}s, +{best['rss_mb']:.1f} MB RSS (best of {args.repeat})")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Measures StockTradingEnv steps/sec with random actions on the training CSV.
+# With --num_envs N the plain env is replaced by BatchedStockTradingEnv and the
+# rate is reported in env-steps/sec (N per step call).
+#
+# --tickers 1,30,100 repeats the measurement on the first 1, 30 and 100
+# tickers of the CSV, and --engine numpy,numba compares the step engines of
+# StockTradingEnv:
+#
+#   python benchmark_env_step.py --tickers 1,30,100 --engine numpy,numba
+#
+# --profile adds the per-call time of the env methods (see env_profiler.py)
+# to the output of StockTradingEnv runs.
+#
+# The script only relies on the env constructor, so "before/after" numbers are
+# obtained by running it from two checkouts, e.g.:
+#
+#   git worktree add /tmp/before <old commit>
+#   python benchmark_env_step.py --csv train_data_deepseek_risk_2013_2018.csv
+#   (cd /tmp/before && python $OLDPWD/benchmark_env_step.py --csv $OLDPWD/train_data_deepseek_risk_2013_2018.csv)
+
+import argparse
+import importlib
+import time
+
+import numpy as np
+from finrl.config import INDICATORS
+
+from dataset_cache import read_dataset
+from env_profiler import MethodProfiler
+
+
+def first_tickers(train, n_tickers):
+    tickers = train["tic"].unique()[:n_tickers]
+    return train[train["tic"].isin(tickers)]
+
+
+def make_env(env_module, train, turbulence_threshold=None, num_envs=None, engine="numpy"):
+    StockTradingEnv = importlib.import_module(env_module).StockTradingEnv
+    if "risk" in env_module:
+        llm_features = 2
+    elif "llm" in env_module or "llama" in env_module:
+        llm_features = 1
+    else:
+        llm_features = 0
+
+    stock_dimension = len(train.tic.unique())
+    state_space = 1 + 2*stock_dimension + (llm_features+len(INDICATORS))*stock_dimension
+    env_kwargs = {
+        "hmax": 100,
+        "initial_amount": 1000000,
+        "num_stock_shares": [0] * stock_dimension,
+        "buy_cost_pct": [0.001] * stock_dimension,
+        "sell_cost_pct": [0.001] * stock_dimension,
+        "state_space": state_space,
+        "stock_dim": stock_dimension,
+        "tech_indicator_list": INDICATORS,
+        "action_space": stock_dimension,
+        "reward_scaling": 1e-4
+    }
+    if num_envs is not None:
+        from env_stocktrading_batched import BatchedStockTradingEnv
+
+        return BatchedStockTradingEnv(
+            df=train,
+            num_envs=num_envs,
+            turbulence_threshold=turbulence_threshold,
+            **env_kwargs,
+        )
+    return StockTradingEnv(
+        df=train, turbulence_threshold=turbulence_threshold, engine=engine, **env_kwargs
+    )
+
+
+def run(env, steps, seed=0):
+    rng = np.random.default_rng(seed)
+    actions = rng.uniform(-1, 1, size=(steps, env.stock_dim)).astype(np.float32)
+    env.reset()
+    start = time.perf_counter()
+    for t in range(steps):
+        _, _, done, _, _ = env.step(actions[t])
+        if done:
+            env.reset()
+    return steps / (time.perf_counter() - start)
+
+
+def run_batched(env, steps, seed=0):
+    rng = np.random.default_rng(seed)
+    actions = rng.uniform(-1, 1, size=(steps, env.num_envs, env.stock_dim)).astype(np.float32)
+    env.reset()
+    start = time.perf_counter()
+    for t in range(steps):
+        env.step(actions[t])  # finished envs reset themselves
+    return steps * env.num_envs / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--csv', type=str, default='train_data_deepseek_risk_2013_2018.csv')
+    parser.add_argument('--env', type=str, default='env_stocktrading_llm_risk')
+    parser.add_argument('--steps', type=int, default=8000)
+    parser.add_argument('--turbulence_threshold', type=float, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--num_envs', type=int, default=None)
+    parser.add_argument('--tickers', type=str, default=None)  # e.g. 1,30,100
+    parser.add_argument('--engine', type=str, default='numpy')  # e.g. numpy,numba
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args()
+
+    train = read_dataset(args.csv)  # .csv, .arrow or .parquet
+    n_tickers = [None] if args.tickers is None else [int(n) for n in args.tickers.split(",")]
+    for n in n_tickers:
+        frame = train if n is None else first_tickers(train, n)
+        for engine in args.engine.split(","):
+            start = time.perf_counter()
+            env = make_env(args.env, frame, args.turbulence_threshold, args.num_envs, engine)
+            print(f"{args.env} [{engine}]: {env.stock_dim} tickers, env built in {time.perf_counter() - start:.2f}s")
+            if args.num_envs is None:
+                run(env, 100)  # warm-up (numba compiles on the first step)
+                profiler = MethodProfiler().attach(env) if args.profile else None
+                rates = [run(env, args.steps, seed) for seed in range(args.repeat)]
+            else:
+                rates = [run_batched(env, args.steps // args.num_envs, seed) for seed in range(args.repeat)]
+            print(f"steps/sec: best {max(rates):.1f}, mean {np.mean(rates):.1f} over {args.repeat} x {args.steps} steps")
+            if args.num_envs is None and args.profile:
+                print(profiler.report())
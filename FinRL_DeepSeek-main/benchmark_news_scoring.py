@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Measures news scoring throughput (rows/sec, tokens/sec) of news_scoring.py
+# against a local stand-in for the DeepInfra OpenAI endpoint, so no API key
+# or money is spent.  The stand-in answers every chat completion after
+# --latency seconds with one score per "### News to Stock Symbol" item of
+# the last message, and fails a --fail-rate fraction of the requests with
+# 429 / 500 to exercise the retries; a --short-rate fraction of the answers
+# leaves out the last score, to exercise the requeues.  Requests are packed
+# with up to --batch_size texts within --token-budget prompt tokens.  A --duplicates fraction of the rows
+# repeats an earlier headline of its stock, as the same summary does on
+# several days of the real dumps; after the concurrency runs the last one is
+# repeated twice with a score cache, the second time scoring from it.
+#
+#   python benchmark_news_scoring.py --rows 2000 --concurrency 1,8,64
+#
+# With --serve it only runs the stand-in, for trying the scripts end to end:
+#
+#   python benchmark_news_scoring.py --serve --port 8000
+#   python sentiment_deepseek_deepinfra.py --input news.csv --base-url http://127.0.0.1:8000/v1
+
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from news_scoring import AsyncScorer, score_csv
+from score_cache import ScoreCache
+
+
+def stand_in_server(port=0, latency=0.5, fail_rate=0.0, short_rate=0.0):
+    """A running OpenAI-compatible chat completions stand-in on 127.0.0.1."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            if random.random() < fail_rate:
+                status, body = random.choice([429, 500]), {"error": {"message": "try again"}}
+            else:
+                last = request["messages"][-1]["content"]
+                # a score per item, derived from its text so reruns agree
+                items = re.findall(r"### News to Stock Symbol -- [^:]*: (.*?)(?= ###|$)", last)
+                scores = [str(1 + sum(map(ord, item)) % 5) for item in items]
+                if len(scores) > 1 and random.random() < short_rate:
+                    scores = scores[:-1]
+                prompt_tokens = sum(len(m["content"]) for m in request["messages"]) // 4
+                status, body = 200, {
+                    "id": "stand-in", "object": "chat.completion", "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": ", ".join(scores)}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 2 * len(items),
+                              "total_tokens": prompt_tokens + 2 * len(items)},
+                }
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 1024  # all connections of a concurrent scorer at once
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            pass  # clients that stopped mid request
+
+    server = Server(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_news(path, rows, duplicates=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    symbols = np.array(["AAPL", "MSFT", "NVDA", "AMZN", "GOOG"])
+    headlines = rng.integers(10**6, size=rows)
+    # a duplicate repeats one of the last 50 headlines (of the same stock, as rows are sorted)
+    repeat = np.flatnonzero(rng.random(rows) < duplicates)
+    repeat = repeat[repeat > 0]
+    headlines[repeat] = headlines[np.maximum(repeat - rng.integers(1, 51, size=len(repeat)), 0)]
+    pd.DataFrame({
+        "Date": pd.date_range("2019-01-01", periods=rows, freq="h").astype(str),
+        "Stock_symbol": np.sort(symbols[rng.integers(len(symbols), size=rows)]),
+        "Lsa_summary": [f"headline {i} about the quarter" for i in headlines],
+    }).to_csv(path, index=False)
+
+
+def conversation(symbol, texts):
+    # the shape of the scripts' prompts, without their few-shot examples
+    text_content = " ".join([f"### News to Stock Symbol -- {symbol}: {text}" for text in texts])
+    return [{"role": "system", "content": f"Score {len(texts)} news from 1 to 5."},
+            {"role": "user", "content": text_content}]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--batch_size', type=int, default=50)
+    parser.add_argument('--token-budget', type=int, default=1000)
+    parser.add_argument('--chunk_size', type=int, default=1000)
+    parser.add_argument('--concurrency', type=str, default="1,8,64")
+    parser.add_argument('--rps', type=float, default=None)
+    parser.add_argument('--latency', type=float, default=0.5)  # seconds per request
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--short-rate', type=float, default=0.0)
+    parser.add_argument('--duplicates', type=float, default=0.2)  # fraction of repeated texts
+    parser.add_argument('--serve', action='store_true')
+    parser.add_argument('--port', type=int, default=0)
+    args = parser.parse_args()
+
+    server = stand_in_server(args.port, args.latency, args.fail_rate, args.short_rate)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    if args.serve:
+        print(f"stand-in OpenAI endpoint at {base_url}", flush=True)
+        threading.Event().wait()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        news = os.path.join(tmp, "news.csv")
+        make_news(news, args.rows, args.duplicates)
+        outputs = []
+        runs = [(int(c), None) for c in args.concurrency.split(",")]
+        cache = os.path.join(tmp, "cache.sqlite")
+        runs += [(runs[-1][0], cache), (runs[-1][0], cache)]
+        for run, (concurrency, cache_path) in enumerate(runs):
+            output = os.path.join(tmp, f"scored_{run}.csv")
+            scorer = AsyncScorer(conversation, "stand-in", api_key="none", base_url=base_url,
+                                 concurrency=concurrency, requests_per_second=args.rps,
+                                 backoff=0.1, token_budget=args.token_budget)
+            start = time.perf_counter()
+            stats = score_csv(news, output, scorer, "sentiment_deepseek",
+                              batch_size=args.batch_size, chunk_size=args.chunk_size,
+                              report_every=float("inf"),
+                              cache=cache_path and ScoreCache(cache_path))
+            label = "cached" if cache_path else "concurrency"
+            print(f"{label:>11} {concurrency:4d}: {time.perf_counter() - start:7.2f} s, "
+                  f"{stats.report()}", flush=True)
+            outputs.append(pd.read_csv(output))
+        for other in outputs[1:]:
+            if args.fail_rate == 0 and not outputs[0].equals(other):
+                raise SystemExit("outputs differ between runs")
+    server.shutdown()
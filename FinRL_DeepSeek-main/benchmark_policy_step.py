@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Time per call of the rollout step of the MLP actor-critic: the generic
+# path (torch.as_tensor + Normal distribution) against policy_step.RolloutStep
+# eager, TorchScript and torch.compile, for a few batch sizes (num_envs).
+#
+#   python benchmark_policy_step.py --stocks 84 --hid 512 --l 2
+#   python benchmark_policy_step.py --batch 1,8,64 --modes eager,script
+
+import argparse
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from finrl.config import INDICATORS
+from torch.distributions.normal import Normal
+
+from policy_step import RolloutStep
+
+
+def mlp(sizes, activation, output_activation=nn.Identity):
+    layers = []
+    for j in range(len(sizes) - 1):
+        act = activation if j < len(sizes) - 2 else output_activation
+        layers += [nn.Linear(sizes[j], sizes[j + 1]), act()]
+    return nn.Sequential(*layers)
+
+
+def generic_step(mu_net, log_std, v_net):
+    # MLPActorCritic.step before policy_step.py
+    def step(obs):
+        with torch.no_grad():
+            obs = torch.as_tensor(obs, dtype=torch.float32)
+            pi = Normal(mu_net(obs), torch.exp(log_std))
+            a = pi.sample()
+            logp_a = pi.log_prob(a).sum(axis=-1)
+            v = torch.squeeze(v_net(obs), -1)
+        return a.numpy(), v.numpy(), logp_a.numpy()
+    return step
+
+
+def time_per_call(step, obs, repeat):
+    for _ in range(20):
+        step(obs)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        step(obs)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stocks', type=int, default=84)
+    parser.add_argument('--hid', type=int, default=512)
+    parser.add_argument('--l', type=int, default=2)
+    parser.add_argument('--batch', type=str, default='1,8,64')
+    parser.add_argument('--modes', type=str, default='eager,script,compile')
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    obs_dim = 1 + 2 * args.stocks + len(INDICATORS) * args.stocks
+    hidden = [args.hid] * args.l
+    mu_net = mlp([obs_dim] + hidden + [args.stocks], nn.Tanh)
+    v_net = mlp([obs_dim] + hidden + [1], nn.Tanh)
+    log_std = nn.Parameter(torch.full((args.stocks,), -0.5))
+
+    steps = {"generic": generic_step(mu_net, log_std, v_net)}
+    for mode in args.modes.split(','):
+        steps[mode] = RolloutStep(mu_net, log_std, v_net, None if mode == "eager" else mode)
+
+    print(f"obs_dim {obs_dim}, hidden {hidden}, {args.threads} thread(s)")
+    for batch in map(int, args.batch.split(',')):
+        obs = np.random.default_rng(0).normal(size=(batch, obs_dim))
+        base = time_per_call(steps["generic"], obs, args.repeat)
+        line = [f"batch {batch:4d}: generic {base * 1e6:8.1f} us"]
+        for name, step in steps.items():
+            if name != "generic":
+                seconds = time_per_call(step, obs, args.repeat)
+                line.append(f"{name} {seconds * 1e6:8.1f} us ({base / seconds:.2f}x)")
+        print("   ".join(line))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Compares the full-batch PPO/CPPO update with the minibatch update
+# (--minibatch_size, see ppo_update.py): runs the training script once per
+# configuration and reports wall time per epoch, the final average EpRet and
+# the policy StopIter, read from the progress.txt files the spinup logger
+# writes.
+#
+#   python benchmark_ppo_update.py --script train_ppo.py --epochs 5 --steps 8000
+#   python benchmark_ppo_update.py --script train_cppo.py --minibatch 512,2048 --grad_accum 1,4
+#
+# Extra arguments after "--" are passed to every run, e.g. "-- --num_envs 8".
+# Under MPI, launch the whole benchmark with mpirun as for the training scripts.
+
+import argparse
+import os
+import subprocess
+import sys
+
+import pandas as pd
+from spinup.utils.run_utils import setup_logger_kwargs
+
+
+def run(script, exp_name, seed, extra):
+    cmd = [sys.executable, script, '--exp_name', exp_name, '--seed', str(seed)] + extra
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    output_dir = setup_logger_kwargs(exp_name, seed)['output_dir']
+    return pd.read_csv(os.path.join(output_dir, 'progress.txt'), sep='\t')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--script', type=str, default='train_ppo.py')
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--steps', type=int, default=8000)
+    parser.add_argument('--seed', '-s', type=int, default=0)
+    parser.add_argument('--minibatch', type=str, default='256')  # minibatch sizes to try
+    parser.add_argument('--update_epochs', type=int, default=10)
+    parser.add_argument('--grad_accum', type=str, default='1')  # accumulation steps to try
+    parser.add_argument('extra_args', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    extra = [a for a in args.extra_args if a != '--']
+    common = ['--epochs', str(args.epochs), '--steps', str(args.steps)] + extra
+    name = os.path.splitext(os.path.basename(args.script))[0]
+    configs = [('full batch', f'{name}_bench_full', [])]
+    for size in args.minibatch.split(','):
+        for accum in args.grad_accum.split(','):
+            configs.append((
+                f'minibatch {size} x{accum}',
+                f'{name}_bench_mb{size}_acc{accum}',
+                ['--minibatch_size', size, '--update_epochs', str(args.update_epochs),
+                 '--grad_accum', accum],
+            ))
+
+    print(f"{args.script}: {args.epochs} epochs x {args.steps} steps {' '.join(extra)}")
+    for label, exp_name, flags in configs:
+        progress = run(args.script, exp_name, args.seed, common + flags)
+        seconds = progress['Time'].diff().fillna(progress['Time']).mean()
+        print(f"{label:<22} {seconds:8.2f} s/epoch   final EpRet {progress['AverageEpRet'].iloc[-1]:10.4f}"
+              f"   StopIter {progress['AverageStopIter'].mean():6.1f}")
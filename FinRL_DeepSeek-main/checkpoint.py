@@ -0,0 +1,120 @@
+"""Training checkpoints for ppo() / cppo().
+
+A checkpoint is a plain dict of state dicts and small values (epoch,
+actor-critic and optimizer states, RNG states, CVaR multipliers) saved with
+``torch.save``.  The env is not part of it: the training scripts rebuild
+it from the market tensor.  :class:`Checkpointer` copies the state on the
+calling thread and writes it on a background thread, to a temporary file
+that is renamed into place, so a run killed mid-write still leaves the
+previous checkpoint intact.
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import glob
+import os
+import random
+import re
+
+import numpy as np
+import torch
+
+from episode_memory import EpisodeWriter
+
+
+def get_rng_state(env=None):
+    """States of the Python, NumPy and torch generators, and of ``env.np_random``."""
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if env is not None and hasattr(env, "np_random"):
+        state["env"] = env.np_random.bit_generator.state
+    return state
+
+
+def set_rng_state(state, env=None):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if env is not None and "env" in state:
+        env.np_random.bit_generator.state = state["env"]
+
+
+def atomic_save(obj, path):
+    """``torch.save`` to ``path`` through a temporary file in the same directory."""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        torch.save(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def keep_progress_log(output_dir, epoch):
+    """
+    Move ``progress.txt`` of an interrupted run aside (spinup's logger
+    truncates it) as ``progress_to_epoch_<epoch>.txt``.
+    """
+    path = os.path.join(output_dir, "progress.txt")
+    if os.path.exists(path):
+        os.replace(path, os.path.join(output_dir, f"progress_to_epoch_{epoch}.txt"))
+
+
+class Checkpointer:
+    """
+    Checkpoints ``checkpoint_<epoch>_<rank>.pt`` in ``directory``, of which
+    the ``keep`` most recent are kept.
+
+    Each MPI rank writes its own file (the RNG states differ between ranks);
+    resume with the same number of processes.
+    """
+
+    _PATTERN = re.compile(r"checkpoint_(\d+)_(\d+)\.pt$")
+
+    def __init__(self, directory, keep=2, rank=0):
+        self.directory = directory
+        self.keep = keep
+        self.rank = rank
+        os.makedirs(directory, exist_ok=True)
+        self._writer = EpisodeWriter(name="checkpoint-writer")
+        atexit.register(self._writer.flush)
+
+    def _path(self, epoch):
+        return os.path.join(self.directory, f"checkpoint_{epoch:05d}_{self.rank}.pt")
+
+    def _epochs(self):
+        epochs = []
+        for path in glob.glob(os.path.join(self.directory, "checkpoint_*.pt")):
+            match = self._PATTERN.search(path)
+            if match and int(match.group(2)) == self.rank:
+                epochs.append(int(match.group(1)))
+        return sorted(epochs)
+
+    def save(self, epoch, **state):
+        """
+        Queue a checkpoint of ``state`` after ``epoch``. The state (state
+        dicts hold references to the live tensors) is copied before this
+        returns, so training can go on while it is written.
+        """
+        snapshot = copy.deepcopy(dict(state, epoch=epoch))
+        self._writer.submit(self._write, epoch, snapshot)
+
+    def _write(self, epoch, snapshot):
+        atomic_save(snapshot, self._path(epoch))
+        for old in self._epochs()[:-self.keep]:
+            os.remove(self._path(old))
+
+    def load(self):
+        """The most recent checkpoint of this rank, or None."""
+        epochs = self._epochs()
+        if not epochs:
+            return None
+        return torch.load(self._path(epochs[-1]), map_location="cpu", weights_only=False)
+
+    def flush(self):
+        """Wait until the queued checkpoints are written."""
+        self._writer.flush()
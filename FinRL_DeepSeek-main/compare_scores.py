@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Agreement of two scorings of the same news, e.g. the DeepSeek scores of
+# sentiment_deepseek_deepinfra.py and those of a local model
+# (local_scoring.py): exact and within-one agreement, mean absolute
+# difference, Pearson / Spearman correlation, quadratic weighted Cohen's
+# kappa and the confusion matrix over the 1 to 5 scale.
+#
+#   python compare_scores.py sentiment_deepseek_nasdaq_news_full.csv sentiment_finbert_nasdaq_news_full.csv
+#
+# Both files are outputs of the scripts for one input, so rows are matched
+# by position; --on Date,Stock_symbol,Lsa_summary matches them by those
+# columns instead.  The score columns default to the last column of each.
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SCALE = np.arange(1, 6)
+
+
+def quadratic_kappa(confusion):
+    """Cohen's kappa of a confusion matrix with quadratic disagreement weights."""
+    confusion = confusion / confusion.sum()
+    k = len(confusion)
+    weights = (np.subtract.outer(np.arange(k), np.arange(k)) / (k - 1)) ** 2
+    expected = np.outer(confusion.sum(axis=1), confusion.sum(axis=0))
+    return 1 - (weights * confusion).sum() / (weights * expected).sum()
+
+
+def agreement(a, b):
+    """
+    Agreement metrics of the scores ``a`` and ``b`` of the same news, over
+    the rows where both are on the scale, and their confusion matrix (rows:
+    ``a``, columns: ``b``).
+    """
+    a = pd.to_numeric(pd.Series(a), errors="coerce").to_numpy(np.float64)
+    b = pd.to_numeric(pd.Series(b), errors="coerce").to_numpy(np.float64)
+    both = np.isin(a, SCALE) & np.isin(b, SCALE)
+    a, b = a[both].astype(int), b[both].astype(int)
+    confusion = np.zeros((len(SCALE), len(SCALE)), dtype=np.int64)
+    np.add.at(confusion, (a - 1, b - 1), 1)
+    metrics = {
+        "rows": len(a),
+        "unmatched": int((~both).sum()),
+        "exact": float(np.mean(a == b)) if len(a) else np.nan,
+        "within_one": float(np.mean(np.abs(a - b) <= 1)) if len(a) else np.nan,
+        "mean_abs_diff": float(np.mean(np.abs(a - b))) if len(a) else np.nan,
+        "mean_diff": float(np.mean(b - a)) if len(a) else np.nan,
+    }
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metrics["pearson"] = pd.Series(a).corr(pd.Series(b))
+        metrics["spearman"] = pd.Series(a).corr(pd.Series(b), method="spearman")
+        metrics["kappa"] = quadratic_kappa(confusion) if len(a) else np.nan
+    table = pd.DataFrame(confusion, index=pd.Index(SCALE, name="a"),
+                         columns=pd.Index(SCALE, name="b"))
+    return metrics, table
+
+
+def read_scores(path, column, on):
+    """The ``column`` (default: the last) of a scores CSV as ``score``, with the ``on`` columns."""
+    header = pd.read_csv(path, nrows=0).columns
+    column = column or header[-1]
+    names = {name.capitalize(): name for name in header}
+    missing = [name for name in on or [] if name not in names]
+    if column not in header or missing:
+        raise SystemExit(f"{path} has no column {column if column not in header else missing}")
+    frame = pd.read_csv(path, usecols=[column] + [names[name] for name in on or []],
+                        on_bad_lines='warn')
+    frame = frame.rename(columns={names[name]: name for name in on or []})
+    return frame.rename(columns={column: "score"}), column
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('a', help='scores CSV, e.g. the DeepSeek scores')
+    parser.add_argument('b', help='scores CSV of the same news, e.g. a local model')
+    parser.add_argument('--column-a', default=None)
+    parser.add_argument('--column-b', default=None)
+    parser.add_argument('--on', default=None, help='comma separated columns to match rows by')
+    parser.add_argument('--by-symbol', action='store_true',
+                        help='also report the agreement of each Stock_symbol')
+    args = parser.parse_args()
+
+    on = [c.strip().capitalize() for c in args.on.split(",")] if args.on else None
+    if args.by_symbol:
+        on_read = sorted(set((on or []) + ["Stock_symbol"]))
+    else:
+        on_read = on
+    a, column_a = read_scores(args.a, args.column_a, on_read)
+    b, column_b = read_scores(args.b, args.column_b, on_read)
+    if on:
+        merged = a.drop_duplicates(on).merge(b.drop_duplicates(on), on=on,
+                                             suffixes=("_a", "_b"))
+    else:
+        if len(a) != len(b):
+            print(f"warning: {len(a)} rows in {args.a}, {len(b)} in {args.b}; "
+                  f"comparing the first {min(len(a), len(b))}")
+        n = min(len(a), len(b))
+        merged = a.iloc[:n].reset_index(drop=True).join(
+            b.iloc[:n].reset_index(drop=True), lsuffix="_a", rsuffix="_b")
+    if args.by_symbol and "Stock_symbol" not in merged:
+        merged["Stock_symbol"] = merged["Stock_symbol_a"]
+    metrics, table = agreement(merged["score_a"], merged["score_b"])
+
+    print(f"a: {args.a} [{column_a}]\nb: {args.b} [{column_b}]")
+    for name, value in metrics.items():
+        print(f"{name:>14}: {value:.4f}" if isinstance(value, float) else f"{name:>14}: {value}")
+    print("\nconfusion (rows: a, columns: b)")
+    print(table.to_string())
+    if args.by_symbol:
+        rows = {symbol: agreement(group["score_a"], group["score_b"])[0]
+                for symbol, group in merged.groupby("Stock_symbol")}
+        print()
+        print(pd.DataFrame(rows).T.to_string(float_format=lambda x: f"{x:.3f}"))
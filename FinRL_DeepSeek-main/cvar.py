@@ -0,0 +1,93 @@
+"""CVaR constraint bookkeeping of the CPPO training scripts.
+
+CPPO compares the CVaR statistic ``d_pi`` (episode return so far plus the
+value of the step, less its reward; weighted by the LLM risk factor in the
+LLM variants) of every step with the threshold ``nu``.  Steps below it are
+"bad": their advantage is lowered by a penalty proportional to the CVaR
+multiplier ``cvarlam`` and clipped to a fraction of ``|v|``.  After each
+epoch ``nu`` moves to the (delayed) mean ``d_pi`` of the epoch, and before
+each epoch ``cvarlam`` moves by ``lam_lr * (beta - nu)``.
+
+:class:`CVaRTracker` does this on arrays: the penalties of any batch of
+steps (one step, one trajectory, or all timesteps of all envs of an epoch)
+in one call, with the counts the multiplier updates need accumulated on the
+side.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+class CVaRTracker:
+    """
+    The multipliers ``nu`` and ``cvarlam`` of a CPPO run and the step counts
+    of the current epoch. Per epoch::
+
+        cvar.start_epoch()
+        penalties = cvar.penalties(d_pi, v)   # any number of calls
+        cvar.end_epoch()
+        cvar.log_tabular(logger)
+    """
+
+    def __init__(self, alpha=0.85, beta=3000.0, lam_lr=5e-4, nu_start=0.1, lam_start=0.01,
+                 nu_delay=0.75, delay=1.0, cvar_clip_ratio=0.05):
+        self.alpha = alpha
+        self.beta = beta
+        self.lam_lr = lam_lr
+        self.nu_delay = nu_delay
+        self.delay = delay
+        self.cvar_clip_ratio = cvar_clip_ratio
+        self.nu = nu_start
+        self.cvarlam = lam_start
+        self._reset_counts()
+
+    def _reset_counts(self):
+        self.trajectory_num = 0      # steps seen this epoch
+        self.bad_trajectory_num = 0  # of which d_pi < nu
+        self.update_num = 0          # of which the penalty was clipped
+        self.nu_delta = 0.0          # sum of d_pi
+
+    def start_epoch(self):
+        """Advance ``cvarlam`` for the coming epoch and reset the counts."""
+        # nu = nu + nu_lr * cvarlam
+        self.cvarlam = self.cvarlam + self.lam_lr * (self.beta - self.nu)
+        self._reset_counts()
+
+    def penalties(self, d_pi, v):
+        """
+        The advantage penalties (float32, shaped like ``d_pi``) of steps with
+        CVaR statistics ``d_pi`` and values ``v``, under the current
+        multipliers.
+        """
+        d_pi = np.asarray(d_pi)
+        v = np.asarray(v)
+        self.trajectory_num += d_pi.size
+        self.nu_delta += d_pi.sum()
+        bad = d_pi < self.nu
+        self.bad_trajectory_num += int(bad.sum())
+        updates = np.where(bad, self.delay * self.cvarlam / (1 - self.alpha) * (self.nu - d_pi), 0.0)
+        limit = abs(v) * self.cvar_clip_ratio
+        clipped = bad & (updates > limit)
+        self.update_num += int(clipped.sum())
+        return np.where(clipped, limit, updates).astype(np.float32)
+
+    def end_epoch(self):
+        """Move ``nu`` to the delayed mean ``d_pi`` of the epoch."""
+        mean = self.nu_delta / self.trajectory_num if self.trajectory_num > 0 else 0.0
+        self.nu = float(mean * self.nu_delay)
+
+    def log_tabular(self, logger):
+        """The epoch's CVaR fields, for an ``EpochLogger`` row."""
+        logger.log_tabular('BadTrajFrac', self.bad_trajectory_num / max(self.trajectory_num, 1))
+        logger.log_tabular('BadTrajNum', self.bad_trajectory_num)
+        logger.log_tabular('CVaRUpdates', self.update_num)
+        logger.log_tabular('Nu', self.nu)
+        logger.log_tabular('Lambda', self.cvarlam)
+
+    def state_dict(self):
+        return dict(nu=self.nu, cvarlam=self.cvarlam)
+
+    def load_state_dict(self, state):
+        self.nu = state['nu']
+        self.cvarlam = state['cvarlam']
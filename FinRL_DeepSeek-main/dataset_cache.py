@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Columnar copies of the train/trade CSVs written by train_trade_data_*.py.
+#
+# export_dataset() stores a prepared frame as Arrow IPC (".arrow", read back
+# memory-mapped) or Parquet (".parquet") with explicit column types:
+# float32 prices and indicators, int8 LLM scores, dictionary-encoded tickers
+# and date32 dates.  read_dataset() returns the day-indexed frame the envs
+# take, from either format or from the original CSV.
+#
+# Convert an existing CSV:
+#
+#   python dataset_cache.py train_data_deepseek_risk_2013_2018.csv
+#   python dataset_cache.py trade_data_deepseek_risk_2019_2023.csv --format parquet
+
+from __future__ import annotations
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# LLM score columns and the value their missing scores get in the envs:
+# 0 is outside the sentiment scale (1 to 5), 3 is the neutral risk
+SCORE_FILL = {"llm_sentiment": 0, "llm_risk": 3}
+
+COLUMNAR_FORMATS = {".arrow": "arrow", ".feather": "arrow", ".parquet": "parquet"}
+
+
+def _format_of(path, format=None):
+    if format is not None:
+        return format
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext not in COLUMNAR_FORMATS:
+        raise ValueError(f"unknown dataset format for {path!r}, use .csv, .arrow or .parquet")
+    return COLUMNAR_FORMATS[ext]
+
+
+def export_dataset(df: pd.DataFrame, path: str, format: str | None = None):
+    """Write ``df`` (a train/trade frame) to ``path`` as Arrow IPC or Parquet.
+
+    The day index and the ``Unnamed: 0`` column of a re-read CSV are not
+    stored, since :func:`read_dataset` rebuilds the day index from the dates.
+    Features are rounded to float32.  LLM scores must be whole numbers; a
+    missing score stays missing.
+    """
+    import pyarrow as pa
+
+    format = _format_of(path, format)
+    df = df.drop(columns=["Unnamed: 0"], errors="ignore").reset_index(drop=True)
+
+    columns = {
+        "date": pa.array(pd.to_datetime(df["date"]).dt.date, type=pa.date32()),
+        "tic": pa.DictionaryArray.from_pandas(df["tic"].astype("category")),
+    }
+    for col in df.columns.drop(["date", "tic"]):
+        values = df[col].to_numpy(dtype=np.float64)
+        if col in SCORE_FILL:
+            known = ~np.isnan(values)
+            if (values[known] != np.round(values[known])).any():
+                raise ValueError(f"{col} has scores that are not whole numbers")
+            columns[col] = pa.array(
+                np.where(known, values, 0).astype(np.int8), mask=~known
+            )
+        else:
+            columns[col] = pa.array(values.astype(np.float32))
+    table = pa.table(columns)
+
+    if format == "arrow":
+        # uncompressed, so that read_dataset can map the buffers as they are
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    elif format == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path)
+    else:
+        raise ValueError(f"unknown columnar format {format!r}, use 'arrow' or 'parquet'")
+
+
+def index_by_day(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` (a frame read from a train/trade CSV) indexed by day number,
+    the same preparation as in the train_*.py scripts."""
+    if "Unnamed: 0" in df.columns:
+        df = df.drop("Unnamed: 0", axis=1)
+    unique_dates = df["date"].unique()
+    date_to_idx = {date: idx for idx, date in enumerate(unique_dates)}
+    df["new_idx"] = df["date"].map(date_to_idx)
+    return df.set_index("new_idx")
+
+
+def _read_csv(path):
+    return index_by_day(pd.read_csv(path))
+
+
+def _read_columnar(path, format):
+    import pyarrow as pa
+
+    if format == "arrow":
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    else:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, memory_map=True)
+    # dates become "YYYY-MM-DD" strings as in the CSVs, one per day
+    dates, day = np.unique(table.column("date").to_numpy(), return_inverse=True)
+    df = table.drop_columns(["date"]).to_pandas(split_blocks=True)
+    df.insert(0, "date", pd.Categorical.from_codes(day, dates.astype(str)))
+    df.index = pd.Index(day, name="new_idx")
+    return df
+
+
+def read_dataset(path: str, fill_scores: bool = True) -> pd.DataFrame:
+    """Day-indexed env frame from a ``.csv``, ``.arrow`` or ``.parquet`` file.
+
+    ``.arrow`` files are memory-mapped: the numeric columns are views of the
+    mapped file rather than copies.  With ``fill_scores`` missing LLM scores
+    are filled as in the training scripts (see ``SCORE_FILL``).
+    """
+    format = _format_of(path)
+    df = _read_csv(path) if format == "csv" else _read_columnar(path, format)
+    if fill_scores:
+        for col, value in SCORE_FILL.items():
+            if col in df.columns and df[col].isna().any():
+                df[col] = df[col].fillna(value)
+                if format != "csv":
+                    df[col] = df[col].astype(np.int8)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('csv', nargs='+')
+    parser.add_argument('--format', type=str, default='arrow')  # arrow or parquet
+    args = parser.parse_args()
+
+    extension = {"arrow": ".arrow", "parquet": ".parquet"}[args.format]
+    for csv_path in args.csv:
+        out_path = os.path.splitext(csv_path)[0] + extension
+        export_dataset(pd.read_csv(csv_path, index_col=0), out_path, args.format)
+        print(f"{csv_path} -> {out_path} ({os.path.getsize(out_path) / 2**20:.1f} MB)")
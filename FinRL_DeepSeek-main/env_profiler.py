@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import time
+from functools import wraps
+
+# StockTradingEnv methods timed when no list is given
+ENV_METHODS = (
+    "step",
+    "reset",
+    "_update_state",
+    "_get_total_asset",
+    "_get_date",
+    "_save_episode",
+)
+
+
+class MethodProfiler:
+    """Per-call wall time of the methods of one object (an env).
+
+    ``attach(obj)`` shadows each method with a timing wrapper stored on the
+    instance, so calls made by the object itself (``self._update_state()``
+    from ``step``) are counted too and nothing changes for other instances.
+    Nested methods are included in the time of their callers.  ``detach()``
+    restores the plain methods.
+
+        profiler = MethodProfiler().attach(env)
+        ...  # run the env
+        print(profiler.report())
+    """
+
+    def __init__(self, methods=ENV_METHODS):
+        self.methods = tuple(methods)
+        self.calls = {}
+        self.seconds = {}
+        self._attached = []
+
+    def attach(self, obj) -> MethodProfiler:
+        for name in self.methods:
+            method = getattr(obj, name, None)
+            if method is None:
+                continue
+            self.calls.setdefault(name, 0)
+            self.seconds.setdefault(name, 0.0)
+            setattr(obj, name, self._timed(name, method))
+            self._attached.append((obj, name))
+        return self
+
+    def detach(self):
+        for obj, name in self._attached:
+            obj.__dict__.pop(name, None)
+        self._attached = []
+
+    def _timed(self, name, method):
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+                self.calls[name] += 1
+
+        return timed
+
+    def reset(self):
+        for name in self.calls:
+            self.calls[name] = 0
+            self.seconds[name] = 0.0
+
+    def report(self) -> str:
+        """One line per called method: calls, total time and time per call."""
+        lines = [f"{'method':<20}{'calls':>10}{'total s':>10}{'us/call':>10}"]
+        for name in sorted(self.seconds, key=self.seconds.get, reverse=True):
+            calls = self.calls[name]
+            if calls:
+                seconds = self.seconds[name]
+                lines.append(
+                    f"{name:<20}{calls:>10}{seconds:>10.3f}{seconds / calls * 1e6:>10.1f}"
+                )
+        return "\n".join(lines)
@@ -1,23 +1,62 @@
 from __future__ import annotations
 
+import warnings
 from typing import List
 
 import gymnasium as gym
 import matplotlib
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from gymnasium import spaces
 from gymnasium.utils import seeding
 from stable_baselines3.common.vec_env import DummyVecEnv
 
+from episode_memory import (
+    EpisodeMemory,
+    episode_tables,
+    get_writer,
+    plot_account_value,
+    write_episode,
+)
+from execution import execute_orders, total_asset
+from execution_numba import NUMBA_AVAILABLE, step_orders_numba
+from market_tensor import MarketTensor
+
 matplotlib.use("Agg")
 
 # from stable_baselines3.common.logger import Logger, KVWriter, CSVOutputFormat
 
 
 class StockTradingEnv(gym.Env):
-    """A stock trading environment for OpenAI gym"""
+    """A stock trading environment for OpenAI gym
+
+    With ``llm_sentiment_col`` / ``llm_risk_col`` the LLM scores are appended
+    to the state, and ``action_shaping`` (an ``ActionShaping`` table) scales
+    the actions by those scores before they are executed.  The
+    ``env_stocktrading_<variant>.py`` modules are this env with the columns
+    and shaping of each variant filled in.
+
+    ``engine="numba"`` runs the trading part of ``step`` as compiled kernels
+    (see ``execution_numba.py``); it falls back to the NumPy path when numba
+    is not installed.
+
+    The per-step record of the episode (``asset_memory``, ``rewards_memory``,
+    ``actions_memory``, ``state_memory``, ``date_memory``) is kept in
+    preallocated arrays (see ``episode_memory.py``) and read back as arrays.
+    ``keep_state_memory=False`` skips the copy of the full state every step.
+    At the end of an episode with ``model_name`` and ``mode`` set, the
+    actions, account value and rewards are written as ``log_format``
+    ("parquet" or "npz") files with a plot of the account value, on a
+    background thread; ``plot_account_value()`` draws the plot on demand.
+
+    The state is one array updated in place from step to step; ``step`` and
+    ``reset`` return a copy of it, so an observation the caller keeps does
+    not change with the env.
+
+    ``market`` is a prebuilt ``MarketTensor`` (e.g. memory-mapped with
+    ``MarketTensor.attach``) to use instead of one built from ``df``; ``df``
+    may then be ``None``.
+    """
 
     metadata = {"render.modes": ["human"]}
 
@@ -44,6 +83,13 @@ class StockTradingEnv(gym.Env):
         model_name="",
         mode="",
         iteration="",
+        llm_sentiment_col=None,
+        llm_risk_col=None,
+        action_shaping=None,
+        engine="numpy",
+        keep_state_memory=True,
+        log_format="parquet",
+        market: MarketTensor | None = None,
     ):
         self.day = day
         self.df = df
@@ -51,8 +97,8 @@ class StockTradingEnv(gym.Env):
         self.hmax = hmax
         self.num_stock_shares = num_stock_shares
         self.initial_amount = initial_amount  # get the initial cash
-        self.buy_cost_pct = buy_cost_pct
-        self.sell_cost_pct = sell_cost_pct
+        self.buy_cost_pct = np.asarray(buy_cost_pct, dtype=np.float64)
+        self.sell_cost_pct = np.asarray(sell_cost_pct, dtype=np.float64)
         self.reward_scaling = reward_scaling
         self.state_space = state_space
         self.action_space = action_space
@@ -61,12 +107,48 @@ class StockTradingEnv(gym.Env):
         self.observation_space = spaces.Box(
             low=-np.inf, high=np.inf, shape=(self.state_space,)
         )
-        self.data = self.df.loc[self.day, :]
         self.terminal = False
         self.make_plots = make_plots
         self.print_verbosity = print_verbosity
         self.turbulence_threshold = turbulence_threshold
         self.risk_indicator_col = risk_indicator_col
+        self.llm_sentiment_col = llm_sentiment_col
+        self.llm_risk_col = llm_risk_col
+        self.action_shaping = action_shaping
+        if engine not in ("numpy", "numba"):
+            raise ValueError(f"unknown engine {engine!r}, use 'numpy' or 'numba'")
+        if engine == "numba" and not NUMBA_AVAILABLE:
+            warnings.warn("numba is not installed, StockTradingEnv uses the NumPy engine")
+            engine = "numpy"
+        self.engine = engine
+        if log_format not in ("parquet", "npz"):
+            raise ValueError(f"unknown log format {log_format!r}, use 'parquet' or 'npz'")
+        if log_format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                warnings.warn("pyarrow is not installed, StockTradingEnv logs to npz")
+                log_format = "npz"
+        self.log_format = log_format
+        # dense copy of the columns used in step(), shared by the envs built
+        # on the same DataFrame
+        llm_cols = [col for col in (llm_sentiment_col, llm_risk_col) if col is not None]
+        used_risk_col = risk_indicator_col if turbulence_threshold is not None else None
+        if market is None:
+            market = MarketTensor.shared(
+                self.df, self.tech_indicator_list, llm_cols, used_risk_col
+            )
+        else:
+            market.check_columns(self.tech_indicator_list, llm_cols, used_risk_col)
+        self.market = market
+        if action_shaping is not None:
+            if llm_sentiment_col is None:
+                raise ValueError("action_shaping needs llm_sentiment_col")
+            # (day, ticker) -> offset into the shaping table
+            self._shaping_offsets = action_shaping.encode(
+                self.market.column(slice(None), llm_sentiment_col),
+                None if llm_risk_col is None else self.market.column(slice(None), llm_risk_col),
+            )
         self.initial = initial
         self.previous_state = previous_state
         self.model_name = model_name
@@ -81,214 +163,112 @@ class StockTradingEnv(gym.Env):
         self.cost = 0
         self.trades = 0
         self.episode = 0
-        # memorize all the total balance change
-        self.asset_memory = [
+        # memorize all the total balance change, one slot per trading day
+        self.memory = EpisodeMemory(
+            self.market.n_days,
+            self.stock_dim,
+            len(self.state),
+            keep_states=keep_state_memory,
+        )
+        # the initial total asset is calculated by cash + sum (num_share_stock_i * price_stock_i)
+        self.memory.reset(
             self.initial_amount
             + np.sum(
                 np.array(self.num_stock_shares)
                 * np.array(self.state[1 : 1 + self.stock_dim])
-            )
-        ]  # the initial total asset is calculated by cash + sum (num_share_stock_i * price_stock_i)
-        self.rewards_memory = []
-        self.actions_memory = []
-        self.state_memory = (
-            []
-        )  # we need sometimes to preserve the state in the middle of trading process
-        self.date_memory = [self._get_date()]
+            ),
+            self.day,
+        )
         #         self.logger = Logger('results',[CSVOutputFormat])
         # self.reset()
         self.seed()
 
-    def _sell_stock(self, index, action):
-        def _do_sell_normal():
-            if (
-                self.state[index + 2 * self.stock_dim + 1] != True
-            ):  # check if the stock is able to sell, for simlicity we just add it in techical index
-                # if self.state[index + 1] > 0: # if we use price<0 to denote a stock is unable to trade in that day, the total asset calculation may be wrong for the price is unreasonable
-                # Sell only if the price is > 0 (no missing data in this particular date)
-                # perform sell action based on the sign of the action
-                if self.state[index + self.stock_dim + 1] > 0:
-                    # Sell only if current asset is > 0
-                    sell_num_shares = min(
-                        abs(action), self.state[index + self.stock_dim + 1]
-                    )
-                    sell_amount = (
-                        self.state[index + 1]
-                        * sell_num_shares
-                        * (1 - self.sell_cost_pct[index])
-                    )
-                    # update balance
-                    self.state[0] += sell_amount
-
-                    self.state[index + self.stock_dim + 1] -= sell_num_shares
-                    self.cost += (
-                        self.state[index + 1]
-                        * sell_num_shares
-                        * self.sell_cost_pct[index]
-                    )
-                    self.trades += 1
-                else:
-                    sell_num_shares = 0
-            else:
-                sell_num_shares = 0
-
-            return sell_num_shares
-
-        # perform sell action based on the sign of the action
-        if self.turbulence_threshold is not None:
-            if self.turbulence >= self.turbulence_threshold:
-                if self.state[index + 1] > 0:
-                    # Sell only if the price is > 0 (no missing data in this particular date)
-                    # if turbulence goes over threshold, just clear out all positions
-                    if self.state[index + self.stock_dim + 1] > 0:
-                        # Sell only if current asset is > 0
-                        sell_num_shares = self.state[index + self.stock_dim + 1]
-                        sell_amount = (
-                            self.state[index + 1]
-                            * sell_num_shares
-                            * (1 - self.sell_cost_pct[index])
-                        )
-                        # update balance
-                        self.state[0] += sell_amount
-                        self.state[index + self.stock_dim + 1] = 0
-                        self.cost += (
-                            self.state[index + 1]
-                            * sell_num_shares
-                            * self.sell_cost_pct[index]
-                        )
-                        self.trades += 1
-                    else:
-                        sell_num_shares = 0
-                else:
-                    sell_num_shares = 0
-            else:
-                sell_num_shares = _do_sell_normal()
-        else:
-            sell_num_shares = _do_sell_normal()
-
-        return sell_num_shares
-
-    def _buy_stock(self, index, action):
-        def _do_buy():
-            if (
-                self.state[index + 2 * self.stock_dim + 1] != True
-            ):  # check if the stock is able to buy
-                # if self.state[index + 1] >0:
-                # Buy only if the price is > 0 (no missing data in this particular date)
-                available_amount = self.state[0] // (
-                    self.state[index + 1] * (1 + self.buy_cost_pct[index])
-                )  # when buying stocks, we should consider the cost of trading when calculating available_amount, or we may be have cash<0
-                # print('available_amount:{}'.format(available_amount))
-
-                # update balance
-                buy_num_shares = min(available_amount, action)
-                buy_amount = (
-                    self.state[index + 1]
-                    * buy_num_shares
-                    * (1 + self.buy_cost_pct[index])
-                )
-                self.state[0] -= buy_amount
+    def _get_total_asset(self):
+        return total_asset(self.state, self.stock_dim)
 
-                self.state[index + self.stock_dim + 1] += buy_num_shares
+    @property
+    def asset_memory(self):
+        return self.memory.assets
 
-                self.cost += (
-                    self.state[index + 1] * buy_num_shares * self.buy_cost_pct[index]
-                )
-                self.trades += 1
-            else:
-                buy_num_shares = 0
+    @property
+    def rewards_memory(self):
+        return self.memory.rewards
 
-            return buy_num_shares
+    @property
+    def actions_memory(self):
+        return self.memory.actions
 
-        # perform buy action based on the sign of the action
-        if self.turbulence_threshold is None:
-            buy_num_shares = _do_buy()
-        else:
-            if self.turbulence < self.turbulence_threshold:
-                buy_num_shares = _do_buy()
-            else:
-                buy_num_shares = 0
-                pass
+    @property
+    def state_memory(self):
+        # we need sometimes to preserve the state in the middle of trading process
+        return self.memory.states
 
-        return buy_num_shares
+    @property
+    def date_memory(self):
+        return self.market.dates[self.memory.days]
 
     def _make_plot(self):
-        plt.plot(self.asset_memory, "r")
-        plt.savefig(f"results/account_value_trade_{self.episode}.png")
-        plt.close()
+        get_writer().submit(
+            plot_account_value,
+            self.asset_memory.copy(),
+            f"results/account_value_trade_{self.episode}.png",
+        )
+
+    def plot_account_value(self, path=None):
+        """Plot the account value of the current episode now; to ``path`` or
+        the ``results/account_value_<mode>_<model>_<iteration>.png`` file."""
+        if path is None:
+            path = "results/account_value_{}_{}_{}.png".format(
+                self.mode, self.model_name, self.iteration
+            )
+        plot_account_value(self.asset_memory, path)
+
+    def _save_episode(self):
+        # copies are taken here, the files are written by the writer thread
+        get_writer().submit(
+            write_episode,
+            "results/{}_" + "{}_{}_{}".format(self.mode, self.model_name, self.iteration),
+            episode_tables(
+                self.date_memory,
+                self.asset_memory.copy(),
+                self.rewards_memory.copy(),
+                self.actions_memory.copy(),
+                self.market.tickers,
+            ),
+            self.asset_memory.copy(),
+            self.log_format,
+        )
 
     def step(self, actions):
-        self.terminal = self.day >= len(self.df.index.unique()) - 1
+        self.terminal = self.day >= self.market.n_days - 1
         if self.terminal:
             # print(f"Episode: {self.episode}")
             if self.make_plots:
                 self._make_plot()
-            end_total_asset = self.state[0] + sum(
-                np.array(self.state[1 : (self.stock_dim + 1)])
-                * np.array(self.state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)])
-            )
-            df_total_value = pd.DataFrame(self.asset_memory)
+            end_total_asset = self._get_total_asset()
             tot_reward = (
-                self.state[0]
-                + sum(
-                    np.array(self.state[1 : (self.stock_dim + 1)])
-                    * np.array(
-                        self.state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)]
-                    )
-                )
-                - self.asset_memory[0]
+                end_total_asset - self.asset_memory[0]
             )  # initial_amount is only cash part of our initial asset
-            df_total_value.columns = ["account_value"]
-            df_total_value["date"] = self.date_memory
-            df_total_value["daily_return"] = df_total_value["account_value"].pct_change(
-                1
-            )
-            if df_total_value["daily_return"].std() != 0:
-                sharpe = (
-                    (252**0.5)
-                    * df_total_value["daily_return"].mean()
-                    / df_total_value["daily_return"].std()
-                )
-            df_rewards = pd.DataFrame(self.rewards_memory)
-            df_rewards.columns = ["account_rewards"]
-            df_rewards["date"] = self.date_memory[:-1]
             if self.episode % self.print_verbosity == 0:
+                asset_memory = self.asset_memory
+                daily_return = asset_memory[1:] / asset_memory[:-1] - 1
+                daily_return_std = (
+                    daily_return.std(ddof=1) if len(daily_return) > 1 else np.nan
+                )
+                if daily_return_std != 0:
+                    sharpe = (252**0.5) * daily_return.mean() / daily_return_std
                 print(f"day: {self.day}, episode: {self.episode}")
                 print(f"begin_total_asset: {self.asset_memory[0]:0.2f}")
                 print(f"end_total_asset: {end_total_asset:0.2f}")
                 print(f"total_reward: {tot_reward:0.2f}")
                 print(f"total_cost: {self.cost:0.2f}")
                 print(f"total_trades: {self.trades}")
-                if df_total_value["daily_return"].std() != 0:
+                if daily_return_std != 0:
                     print(f"Sharpe: {sharpe:0.3f}")
                 print("=================================")
 
             if (self.model_name != "") and (self.mode != ""):
-                df_actions = self.save_action_memory()
-                df_actions.to_csv(
-                    "results/actions_{}_{}_{}.csv".format(
-                        self.mode, self.model_name, self.iteration
-                    )
-                )
-                df_total_value.to_csv(
-                    "results/account_value_{}_{}_{}.csv".format(
-                        self.mode, self.model_name, self.iteration
-                    ),
-                    index=False,
-                )
-                df_rewards.to_csv(
-                    "results/account_rewards_{}_{}_{}.csv".format(
-                        self.mode, self.model_name, self.iteration
-                    ),
-                    index=False,
-                )
-                plt.plot(self.asset_memory, "r")
-                plt.savefig(
-                    "results/account_value_{}_{}_{}.png".format(
-                        self.mode, self.model_name, self.iteration
-                    )
-                )
-                plt.close()
+                self._save_episode()
 
             # Add outputs to logger interface
             # logger.record("environment/portfolio_value", end_total_asset)
@@ -297,63 +277,86 @@ class StockTradingEnv(gym.Env):
             # logger.record("environment/total_cost", self.cost)
             # logger.record("environment/total_trades", self.trades)
 
-            return self.state, self.reward, self.terminal, False, {}
+            return self.state.copy(), self.reward, self.terminal, False, {}
+
+        elif self.engine == "numba":
+            liquidate = bool(
+                self.turbulence_threshold is not None
+                and self.turbulence >= self.turbulence_threshold
+            )
+            # shaping, liquidation, orders and the move to day + 1 in one
+            # compiled call, same trades as the NumPy branch below
+            actions, self.cost, trades, begin_total_asset, end_total_asset = (
+                step_orders_numba(
+                    self.state,
+                    actions,
+                    self.hmax,
+                    self.action_shaping,
+                    (
+                        self._shaping_offsets[self.day]
+                        if self.action_shaping is not None
+                        else None
+                    ),
+                    liquidate,
+                    self.buy_cost_pct,
+                    self.sell_cost_pct,
+                    self.cost,
+                    self.market.close(self.day + 1),
+                    self.market.obs_features(self.day + 1),
+                )
+            )
+            self.trades += trades
+            self.day += 1
+            if self.turbulence_threshold is not None:
+                self.turbulence = self.market.turbulence[self.day]
 
         else:
+            if self.action_shaping is not None:
+                # scale by the LLM scores of the day; in place, as the variant
+                # envs always did
+                actions = self.action_shaping.apply(
+                    actions, self._shaping_offsets[self.day]
+                )
             actions = actions * self.hmax  # actions initially is scaled between 0 to 1
             actions = actions.astype(
                 int
             )  # convert into integer because we can't by fraction of shares
-            if self.turbulence_threshold is not None:
-                if self.turbulence >= self.turbulence_threshold:
-                    actions = np.array([-self.hmax] * self.stock_dim)
-            begin_total_asset = self.state[0] + sum(
-                np.array(self.state[1 : (self.stock_dim + 1)])
-                * np.array(self.state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)])
+            liquidate = (
+                self.turbulence_threshold is not None
+                and self.turbulence >= self.turbulence_threshold
             )
+            if liquidate:
+                actions = np.array([-self.hmax] * self.stock_dim)
+            begin_total_asset = self._get_total_asset()
             # print("begin_total_asset:{}".format(begin_total_asset))
 
-            argsort_actions = np.argsort(actions)
-            sell_index = argsort_actions[: np.where(actions < 0)[0].shape[0]]
-            buy_index = argsort_actions[::-1][: np.where(actions > 0)[0].shape[0]]
-
-            for index in sell_index:
-                # print(f"Num shares before: {self.state[index+self.stock_dim+1]}")
-                # print(f'take sell action before : {actions[index]}')
-                actions[index] = self._sell_stock(index, actions[index]) * (-1)
-                # print(f'take sell action after : {actions[index]}')
-                # print(f"Num shares after: {self.state[index+self.stock_dim+1]}")
-
-            for index in buy_index:
-                # print('take buy action: {}'.format(actions[index]))
-                actions[index] = self._buy_stock(index, actions[index])
-
-            self.actions_memory.append(actions)
+            # sells first, then buys with the cash that is left
+            actions, self.cost, trades = execute_orders(
+                self.state,
+                actions,
+                self.buy_cost_pct,
+                self.sell_cost_pct,
+                self.cost,
+                liquidate=liquidate,
+            )
+            self.trades += trades
 
             # state: s -> s+1
             self.day += 1
-            self.data = self.df.loc[self.day, :]
             if self.turbulence_threshold is not None:
-                if len(self.df.tic.unique()) == 1:
-                    self.turbulence = self.data[self.risk_indicator_col]
-                elif len(self.df.tic.unique()) > 1:
-                    self.turbulence = self.data[self.risk_indicator_col].values[0]
+                self.turbulence = self.market.turbulence[self.day]
             self.state = self._update_state()
 
-            end_total_asset = self.state[0] + sum(
-                np.array(self.state[1 : (self.stock_dim + 1)])
-                * np.array(self.state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)])
-            )
-            self.asset_memory.append(end_total_asset)
-            self.date_memory.append(self._get_date())
-            self.reward = end_total_asset - begin_total_asset
-            self.rewards_memory.append(self.reward)
-            self.reward = self.reward * self.reward_scaling
-            self.state_memory.append(
-                self.state
-            )  # add current state in state_recorder for each step
+            end_total_asset = self._get_total_asset()
+
+        self.reward = end_total_asset - begin_total_asset
+        # add the step to the episode record, current state included
+        self.memory.record(
+            actions, self.reward, end_total_asset, self.day, self.state
+        )
+        self.reward = self.reward * self.reward_scaling
 
-        return self.state, self.reward, self.terminal, False, {}
+        return self.state.copy(), self.reward, self.terminal, False, {}
 
     def reset(
         self,
@@ -363,134 +366,67 @@ class StockTradingEnv(gym.Env):
     ):
         # initiate state
         self.day = 0
-        self.data = self.df.loc[self.day, :]
         self.state = self._initiate_state()
 
         if self.initial:
-            self.asset_memory = [
-                self.initial_amount
-                + np.sum(
-                    np.array(self.num_stock_shares)
-                    * np.array(self.state[1 : 1 + self.stock_dim])
-                )
-            ]
+            initial_total_asset = self.initial_amount + np.sum(
+                np.array(self.num_stock_shares)
+                * np.array(self.state[1 : 1 + self.stock_dim])
+            )
         else:
-            previous_total_asset = self.previous_state[0] + sum(
+            initial_total_asset = self.previous_state[0] + sum(
                 np.array(self.state[1 : (self.stock_dim + 1)])
                 * np.array(
                     self.previous_state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)]
                 )
             )
-            self.asset_memory = [previous_total_asset]
+        self.memory.reset(initial_total_asset, self.day)
 
         self.turbulence = 0
         self.cost = 0
         self.trades = 0
         self.terminal = False
         # self.iteration=self.iteration
-        self.rewards_memory = []
-        self.actions_memory = []
-        self.date_memory = [self._get_date()]
 
         self.episode += 1
 
-        return self.state, {}
+        return self.state.copy(), {}
 
     def render(self, mode="human", close=False):
         return self.state
 
     def _initiate_state(self):
+        state = np.zeros(
+            1 + 2 * self.stock_dim + self.market.obs_feature_size, dtype=np.float64
+        )
         if self.initial:
             # For Initial State
-            if len(self.df.tic.unique()) > 1:
-                # for multiple stock
-                state = (
-                    [self.initial_amount]
-                    + self.data.close.values.tolist()
-                    + self.num_stock_shares
-                    + sum(
-                        (
-                            self.data[tech].values.tolist()
-                            for tech in self.tech_indicator_list
-                        ),
-                        [],
-                    )
-                )  # append initial stocks_share to initial state, instead of all zero
-            else:
-                # for single stock
-                state = (
-                    [self.initial_amount]
-                    + [self.data.close]
-                    + [0] * self.stock_dim
-                    + sum(([self.data[tech]] for tech in self.tech_indicator_list), [])
-                )
+            state[0] = self.initial_amount
+            state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)] = self.num_stock_shares
         else:
             # Using Previous State
-            if len(self.df.tic.unique()) > 1:
-                # for multiple stock
-                state = (
-                    [self.previous_state[0]]
-                    + self.data.close.values.tolist()
-                    + self.previous_state[
-                        (self.stock_dim + 1) : (self.stock_dim * 2 + 1)
-                    ]
-                    + sum(
-                        (
-                            self.data[tech].values.tolist()
-                            for tech in self.tech_indicator_list
-                        ),
-                        [],
-                    )
-                )
-            else:
-                # for single stock
-                state = (
-                    [self.previous_state[0]]
-                    + [self.data.close]
-                    + self.previous_state[
-                        (self.stock_dim + 1) : (self.stock_dim * 2 + 1)
-                    ]
-                    + sum(([self.data[tech]] for tech in self.tech_indicator_list), [])
-                )
-        return state
+            state[0] = self.previous_state[0]
+            state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)] = self.previous_state[
+                (self.stock_dim + 1) : (self.stock_dim * 2 + 1)
+            ]
+        self.state = state
+        return self._update_state()
 
     def _update_state(self):
-        if len(self.df.tic.unique()) > 1:
-            # for multiple stock
-            state = (
-                [self.state[0]]
-                + self.data.close.values.tolist()
-                + list(self.state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)])
-                + sum(
-                    (
-                        self.data[tech].values.tolist()
-                        for tech in self.tech_indicator_list
-                    ),
-                    [],
-                )
-            )
-
-        else:
-            # for single stock
-            state = (
-                [self.state[0]]
-                + [self.data.close]
-                + list(self.state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)])
-                + sum(([self.data[tech]] for tech in self.tech_indicator_list), [])
-            )
-
-        return state
+        # cash and holdings are already up to date in self.state, only the
+        # market part of the vector changes from one day to the next
+        self.state[1 : (self.stock_dim + 1)] = self.market.close(self.day)
+        self.state[(self.stock_dim * 2 + 1) :] = self.market.obs_features(self.day)
+        return self.state
 
     def _get_date(self):
-        if len(self.df.tic.unique()) > 1:
-            date = self.data.date.unique()[0]
-        else:
-            date = self.data.date
-        return date
+        return self.market.dates[self.day]
 
    # add save_state_memory to preserve state in the trading process
     def save_state_memory(self):
-        if len(self.df.tic.unique()) > 1:
+        if self.state_memory is None:
+            raise ValueError("state memory is off (keep_state_memory=False)")
+        if self.market.spec.multi_stock:
             # date and close price length must match actions length
             date_list = self.date_memory[:-1]
             df_date = pd.DataFrame(date_list)
@@ -513,7 +449,7 @@ class StockTradingEnv(gym.Env):
             # df_actions = pd.DataFrame({'date':date_list,'actions':action_list})
         else:
             date_list = self.date_memory[:-1]
-            state_list = self.state_memory
+            state_list = list(self.state_memory)
             df_states = pd.DataFrame({"date": date_list, "states": state_list})
         # print(df_states)
         return df_states
@@ -529,7 +465,7 @@ class StockTradingEnv(gym.Env):
         return df_account_value
 
     def save_action_memory(self):
-        if len(self.df.tic.unique()) > 1:
+        if self.market.spec.multi_stock:
             # date and close price length must match actions length
             date_list = self.date_memory[:-1]
             df_date = pd.DataFrame(date_list)
@@ -537,12 +473,12 @@ class StockTradingEnv(gym.Env):
 
             action_list = self.actions_memory
             df_actions = pd.DataFrame(action_list)
-            df_actions.columns = self.data.tic.values
+            df_actions.columns = self.market.tickers
             df_actions.index = df_date.date
             # df_actions = pd.DataFrame({'date':date_list,'actions':action_list})
         else:
             date_list = self.date_memory[:-1]
-            action_list = self.actions_memory
+            action_list = list(self.actions_memory)
             df_actions = pd.DataFrame({"date": date_list, "actions": action_list})
         return df_actions
 
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from gymnasium import spaces
+
+from execution import execute_orders_batch, total_asset
+from market_tensor import MarketTensor
+
+
+class BatchedStockTradingEnv:
+    """N independent portfolios trading the same market in one process.
+
+    Every portfolio follows the rules of ``StockTradingEnv`` (same state
+    layout, order execution, turbulence liquidation and episode semantics:
+    the step taken on the last day only reports ``done``), but the
+    portfolios are rows of one ``(num_envs, state_dim)`` array and share a
+    single ``MarketTensor``.  A rollout therefore needs one policy forward and
+    one ``step`` call per tick for all of them.
+
+    ``reset()`` returns the observations and ``step(actions)`` returns
+    ``(obs, rewards, dones, infos)``, like an SB3 ``VecEnv``, but this is not
+    one: ``infos`` is a single dict of arrays, ``end_total_asset`` and the
+    executed ``actions`` of every portfolio, not a list of per-env dicts.
+    Finished portfolios are reset automatically; on a step where some are
+    done, ``infos["terminal_observation"]`` and
+    ``infos["terminal_total_asset"]`` hold their last observation and
+    account value, one row per done portfolio in the order of
+    ``np.flatnonzero(dones)``.  ``reset(indices)`` resets only some of them
+    (used for ``max_ep_len`` timeouts).
+
+    ``llm_sentiment_col``, ``llm_risk_col``, ``action_shaping`` and ``market``
+    work as in ``StockTradingEnv``.
+
+    With ``random_start`` each episode starts on a random day, so the
+    portfolios spread over different market regimes instead of all walking
+    the same path in lockstep.  Starts are drawn so that at least
+    ``min_episode_len`` trading days are left.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        stock_dim: int,
+        hmax: int,
+        initial_amount: int,
+        num_stock_shares: list[int],
+        buy_cost_pct: list[float],
+        sell_cost_pct: list[float],
+        reward_scaling: float,
+        state_space: int,
+        action_space: int,
+        tech_indicator_list: list[str],
+        num_envs: int = 1,
+        turbulence_threshold=None,
+        risk_indicator_col="turbulence",
+        llm_sentiment_col=None,
+        llm_risk_col=None,
+        action_shaping=None,
+        random_start: bool = False,
+        min_episode_len: int = 1,
+        seed=None,
+        market: MarketTensor | None = None,
+    ):
+        self.num_envs = num_envs
+        self.stock_dim = stock_dim
+        self.hmax = hmax
+        self.initial_amount = initial_amount
+        self.num_stock_shares = np.asarray(num_stock_shares, dtype=np.float64)
+        self.buy_cost_pct = np.asarray(buy_cost_pct, dtype=np.float64)
+        self.sell_cost_pct = np.asarray(sell_cost_pct, dtype=np.float64)
+        self.reward_scaling = reward_scaling
+        self.state_space = state_space
+        self.action_space = spaces.Box(low=-1, high=1, shape=(action_space,))
+        self.observation_space = spaces.Box(
+            low=-np.inf, high=np.inf, shape=(state_space,)
+        )
+        self.tech_indicator_list = tech_indicator_list
+        self.turbulence_threshold = turbulence_threshold
+        self.random_start = random_start
+        self.min_episode_len = min_episode_len
+        # envs built on the same data can share one tensor
+        llm_cols = [col for col in (llm_sentiment_col, llm_risk_col) if col is not None]
+        if turbulence_threshold is None:
+            risk_indicator_col = None
+        if market is None:
+            market = MarketTensor.shared(
+                df, tech_indicator_list, llm_cols, risk_indicator_col
+            )
+        else:
+            market.check_columns(tech_indicator_list, llm_cols, risk_indicator_col)
+        self.market = market
+        self.action_shaping = action_shaping
+        if action_shaping is not None:
+            if llm_sentiment_col is None:
+                raise ValueError("action_shaping needs llm_sentiment_col")
+            # (day, ticker) -> offset into the shaping table
+            self._shaping_offsets = action_shaping.encode(
+                market.column(slice(None), llm_sentiment_col),
+                None if llm_risk_col is None else market.column(slice(None), llm_risk_col),
+            )
+        self.np_random = np.random.default_rng(seed)
+
+        self.state = np.zeros(
+            (num_envs, 1 + 2 * stock_dim + market.obs_feature_size), dtype=np.float64
+        )
+        self.day = np.zeros(num_envs, dtype=np.int64)
+        self.reward = np.zeros(num_envs, dtype=np.float64)
+        self.turbulence = np.zeros(num_envs, dtype=np.float64)
+        self.cost = np.zeros(num_envs, dtype=np.float64)
+        self.trades = np.zeros(num_envs, dtype=np.int64)
+        self.episode = np.zeros(num_envs, dtype=np.int64)
+
+    def _get_total_asset(self):
+        return total_asset(self.state, self.stock_dim)
+
+    def _update_state(self, envs):
+        days = self.day[envs]
+        self.state[envs, 1 : (self.stock_dim + 1)] = self.market.close(days)
+        self.state[envs, (self.stock_dim * 2 + 1) :] = self.market.obs_features(days)
+
+    def _get_obs(self):
+        return self.state.astype(np.float32)
+
+    def reset(self, indices=None):
+        envs = np.arange(self.num_envs) if indices is None else np.asarray(indices)
+        if envs.dtype == bool:
+            envs = np.flatnonzero(envs)
+        if self.random_start:
+            last_start = max(self.market.n_days - 1 - self.min_episode_len, 0)
+            self.day[envs] = self.np_random.integers(0, last_start + 1, size=len(envs))
+        else:
+            self.day[envs] = 0
+        self.state[envs, 0] = self.initial_amount
+        self.state[envs, (self.stock_dim + 1) : (self.stock_dim * 2 + 1)] = (
+            self.num_stock_shares
+        )
+        self._update_state(envs)
+        self.reward[envs] = 0
+        self.turbulence[envs] = 0
+        self.cost[envs] = 0
+        self.trades[envs] = 0
+        self.episode[envs] += 1
+        return self._get_obs()
+
+    def step(self, actions):
+        done = self.day >= self.market.n_days - 1
+        running = ~done
+
+        if self.action_shaping is not None:
+            actions = self.action_shaping.apply(
+                actions, self._shaping_offsets[self.day]
+            )
+        # finished envs do not trade on their last step
+        actions = (np.asarray(actions) * self.hmax).astype(int)
+        actions[done] = 0
+        if self.turbulence_threshold is not None:
+            liquidate = running & (self.turbulence >= self.turbulence_threshold)
+            actions[liquidate] = -self.hmax
+        else:
+            liquidate = np.zeros(self.num_envs, dtype=bool)
+        begin_total_asset = self._get_total_asset()
+
+        actions, self.cost, trades = execute_orders_batch(
+            self.state,
+            actions,
+            self.buy_cost_pct,
+            self.sell_cost_pct,
+            self.cost,
+            liquidate,
+        )
+        self.trades += trades
+
+        # state: s -> s+1
+        envs = np.flatnonzero(running)
+        self.day[envs] += 1
+        if self.turbulence_threshold is not None:
+            self.turbulence[envs] = self.market.turbulence[self.day[envs]]
+        self._update_state(envs)
+
+        end_total_asset = self._get_total_asset()
+        self.reward[envs] = (end_total_asset[envs] - begin_total_asset[envs]) * (
+            self.reward_scaling
+        )
+        rewards = self.reward.copy()
+
+        obs = self._get_obs()
+        infos = {"end_total_asset": end_total_asset, "actions": actions}
+        if done.any():
+            infos["terminal_observation"] = obs[done]
+            infos["terminal_total_asset"] = end_total_asset[done]
+            obs = self.reset(done)
+        return obs, rewards, done, infos
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+import traceback
+
+import numpy as np
+import pandas as pd
+
+
+def _ordered(buffer, n):
+    """First ``n`` entries of a ring buffer, oldest first."""
+    size = len(buffer)
+    if n <= size:
+        return buffer[:n]
+    split = n % size
+    return np.concatenate((buffer[split:], buffer[:split]))
+
+
+class EpisodeMemory:
+    """Preallocated per-step record of one env episode.
+
+    Keeps the account value and day of every visited day, and the reward,
+    executed actions and (unless ``keep_states`` is false) the full state of
+    every step, in ring buffers allocated once per env.  With the default
+    ``capacity`` of one step per trading day an episode always fits; a
+    smaller capacity keeps only the most recent steps.
+
+    The properties return the record oldest first, as arrays; they are views
+    (no copy) as long as the buffers have not wrapped.
+    """
+
+    def __init__(self, capacity, stock_dim, state_dim, keep_states=True):
+        self.capacity = capacity
+        self._assets = np.empty(capacity + 1)
+        self._days = np.empty(capacity + 1, dtype=np.int64)
+        self._rewards = np.empty(capacity)
+        self._actions = np.empty((capacity, stock_dim), dtype=np.int64)
+        self._states = np.empty((capacity, state_dim)) if keep_states else None
+        self.steps = 0
+
+    def reset(self, total_asset, day):
+        self.steps = 0
+        self._assets[0] = total_asset
+        self._days[0] = day
+
+    def record(self, actions, reward, total_asset, day, state):
+        i = self.steps % self.capacity
+        self._actions[i] = actions
+        self._rewards[i] = reward
+        if self._states is not None:
+            self._states[i] = state
+        self.steps += 1
+        j = self.steps % (self.capacity + 1)
+        self._assets[j] = total_asset
+        self._days[j] = day
+
+    @property
+    def keep_states(self):
+        return self._states is not None
+
+    @property
+    def assets(self):
+        return _ordered(self._assets, self.steps + 1)
+
+    @property
+    def days(self):
+        return _ordered(self._days, self.steps + 1)
+
+    @property
+    def rewards(self):
+        return _ordered(self._rewards, self.steps)
+
+    @property
+    def actions(self):
+        return _ordered(self._actions, self.steps)
+
+    @property
+    def states(self):
+        if self._states is None:
+            return None
+        return _ordered(self._states, self.steps)
+
+
+def plot_account_value(account_value, path):
+    """Save a line plot of ``account_value`` to ``path``.
+
+    Uses the object-oriented Matplotlib API (no pyplot state), so it is safe
+    to call from the writer thread.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    fig.add_subplot().plot(account_value, "r")
+    fig.savefig(path)
+
+
+def write_table(df, path_stem, log_format):
+    """Write ``df`` as ``<path_stem>.parquet`` or ``<path_stem>.npz``."""
+    if log_format == "parquet":
+        df.to_parquet(path_stem + ".parquet")
+    elif log_format == "npz":
+        def column(values):
+            # plain string arrays instead of pickled objects (dates, tickers)
+            values = np.asarray(values)
+            return values.astype(str) if values.dtype == object else values
+
+        np.savez(
+            path_stem + ".npz",
+            **{str(col): column(df[col]) for col in df.columns},
+            index=column(df.index),
+        )
+    else:
+        raise ValueError(f"unknown log format {log_format!r}, use 'parquet' or 'npz'")
+
+
+class EpisodeWriter:
+    """Background thread that writes episode artifacts.
+
+    ``submit(func, *args)`` queues a call and returns at once, so the env
+    does not stall on file I/O or plotting at the end of an episode.  Jobs
+    run in order on one daemon thread; a failing job prints its traceback
+    and the thread keeps going.  ``flush()`` waits for the queued jobs.
+    """
+
+    def __init__(self, name="episode-writer"):
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            func, args = self._jobs.get()
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self._jobs.task_done()
+
+    def submit(self, func, *args):
+        self._jobs.put((func, args))
+
+    def flush(self):
+        self._jobs.join()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Process-wide ``EpisodeWriter``, started on first use and flushed at exit."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = EpisodeWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def write_episode(path_stem, tables, account_value, log_format):
+    """Write the episode ``tables`` ({suffix: DataFrame}) and the account value plot."""
+    os.makedirs(os.path.dirname(path_stem) or ".", exist_ok=True)
+    for name, df in tables.items():
+        write_table(df, path_stem.format(name), log_format)
+    plot_account_value(account_value, path_stem.format("account_value") + ".png")
+
+
+def episode_tables(dates, account_value, rewards, actions, tickers):
+    """The account value, reward and action tables of one episode."""
+    df_total_value = pd.DataFrame({"account_value": account_value, "date": dates})
+    df_total_value["daily_return"] = df_total_value["account_value"].pct_change(1)
+    df_rewards = pd.DataFrame({"account_rewards": rewards, "date": dates[:-1]})
+    df_actions = pd.DataFrame(actions, columns=tickers)
+    df_actions.index = pd.Index(dates[:-1], name="date")
+    return {
+        "actions": df_actions,
+        "account_value": df_total_value,
+        "account_rewards": df_rewards,
+    }
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+def total_asset(state, stock_dim):
+    """Cash plus the value of the holdings of ``state``, or of each row of a
+    ``(num_envs, state_dim)`` state.
+
+    The holdings are added ticker by ticker (``np.cumsum`` adds
+    sequentially), in the order of the builtin ``sum`` the original envs
+    used, so begin / end assets and rewards match them bit for bit.
+    """
+    values = state[..., 1 : stock_dim + 1] * state[..., stock_dim + 1 : stock_dim * 2 + 1]
+    return state[..., 0] + np.cumsum(values, axis=-1)[..., -1]
+
+
+def execute_orders(state, actions, buy_cost_pct, sell_cost_pct, cost, liquidate=False):
+    """Apply one step of integer share orders to ``state`` in place.
+
+    This is the array version of the per-ticker ``_sell_stock``/``_buy_stock``
+    loop the envs used to run.  It keeps the same semantics and produces the
+    same trades, cash, cost and trade count bit for bit:
+
+    * sells are processed first, most negative action first.  They do not
+      depend on each other, so they are applied in one NumPy pass.  Cash and
+      cost are still accumulated in that order (``np.cumsum`` adds
+      sequentially) so the floating point result matches the loop;
+    * buys are processed largest action first and each one is capped by the
+      cash left by the previous buys.  A cumulative-cash scan finds the
+      prefix of buys that fit entirely; only the buys from the first one
+      that runs out of cash onwards go through the sequential loop;
+    * with ``liquidate`` (turbulence above threshold) every position with a
+      positive price is sold and nothing is bought.
+
+    ``state`` is the env state vector ``[cash, prices, holdings, indicators...]``
+    where the first indicator doubles as the "trading disabled" flag.
+
+    Returns ``(actions, cost, trades)``: the executed number of shares per
+    ticker (negative for sells), the updated running cost and the number of
+    trades of this step.
+    """
+    stock_dim = len(actions)
+    prices = state[1 : stock_dim + 1]
+    holdings = state[stock_dim + 1 : stock_dim * 2 + 1]
+    disabled = state[stock_dim * 2 + 1 : stock_dim * 3 + 1] == True  # noqa: E712
+
+    argsort_actions = np.argsort(actions)
+    sell_index = argsort_actions[: np.count_nonzero(actions < 0)]
+    buy_index = argsort_actions[::-1][: np.count_nonzero(actions > 0)]
+
+    # sells
+    if liquidate:
+        can_sell = (prices[sell_index] > 0) & (holdings[sell_index] > 0)
+        sell_num_shares = holdings[sell_index]
+    else:
+        can_sell = ~disabled[sell_index] & (holdings[sell_index] > 0)
+        sell_num_shares = np.minimum(-actions[sell_index], holdings[sell_index])
+    sold = sell_index[can_sell]
+    sell_num_shares = sell_num_shares[can_sell]
+    sell_value = prices[sold] * sell_num_shares
+    cash_flow = [sell_value * (1 - sell_cost_pct[sold])]
+    cost_flow = [sell_value * sell_cost_pct[sold]]
+    holdings[sold] -= sell_num_shares
+    actions[sell_index] = 0
+    actions[sold] = -sell_num_shares
+    trades = len(sold)
+
+    # buys
+    if not liquidate and len(buy_index):
+        actions[buy_index[disabled[buy_index]]] = 0
+        bought = buy_index[~disabled[buy_index]]
+        unit_cost = prices[bought] * (1 + buy_cost_pct[bought])
+        wanted = actions[bought]
+        buy_value = prices[bought] * wanted
+        cash = np.cumsum(np.concatenate(([state[0]], *cash_flow)))[-1]
+        cash_before = np.cumsum(
+            np.concatenate(([cash], -(buy_value * (1 + buy_cost_pct[bought]))))
+        )[:-1]
+        short = np.flatnonzero(cash_before // unit_cost < wanted)
+        n_full = short[0] if len(short) else len(bought)
+
+        full = bought[:n_full]
+        holdings[full] += wanted[:n_full]
+        cash_flow.append(-(buy_value[:n_full] * (1 + buy_cost_pct[full])))
+        cost_flow.append(buy_value[:n_full] * buy_cost_pct[full])
+        if n_full < len(bought):
+            # from here on cash is the binding constraint: one buy at a time
+            cash = cash_before[n_full]
+            tail_cash, tail_cost = [], []
+            for k in range(n_full, len(bought)):
+                index = bought[k]
+                buy_num_shares = min(cash // unit_cost[k], wanted[k])
+                buy_amount = prices[index] * buy_num_shares * (1 + buy_cost_pct[index])
+                cash -= buy_amount
+                holdings[index] += buy_num_shares
+                actions[index] = buy_num_shares
+                tail_cash.append(-buy_amount)
+                tail_cost.append(prices[index] * buy_num_shares * buy_cost_pct[index])
+            cash_flow.append(tail_cash)
+            cost_flow.append(tail_cost)
+        trades += len(bought)
+
+    state[0] = np.cumsum(np.concatenate(([state[0]], *cash_flow)))[-1]
+    cost = np.cumsum(np.concatenate(([cost], *cost_flow)))[-1]
+    return actions, cost, trades
+
+
+def execute_orders_batch(state, actions, buy_cost_pct, sell_cost_pct, cost, liquidate):
+    """Row-wise :func:`execute_orders` for a ``(num_envs, state_dim)`` state.
+
+    ``actions`` is ``(num_envs, stock_dim)`` and ``cost``/``liquidate`` have one
+    entry per env.  Every row gets exactly the trades, cash and cost
+    ``execute_orders`` would produce for it.  Sells and the buys that fit in
+    the cash are applied for all envs at once; only the cash-constrained tail
+    of the buys is walked sequentially, per env.
+
+    Returns ``(actions, cost, trades)`` with one row/entry per env.
+    """
+    n_envs, stock_dim = actions.shape
+    prices = state[:, 1 : stock_dim + 1]
+    holdings = state[:, stock_dim + 1 : stock_dim * 2 + 1]
+    disabled = state[:, stock_dim * 2 + 1 : stock_dim * 3 + 1] == True  # noqa: E712
+    liquidate = np.asarray(liquidate, dtype=bool)[:, None]
+    rows = np.arange(n_envs)[:, None]
+    executed = np.zeros(actions.shape, dtype=actions.dtype)
+
+    # sells, most negative action first
+    order = np.argsort(actions, axis=1)
+    wanted = actions[rows, order]
+    price = prices[rows, order]
+    held = holdings[rows, order]
+    is_sell = wanted < 0
+    can_sell = (
+        is_sell
+        & (held > 0)
+        & np.where(liquidate, price > 0, ~disabled[rows, order])
+    )
+    sell_num_shares = np.where(
+        can_sell, np.where(liquidate, held, np.minimum(-wanted, held)), 0
+    )
+    sell_value = np.where(can_sell, price * sell_num_shares, 0.0)
+    sell_cash = np.where(can_sell, sell_value * (1 - sell_cost_pct[order]), 0.0)
+    sell_cost = np.where(can_sell, sell_value * sell_cost_pct[order], 0.0)
+    holdings[rows, order] = held - sell_num_shares
+    executed[rows, order] = -sell_num_shares
+    trades = can_sell.sum(axis=1)
+
+    # buys, largest action first
+    order = order[:, ::-1]
+    wanted = actions[rows, order]
+    price = prices[rows, order]
+    buy_cost = buy_cost_pct[order]
+    is_buy = (wanted > 0) & ~liquidate
+    can_buy = is_buy & ~disabled[rows, order]
+    unit_cost = price * (1 + buy_cost)
+    full_amount = np.where(can_buy, price * wanted * (1 + buy_cost), 0.0)
+    cash = np.cumsum(np.concatenate((state[:, :1], sell_cash), axis=1), axis=1)[:, -1]
+    cash_before = np.cumsum(
+        np.concatenate((cash[:, None], -full_amount), axis=1), axis=1
+    )[:, :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        short = can_buy & (cash_before // unit_cost < wanted)
+    first_short = np.where(short.any(axis=1), short.argmax(axis=1), stock_dim)
+    buy_num_shares = np.where(
+        can_buy & (np.arange(stock_dim) < first_short[:, None]), wanted, 0
+    ).astype(np.float64)
+
+    for env in np.flatnonzero(first_short < stock_dim):
+        # from the first buy that does not fit, cash is the binding
+        # constraint: one buy at a time, as in execute_orders
+        ranks = np.flatnonzero(can_buy[env])
+        ranks = ranks[ranks >= first_short[env]]
+        cash = cash_before[env, first_short[env]]
+        tail = []
+        for p, u, w, c in zip(
+            price[env, ranks].tolist(),
+            unit_cost[env, ranks].tolist(),
+            wanted[env, ranks].tolist(),
+            buy_cost[env, ranks].tolist(),
+        ):
+            num = min(cash // u, w)
+            cash -= p * num * (1 + c)
+            tail.append(num)
+        buy_num_shares[env, ranks] = tail
+
+    buy_cash = np.where(can_buy, -(price * buy_num_shares * (1 + buy_cost)), 0.0)
+    buy_cost_flow = np.where(can_buy, price * buy_num_shares * buy_cost, 0.0)
+    holdings[rows, order] += buy_num_shares
+    executed[rows, order] = np.where(is_buy, buy_num_shares, executed[rows, order])
+    trades += can_buy.sum(axis=1)
+
+    state[:, 0] = np.cumsum(
+        np.concatenate((state[:, :1], sell_cash, buy_cash), axis=1), axis=1
+    )[:, -1]
+    cost = np.cumsum(
+        np.concatenate((np.asarray(cost, dtype=np.float64)[:, None], sell_cost, buy_cost_flow), axis=1),
+        axis=1,
+    )[:, -1]
+    return executed, cost, trades
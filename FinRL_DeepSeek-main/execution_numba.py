@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import numpy as np
+
+from action_shaping import N_SCORES
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:  # the NumPy path in execution.py is used instead
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+
+@njit(cache=True)
+def _shape_and_scale(actions, shaping_table, shaping_offsets, hmax, liquidate):
+    # shaping is applied to the caller's actions in place, like the NumPy
+    # path; hmax has the dtype of actions so the product rounds the same
+    stock_dim = actions.shape[0]
+    scaled = np.empty(stock_dim, dtype=np.int64)
+    for i in range(stock_dim):
+        if shaping_table.shape[0]:
+            if actions[i] > 0:
+                direction = 2
+            elif actions[i] == 0:
+                direction = 1
+            else:
+                direction = 0
+            actions[i] *= shaping_table[shaping_offsets[i] + direction * N_SCORES**2]
+        if liquidate:
+            scaled[i] = -int(hmax)
+        else:
+            scaled[i] = int(actions[i] * hmax)
+    return scaled
+
+
+@njit(cache=True)
+def _total_asset(cash, prices, holdings):
+    # ticker by ticker, the order of execution.total_asset
+    value = 0.0
+    for i in range(prices.shape[0]):
+        value += prices[i] * holdings[i]
+    return cash + value
+
+
+@njit(cache=True)
+def _execute_and_advance(
+    state, actions, order, buy_cost_pct, sell_cost_pct, cost, liquidate, next_close, next_features
+):
+    stock_dim = actions.shape[0]
+    prices = state[1 : stock_dim + 1]
+    holdings = state[stock_dim + 1 : stock_dim * 2 + 1]
+    begin_total_asset = _total_asset(state[0], prices, holdings)
+    cash = state[0]
+    trades = 0
+
+    n_sell = 0
+    n_buy = 0
+    for i in range(stock_dim):
+        if actions[i] < 0:
+            n_sell += 1
+        elif actions[i] > 0:
+            n_buy += 1
+
+    # sells, most negative action first
+    for k in range(n_sell):
+        index = order[k]
+        disabled = state[stock_dim * 2 + 1 + index] == 1.0
+        if liquidate:
+            can_sell = prices[index] > 0 and holdings[index] > 0
+            sell_num_shares = holdings[index]
+        else:
+            can_sell = not disabled and holdings[index] > 0
+            sell_num_shares = min(float(-actions[index]), holdings[index])
+        if can_sell:
+            sell_value = prices[index] * sell_num_shares
+            cash += sell_value * (1 - sell_cost_pct[index])
+            cost += sell_value * sell_cost_pct[index]
+            holdings[index] -= sell_num_shares
+            actions[index] = -int(sell_num_shares)
+            trades += 1
+        else:
+            actions[index] = 0
+
+    # buys, largest action first, each capped by the cash left
+    if not liquidate:
+        for k in range(n_buy):
+            index = order[stock_dim - 1 - k]
+            if state[stock_dim * 2 + 1 + index] == 1.0:
+                actions[index] = 0
+                continue
+            unit_cost = prices[index] * (1 + buy_cost_pct[index])
+            buy_num_shares = min(cash // unit_cost, float(actions[index]))
+            cash -= prices[index] * buy_num_shares * (1 + buy_cost_pct[index])
+            cost += prices[index] * buy_num_shares * buy_cost_pct[index]
+            holdings[index] += buy_num_shares
+            actions[index] = int(buy_num_shares)
+            trades += 1
+
+    # state: s -> s+1
+    state[0] = cash
+    prices[:] = next_close
+    state[stock_dim * 2 + 1 :] = next_features
+    end_total_asset = _total_asset(state[0], prices, holdings)
+    return cost, trades, begin_total_asset, end_total_asset
+
+
+_NO_SHAPING = {}  # action dtype -> (empty table, empty offsets)
+
+
+def step_orders_numba(
+    state,
+    actions,
+    hmax,
+    action_shaping,
+    shaping_offsets,
+    liquidate,
+    buy_cost_pct,
+    sell_cost_pct,
+    cost,
+    next_close,
+    next_features,
+):
+    """Compiled version of one non-terminal ``StockTradingEnv.step``.
+
+    Applies the action shaping, scales the actions to shares, handles
+    turbulence liquidation, executes the sells and buys with cost
+    accounting and moves ``state`` to the next day's ``next_close`` /
+    ``next_features``, all in two ``@njit`` kernels.  Trades are the same as
+    with :func:`execution.execute_orders`: the only step left to NumPy is the
+    ``np.argsort`` of the actions, whose order among equal actions numba's
+    sort would not reproduce.
+
+    Returns ``(actions, cost, trades, begin_total_asset, end_total_asset)``.
+    """
+    actions = np.asarray(actions)
+    if action_shaping is None:
+        if actions.dtype not in _NO_SHAPING:
+            _NO_SHAPING[actions.dtype] = (
+                np.empty(0, dtype=actions.dtype),
+                np.empty(0, dtype=np.intp),
+            )
+        shaping_table, shaping_offsets = _NO_SHAPING[actions.dtype]
+    else:
+        shaping_table = action_shaping.flat_table(actions.dtype)
+    scaled = _shape_and_scale(
+        actions, shaping_table, shaping_offsets, actions.dtype.type(hmax), liquidate
+    )
+    order = np.argsort(scaled)
+    cost, trades, begin_total_asset, end_total_asset = _execute_and_advance(
+        state,
+        scaled,
+        order,
+        buy_cost_pct,
+        sell_cost_pct,
+        float(cost),
+        liquidate,
+        next_close,
+        next_features,
+    )
+    return scaled, cost, trades, begin_total_asset, end_total_asset
@@ -0,0 +1,39 @@
+"""Config-driven PPO / CPPO training on the FinRL DeepSeek datasets.
+
+One package for what the train_*.py scripts train with: the MLP
+actor-critic (:mod:`.models`), the rollout buffers (:mod:`.buffers`),
+``ppo()`` / ``cppo()`` (:mod:`.algos`), the market data of a run
+(:mod:`.data`) and run configurations (:mod:`.config`), with the command
+line in :mod:`.cli` (``python -m finrl_deepseek CONFIG``) and hyperparameter
+sweeps in :mod:`.sweep` (``python -m finrl_deepseek.sweep SWEEP_CONFIG``) and
+backtests of trained agents in :mod:`.backtest`.
+
+torch, spinup and the data loaders are imported when first used, not
+with the package.
+"""
+
+_EXPORTS = {
+    "ppo": "finrl_deepseek.algos",
+    "cppo": "finrl_deepseek.algos",
+    "llm_risk_factor": "finrl_deepseek.algos",
+    "MLPActorCritic": "finrl_deepseek.models",
+    "PPOBuffer": "finrl_deepseek.buffers",
+    "CPPOBuffer": "finrl_deepseek.buffers",
+    "load_market": "finrl_deepseek.data",
+    "resolve_config": "finrl_deepseek.config",
+    "make_env": "finrl_deepseek.cli",
+    "train": "finrl_deepseek.cli",
+    "performance_metrics": "finrl_deepseek.backtest",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,3 @@
+from finrl_deepseek.cli import main
+
+main()
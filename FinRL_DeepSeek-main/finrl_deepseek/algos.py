@@ -0,0 +1,528 @@
+"""PPO and CPPO on a batched env, one training loop for both.
+
+``ppo()`` and ``cppo()`` train the agents of all train_*.py scripts.  CPPO
+is PPO whose advantages are lowered by CVaR penalties (see cvar.py).  For
+the LLM risk variants each step's CVaR statistic is weighted by the LLM
+risk of the portfolio (:func:`llm_risk_factor`).
+"""
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+import torch
+from torch.optim import Adam
+
+import serial_mpi
+serial_mpi.install_if_missing()
+from checkpoint import Checkpointer, get_rng_state, keep_progress_log, set_rng_state
+from cvar import CVaRTracker
+from ppo_update import minibatch_sgd
+from rollout_workers import RolloutWorkers
+from spinup.utils.logx import EpochLogger
+from spinup.utils.mpi_pytorch import mpi_avg_grads, setup_pytorch_for_mpi, sync_params
+from spinup.utils.mpi_tools import mpi_avg, num_procs, proc_id
+
+from finrl_deepseek.buffers import CPPOBuffer, PPOBuffer
+from finrl_deepseek.models import MLPActorCritic, count_vars
+
+
+def llm_risk_factor(obs, stock_dim, risk_weights):
+    """
+    Portfolio-weighted LLM risk of observations ``obs`` (one row per env):
+    the weights of the risk scores 1 to 5 (``risk_weights``) of the stocks,
+    averaged by the value held in each. 1 for a portfolio holding nothing.
+    The risk scores are the last ``stock_dim`` entries of the state.
+    """
+    obs = np.asarray(obs, dtype=np.float64)
+    weights = np.ones(6)
+    weights[1:] = risk_weights
+    risk = obs[:, -stock_dim:]
+    whole = (risk >= 1) & (risk <= 5) & (risk == np.round(risk))
+    risk_weight = weights[np.where(whole, risk, 0).astype(np.intp)]
+    stock_values = obs[:, 1:stock_dim+1] * obs[:, stock_dim+1:stock_dim*2+1]
+    total_value = stock_values.sum(axis=1)
+    weighted = np.einsum("ij,ij->i", stock_values, risk_weight)
+    return np.where(total_value == 0, 1.0, weighted / np.where(total_value == 0, 1.0, total_value))
+
+
+def ppo(
+    env_fn,
+    actor_critic=MLPActorCritic,
+    ac_kwargs=dict(hidden_sizes=[256, 128], activation=torch.nn.ReLU),
+    seed=42,
+    steps_per_epoch=8000,  # Larger batch size for better gradient estimation
+    epochs=100,  # More epochs for convergence in a volatile environment
+    gamma=0.995,  # Higher discount factor to account for long-term rewards
+    clip_ratio=0.7,  # it's 90% clipping when Reduced clip ratio for stable updates
+    pi_lr=3e-5,  # Lower policy learning rate
+    vf_lr=1e-4,  # Lower value function learning rate
+    train_pi_iters=100,  # Increased policy training iterations
+    train_v_iters=100,  # Increased value function training iterations
+    minibatch_size=None,  # None: full-batch steps, train_pi_iters / train_v_iters
+    update_epochs=10,  # passes over the data per update with minibatches
+    grad_accum_steps=1,  # minibatches per allreduce / optimizer step
+    rollout_workers=0,  # >0: collect rollouts in this many worker processes
+    overlap_rollouts=True,  # workers collect the next epoch during the update
+    lam=0.95,  # GAE smoothing factor for advantage estimation
+    max_ep_len=5000,  # Typical trading day or customizable period
+    target_kl=0.35,  # relaxed KL divergence limit
+    logger_kwargs=dict(),
+    save_freq=5,  # Save checkpoints more frequently
+    checkpoint_dir=None,  # directory for resumable checkpoints, None: none
+    checkpoint_freq=1,  # epochs between checkpoints
+    keep_checkpoints=2,  # most recent checkpoints kept
+    resume=False,  # continue from the latest checkpoint in checkpoint_dir
+    cvar=None,  # CVaRTracker: train CPPO (see cppo())
+    risk_weights=None,  # CPPO: weights of the LLM risk scores 1 to 5 in d_pi
+    on_epoch=None,  # on_epoch(epoch, mean EpRet) after each epoch, False: stop training
+):
+    r"""
+    Proximal Policy Optimization (by clipping), with early stopping based
+    on approximate KL, on a batched env (``BatchedStockTradingEnv``: one
+    policy forward and one env step per tick for all its envs).
+
+    Args:
+        env_fn : A function which creates the (batched) environment. It
+            must follow the BatchedStockTradingEnv API: ``num_envs``,
+            ``reset(indices=None)`` and ``step(actions)`` returning
+            ``(obs, rewards, dones, infos)`` for all envs at once, with
+            finished envs reset automatically.
+
+        actor_critic: The constructor method for a PyTorch Module with a
+            ``step`` method, an ``act`` method, a ``pi`` module, and a ``v``
+            module. The ``step`` method should accept a batch of observations
+            and return:
+
+            ===========  ================  ======================================
+            Symbol       Shape             Description
+            ===========  ================  ======================================
+            ``a``        (batch, act_dim)  | Numpy array of actions for each
+                                           | observation.
+            ``v``        (batch,)          | Numpy array of value estimates
+                                           | for the provided observations.
+            ``logp_a``   (batch,)          | Numpy array of log probs for the
+                                           | actions in ``a``.
+            ===========  ================  ======================================
+
+            The ``act`` method behaves the same as ``step`` but only returns ``a``.
+
+            The ``pi`` module's forward call should accept a batch of
+            observations and optionally a batch of actions, and return:
+
+            ===========  ================  ======================================
+            Symbol       Shape             Description
+            ===========  ================  ======================================
+            ``pi``       N/A               | Torch Distribution object, containing
+                                           | a batch of distributions describing
+                                           | the policy for the provided observations.
+            ``logp_a``   (batch,)          | Optional (only returned if batch of
+                                           | actions is given). Tensor containing
+                                           | the log probability, according to
+                                           | the policy, of the provided actions.
+                                           | If actions not given, will contain
+                                           | ``None``.
+            ===========  ================  ======================================
+
+            The ``v`` module's forward call should accept a batch of observations
+            and return:
+
+            ===========  ================  ======================================
+            Symbol       Shape             Description
+            ===========  ================  ======================================
+            ``v``        (batch,)          | Tensor containing the value estimates
+                                           | for the provided observations. (Critical:
+                                           | make sure to flatten this!)
+            ===========  ================  ======================================
+
+
+        ac_kwargs (dict): Any kwargs appropriate for the ActorCritic object
+            you provided to PPO.
+
+        seed (int): Seed for random number generators.
+
+        steps_per_epoch (int): Number of steps of interaction (state-action pairs)
+            for the agent and the environment in each epoch.
+
+        epochs (int): Number of epochs of interaction (equivalent to
+            number of policy updates) to perform.
+
+        gamma (float): Discount factor. (Always between 0 and 1.)
+
+        clip_ratio (float): Hyperparameter for clipping in the policy objective.
+            Roughly: how far can the new policy go from the old policy while
+            still profiting (improving the objective function)? The new policy
+            can still go farther than the clip_ratio says, but it doesn't help
+            on the objective anymore. (Usually small, 0.1 to 0.3.) Typically
+            denoted by :math:`\epsilon`.
+
+        pi_lr (float): Learning rate for policy optimizer.
+
+        vf_lr (float): Learning rate for value function optimizer.
+
+        train_pi_iters (int): Maximum number of gradient descent steps to take
+            on policy loss per epoch. (Early stopping may cause optimizer
+            to take fewer than this.)
+
+        train_v_iters (int): Number of gradient descent steps to take on
+            value function per epoch.
+
+        minibatch_size (int): If set, the policy and value function are
+            trained on shuffled minibatches of this size instead of with
+            ``train_pi_iters`` / ``train_v_iters`` full-batch steps.
+
+        update_epochs (int): Passes over the epoch's data per update in
+            minibatch mode. KL early stopping applies to every step.
+
+        grad_accum_steps (int): Minibatches whose gradients are accumulated
+            before one (flat) MPI allreduce and optimizer step.
+
+        rollout_workers (int): If set, rollouts are collected by this many
+            worker processes, each stepping its own ``env_fn()`` with a CPU
+            copy of the policy (see rollout_workers.py), instead of in this
+            process. Needs no MPI; steps_per_epoch is split over all envs
+            of all workers.
+
+        overlap_rollouts (bool): With rollout workers, collect the next
+            epoch while the policy is updated on the last one. Rollouts then
+            use the weights from one update earlier.
+
+        lam (float): Lambda for GAE-Lambda. (Always between 0 and 1,
+            close to 1.)
+
+        max_ep_len (int): Maximum length of trajectory / episode / rollout.
+
+        target_kl (float): Roughly what KL divergence we think is appropriate
+            between new and old policies after an update. This will get used
+            for early stopping. (Usually small, 0.01 or 0.05.)
+
+        logger_kwargs (dict): Keyword args for EpochLogger.
+
+        save_freq (int): How often (in terms of gap between epochs) to save
+            the current policy and value function.
+
+        checkpoint_dir (str): Directory for resumable checkpoints (see
+            checkpoint.py): weights, optimizer and RNG states and the
+            epoch, written in the background every ``checkpoint_freq``
+            epochs. The ``keep_checkpoints`` most recent are kept.
+
+        resume (bool): Continue from the latest checkpoint in
+            ``checkpoint_dir`` (if there is one) instead of starting over.
+
+        cvar (CVaRTracker): Train CPPO: every step gets the CVaR penalty of
+            its statistic ``d_pi = ep_ret + v - r`` (see cvar.py). Use
+            :func:`cppo` for that.
+
+        risk_weights (list): CPPO: weights of the LLM risk scores 1 to 5;
+            ``d_pi`` is multiplied by :func:`llm_risk_factor` of the state
+            after the step.
+
+        on_epoch: Called after every epoch with the epoch and the mean
+            return of the episodes finished in it (over all processes, nan
+            if none finished); training stops early when it returns
+            ``False`` (see sweep.py).
+
+    Returns the trained actor-critic.
+    """
+
+    # Special function to avoid certain slowdowns from PyTorch + MPI combo.
+    setup_pytorch_for_mpi()
+
+    # Checkpoints, and the one to resume from
+    checkpointer = resumed = None
+    if checkpoint_dir is not None:
+        checkpointer = Checkpointer(checkpoint_dir, keep_checkpoints, rank=proc_id())
+        if resume:
+            resumed = checkpointer.load()
+    elif resume:
+        raise ValueError("resume needs a checkpoint_dir")
+    if resumed is not None and proc_id() == 0 and logger_kwargs.get('output_dir'):
+        keep_progress_log(logger_kwargs['output_dir'], resumed['epoch'] + 1)
+
+    # Set up logger and save configuration
+    logger = EpochLogger(**logger_kwargs)
+    logger.save_config(locals())
+
+    # Random seed
+    seed += 10000 * proc_id()
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+
+    # Instantiate environment
+    env = env_fn()
+    obs_dim = env.observation_space.shape
+    act_dim = env.action_space.shape
+
+    # Create actor-critic module
+    ac = actor_critic(env.observation_space, env.action_space, **ac_kwargs)
+
+    # Sync params across processes
+    sync_params(ac)
+
+    # Count variables
+    var_counts = tuple(count_vars(module) for module in [ac.pi, ac.v])
+    logger.log('\nNumber of parameters: \t pi: %d, \t v: %d\n'%var_counts)
+
+    # Set up experience buffer
+    local_steps_per_epoch = int(steps_per_epoch / num_procs())
+    num_envs = env.num_envs * max(rollout_workers, 1)
+    Buffer = PPOBuffer if cvar is None else CPPOBuffer
+    if rollout_workers:
+        # shared buffers, one per rollout in flight; every worker fills the
+        # columns of its envs (see rollout_workers.py)
+        bufs = [Buffer(obs_dim, act_dim, local_steps_per_epoch, gamma, lam, num_envs,
+                       shared=True)
+                for _ in range(2 if overlap_rollouts else 1)]
+    else:
+        buf = Buffer(obs_dim, act_dim, local_steps_per_epoch, gamma, lam, num_envs)
+
+    # Set up function for computing PPO policy loss
+    def compute_loss_pi(data):
+        obs, act, adv, logp_old = data['obs'], data['act'], data['adv'], data['logp']
+
+        # Policy loss
+        pi, logp = ac.pi(obs, act)
+        ratio = torch.exp(logp - logp_old)
+        clip_adv = torch.clamp(ratio, 1-clip_ratio, 1+clip_ratio) * adv
+        loss_pi = -(torch.min(ratio * adv, clip_adv)).mean()
+
+        # Useful extra info
+        approx_kl = (logp_old - logp).mean().item()
+        ent = pi.entropy().mean().item()
+        clipped = ratio.gt(1+clip_ratio) | ratio.lt(1-clip_ratio)
+        clipfrac = torch.as_tensor(clipped, dtype=torch.float32).mean().item()
+        pi_info = dict(kl=approx_kl, ent=ent, cf=clipfrac)
+
+        return loss_pi, pi_info
+
+    # Set up function for computing value loss
+    def compute_loss_v(data):
+        obs, ret = data['obs'], data['ret']
+        return ((ac.v(obs) - ret)**2).mean()
+
+    # Set up optimizers for policy and value function
+    pi_optimizer = Adam(ac.pi.parameters(), lr=pi_lr)
+    vf_optimizer = Adam(ac.v.parameters(), lr=vf_lr)
+
+    # Set up model saving
+    logger.setup_pytorch_saver(ac)
+
+    def update(data):
+        pi_l_old, pi_info_old = compute_loss_pi(data)
+        pi_l_old = pi_l_old.item()
+        v_l_old = compute_loss_v(data).item()
+
+        if minibatch_size is not None:
+            # Shuffled minibatches, one allreduce per optimizer step
+            i = minibatch_sgd(data, compute_loss_pi, ac.pi, pi_optimizer,
+                              update_epochs, minibatch_size, grad_accum_steps,
+                              max_kl=1.5 * target_kl)
+            logger.store(StopIter=i)
+            minibatch_sgd(data, compute_loss_v, ac.v, vf_optimizer,
+                          update_epochs, minibatch_size, grad_accum_steps)
+            with torch.no_grad():
+                loss_pi, pi_info = compute_loss_pi(data)
+                loss_v = compute_loss_v(data)
+        else:
+            # Train policy with multiple steps of gradient descent
+            for i in range(train_pi_iters):
+                pi_optimizer.zero_grad()
+                loss_pi, pi_info = compute_loss_pi(data)
+                kl = mpi_avg(pi_info['kl'])
+                if kl > 1.5 * target_kl:
+                    logger.log('Early stopping at step %d due to reaching max kl.'%i)
+                    break
+                loss_pi.backward()
+                mpi_avg_grads(ac.pi)    # average grads across MPI processes
+                pi_optimizer.step()
+
+            logger.store(StopIter=i)
+
+            # Value function learning
+            for i in range(train_v_iters):
+                vf_optimizer.zero_grad()
+                loss_v = compute_loss_v(data)
+                loss_v.backward()
+                mpi_avg_grads(ac.v)    # average grads across MPI processes
+                vf_optimizer.step()
+
+        # Log changes from update
+        kl, ent, cf = pi_info['kl'], pi_info_old['ent'], pi_info['cf']
+        logger.store(LossPi=pi_l_old, LossV=v_l_old,
+                     KL=kl, Entropy=ent, ClipFrac=cf,
+                     DeltaLossPi=(loss_pi.item() - pi_l_old),
+                     DeltaLossV=(loss_v.item() - v_l_old))
+
+    def collect(env, ac, buf):
+        """
+        Run one epoch of interaction of ``ac`` with all envs of ``env`` into
+        ``buf``. Returns the returns and lengths of the finished episodes.
+        """
+        n = env.num_envs
+        o = env.reset()
+        ep_ret, ep_len = np.zeros(n), np.zeros(n, dtype=int)
+        episodes = dict(EpRet=[], EpLen=[])
+
+        for t in range(buf.max_size):
+            # one forward pass for all envs
+            a, v, logp = ac.step(o)
+
+            next_o, r, d, infos = env.step(a)
+            ep_ret += r
+            ep_len += 1
+
+            # save (CPPO: with the CVaR statistic of the step)
+            if cvar is None:
+                buf.store(o, a, r, v, logp)
+            else:
+                d_pi = ep_ret + v - r
+                if risk_weights is not None:
+                    # risk of the portfolio after the step; finished envs
+                    # have been reset, theirs is the terminal observation
+                    after = next_o
+                    if d.any():
+                        after = next_o.copy()
+                        after[d] = infos['terminal_observation']
+                    d_pi = llm_risk_factor(after, env.stock_dim, risk_weights) * d_pi
+                buf.store(o, a, r, v, d_pi, logp)
+
+            # Update obs (critical!)
+            # (envs that are done have already been reset by the env)
+            o = next_o
+
+            timeout = (ep_len == max_ep_len) & ~d
+            terminal = d | timeout
+            epoch_ended = t==buf.max_size-1
+
+            if terminal.any() or epoch_ended:
+                if epoch_ended and not terminal.all():
+                    print('Warning: %d trajectories cut off by epoch at %d steps.'
+                          % ((~terminal).sum(), ep_len[~terminal].max()), flush=True)
+                # if trajectory didn't reach terminal state, bootstrap value target
+                cut = ~d if epoch_ended else timeout
+                last_val = np.zeros(n, dtype=np.float32)
+                if cut.any():
+                    _, v, _ = ac.step(o)
+                    last_val[cut] = v[cut]
+                buf.finish_paths(terminal | epoch_ended, last_val)
+                # only save EpRet / EpLen if trajectory finished
+                episodes['EpRet'] += ep_ret[terminal].tolist()
+                episodes['EpLen'] += ep_len[terminal].tolist()
+                if timeout.any() and not epoch_ended:
+                    o = env.reset(timeout)
+                ep_ret[terminal] = 0
+                ep_len[terminal] = 0
+        return episodes
+
+    start_epoch, elapsed = 0, 0.0
+    if resumed is not None:
+        ac.load_state_dict(resumed['ac'])
+        pi_optimizer.load_state_dict(resumed['pi_optimizer'])
+        vf_optimizer.load_state_dict(resumed['vf_optimizer'])
+        set_rng_state(resumed['rng'], env)
+        if cvar is not None:
+            cvar.load_state_dict(resumed['cvar'])
+        start_epoch, elapsed = resumed['epoch'] + 1, resumed['elapsed']
+        logger.log('Resuming after epoch %d from %s' % (resumed['epoch'], checkpoint_dir))
+
+    # Prepare for interaction with environment
+    start_time = time.time() - elapsed
+    workers = None
+    if rollout_workers:
+        workers = RolloutWorkers(env_fn, ac, collect, bufs, rollout_workers, seed + start_epoch)
+        for _ in range(min(len(bufs), epochs - start_epoch)):
+            workers.submit()
+
+    # Main loop: collect experience in env and update/log each epoch
+    for epoch in range(start_epoch, epochs):
+        if workers is None:
+            all_episodes = [collect(env, ac, buf)]
+        else:
+            buf, all_episodes = workers.wait()
+        for episodes in all_episodes:
+            for ret, length in zip(episodes['EpRet'], episodes['EpLen']):
+                logger.store(EpRet=ret, EpLen=length)
+        # a copy, the workers may refill the buffer before the epoch is logged
+        logger.store(VVals=buf.val_buf.flatten())
+
+        if cvar is not None:
+            # CVaR penalties of all steps of all envs, then the next nu
+            cvar.start_epoch()
+            buf.valupdate_buf[:] = cvar.penalties(buf.dpi_buf, buf.val_buf)
+            cvar.end_epoch()
+
+        # Save model (not the env, it is rebuilt from the market data)
+        if (epoch % save_freq == 0) or (epoch == epochs-1):
+            logger.save_state({}, None)
+
+        # Perform PPO update!
+        update(buf.get())
+        if checkpointer is not None and ((epoch + 1) % checkpoint_freq == 0 or epoch == epochs-1):
+            state = dict(ac=ac.state_dict(),
+                         pi_optimizer=pi_optimizer.state_dict(),
+                         vf_optimizer=vf_optimizer.state_dict(),
+                         rng=get_rng_state(env), elapsed=time.time()-start_time)
+            if cvar is not None:
+                state['cvar'] = cvar.state_dict()
+            checkpointer.save(epoch, **state)
+        if workers is not None:
+            workers.publish(ac)
+            if epoch + len(bufs) < epochs:
+                workers.submit()
+
+        # Log info about epoch
+        stop = on_epoch is not None and on_epoch(epoch, logger.get_stats('EpRet')[0]) is False
+        logger.log_tabular('Epoch', epoch)
+        logger.log_tabular('EpRet', with_min_and_max=True)
+        logger.log_tabular('EpLen', average_only=True)
+        logger.log_tabular('VVals', with_min_and_max=True)
+        logger.log_tabular('TotalEnvInteracts', (epoch+1)*steps_per_epoch)
+        logger.log_tabular('LossPi', average_only=True)
+        logger.log_tabular('LossV', average_only=True)
+        logger.log_tabular('DeltaLossPi', average_only=True)
+        logger.log_tabular('DeltaLossV', average_only=True)
+        logger.log_tabular('Entropy', average_only=True)
+        logger.log_tabular('KL', average_only=True)
+        logger.log_tabular('ClipFrac', average_only=True)
+        logger.log_tabular('StopIter', average_only=True)
+        if cvar is not None:
+            cvar.log_tabular(logger)
+        logger.log_tabular('Time', time.time()-start_time)
+        logger.dump_tabular()
+        if stop:
+            logger.log('Stopped after epoch %d' % epoch)
+            break
+    if workers is not None:
+        workers.close()
+    if checkpointer is not None:
+        checkpointer.flush()
+    return ac
+
+
+def cppo(env_fn,
+         actor_critic=MLPActorCritic,
+         ac_kwargs=dict(hidden_sizes=[512, 512], activation=torch.nn.ReLU),
+         steps_per_epoch=20000,  # Larger batch size to handle market variability
+         max_ep_len=3000,  # Extended maximum episode length for longer trading horizons
+         save_freq=10,
+         alpha=0.85,  # Adjusted risk sensitivity
+         beta=3000.0,  # Adjusted beta for risk constraints
+         lam_lr=5e-4,  # Learning rate for CVaR Lagrange multiplier
+         nu_start=0.1,  # Starting value for nu
+         lam_start=0.01,  # Starting value for lambda
+         nu_delay=0.75,  # Delayed nu updates for better stability
+         delay=1.0,  # Update delay for constraints
+         cvar_clip_ratio=0.05,  # CVaR clipping ratio
+         risk_weights=None,  # weights of the LLM risk scores 1 to 5, None: no LLM risk
+         **kwargs):
+    """
+    CVaR-constrained PPO: :func:`ppo` with the CVaR penalties of a
+    :class:`CVaRTracker` of the given multiplier settings, and the
+    defaults of CPPO. Other keyword arguments are those of :func:`ppo`.
+    """
+    cvar = CVaRTracker(alpha, beta, lam_lr, nu_start, lam_start, nu_delay, delay,
+                       cvar_clip_ratio)
+    return ppo(env_fn, actor_critic=actor_critic, ac_kwargs=ac_kwargs,
+               steps_per_epoch=steps_per_epoch, max_ep_len=max_ep_len, save_freq=save_freq,
+               cvar=cvar, risk_weights=risk_weights, **kwargs)
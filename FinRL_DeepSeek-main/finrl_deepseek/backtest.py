@@ -0,0 +1,263 @@
+"""Deterministic backtests of trained agents on the trade data (2019-2023).
+
+The headless version of ``FinRL_DeepSeek_backtesting.ipynb``: every agent
+trades the ``trade_dataset`` of its run config once, from the first day to
+the last, with the mean action of its policy (no sampling).  Agents whose
+runs share a trade env (same data, variant and env settings) trade side by
+side as the portfolios of one ``BatchedStockTradingEnv``, with one batched
+policy forward per day for all of them, so evaluating every checkpoint of
+a run takes one pass over the market tensor.
+
+As in the notebook the trade env liquidates when ``vix`` reaches 70 (set
+``env.turbulence_threshold`` / ``env.risk_indicator_col`` to change it).
+The benchmark is the equal-weighted buy-and-hold portfolio of the traded
+stocks, or the ``close`` column of a ``--benchmark`` CSV (``date``,
+``close``, e.g. the Nasdaq-100 index) on the dates both have::
+
+    python -m finrl_deepseek.backtest configs/ppo.json configs/cppo.json
+    python -m finrl_deepseek.backtest configs/cppo_llm_risk.json --checkpoints --output cppo.csv
+    python -m finrl_deepseek.backtest configs/ppo_llm.json --model a.pth --model b.pth
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import re
+
+import numpy as np
+
+from finrl_deepseek.config import resolve_config
+
+TRADE_ENV = {"turbulence_threshold": 70, "risk_indicator_col": "vix", "random_start": False}
+
+METRICS = ("FinalValue", "CumulativeReturn", "Sharpe", "CVaR", "MaxDrawdown",
+           "InformationRatio", "RachevRatio", "Turnover")
+
+
+def performance_metrics(values, benchmark, turnover=None, confidence_level=0.05,
+                        upside_confidence=0.95):
+    """
+    Metrics of account ``values`` (one per day, starting with the initial
+    amount) against the ``benchmark`` values of the same days:
+
+    - Sharpe: annualized (252 days) Sharpe ratio of the daily returns
+    - CVaR: mean daily return at or below its ``confidence_level`` quantile
+    - MaxDrawdown: largest fall from a running peak, as a (negative) fraction
+    - InformationRatio: mean / std of the daily returns in excess of the
+      benchmark's (not annualized, as in the backtesting notebook)
+    - RachevRatio: mean return above the ``upside_confidence`` quantile over
+      the absolute CVaR
+    - Turnover: mean of the daily traded value over the portfolio value,
+      given as ``turnover``
+    """
+    values = np.asarray(values, dtype=np.float64)
+    benchmark = np.asarray(benchmark, dtype=np.float64)
+    returns = values[1:] / values[:-1] - 1
+    excess = returns - (benchmark[1:] / benchmark[:-1] - 1)
+    var = np.percentile(returns, confidence_level * 100)
+    cvar = returns[returns <= var].mean()
+    upside = returns[returns >= np.percentile(returns, upside_confidence * 100)].mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "FinalValue": values[-1],
+            "CumulativeReturn": values[-1] / values[0] - 1,
+            "Sharpe": np.sqrt(252) * returns.mean() / returns.std(ddof=1),
+            "CVaR": cvar,
+            "MaxDrawdown": (values / np.maximum.accumulate(values) - 1).min(),
+            "InformationRatio": excess.mean() / excess.std(ddof=1),
+            "RachevRatio": upside / abs(cvar),
+            "Turnover": np.nan if turnover is None else float(np.mean(turnover)),
+        }
+
+
+def equal_weight_benchmark(market, initial_amount):
+    """Values of the equal-weighted buy-and-hold portfolio of the market's stocks."""
+    close = market.close(np.arange(market.n_days)).astype(np.float64)
+    return initial_amount * (close / close[0]).mean(axis=1)
+
+
+def read_benchmark(path, dates):
+    """The ``close`` of a benchmark CSV on ``dates``, nan where it has none."""
+    import pandas as pd
+
+    frame = pd.read_csv(path, usecols=["date", "close"])
+    series = frame.set_index(pd.to_datetime(frame["date"]))["close"]
+    return series.reindex(pd.to_datetime(np.asarray(dates, dtype=str))).to_numpy(np.float64)
+
+
+def checkpoint_paths(checkpoint_dir):
+    """The rank 0 checkpoints of a run, by epoch."""
+    paths = glob.glob(os.path.join(checkpoint_dir, "checkpoint_*_0.pt"))
+    return sorted(paths, key=lambda path: int(re.search(r"checkpoint_(\d+)_0", path).group(1)))
+
+
+def load_agent(config, path, observation_space, action_space):
+    """The actor-critic of a run config with the weights of a saved model or checkpoint."""
+    import torch
+
+    from finrl_deepseek.models import MLPActorCritic
+
+    model = config["model"]
+    ac = MLPActorCritic(observation_space, action_space, hidden_sizes=model["hidden_sizes"],
+                        activation=getattr(torch.nn, model["activation"]))
+    state = torch.load(path, map_location="cpu", weights_only=False)
+    if "ac" in state:  # a checkpoint of ppo()
+        state = state["ac"]
+    try:
+        ac.load_state_dict(state)
+    except RuntimeError as err:
+        raise ValueError(f"{path} does not fit the {config['variant']!r} trade env "
+                         f"of {config['exp_name']!r}: {err}") from None
+    return ac.eval()
+
+
+class PolicyMeans:
+    """
+    The mean actions of several Gaussian policies, one observation row each.
+    Policies of the same architecture run as one batched (vmapped) forward.
+    """
+
+    def __init__(self, actors):
+        import copy
+
+        import torch
+        from torch.func import functional_call, stack_module_state
+
+        self.torch = torch
+        nets = [actor.mu_net for actor in actors]
+        self._forward = None
+        if len({repr(net) for net in nets}) == 1:
+            params, buffers = stack_module_state(nets)
+            base = copy.deepcopy(nets[0]).to("meta")
+
+            def mean(p, b, obs):
+                return functional_call(base, (p, b), (obs,))
+
+            vmapped = torch.func.vmap(mean)
+            self._forward = lambda obs: vmapped(params, buffers, obs)
+        self.nets = nets
+
+    def __call__(self, obs):
+        torch = self.torch
+        with torch.no_grad():
+            obs = torch.as_tensor(obs, dtype=torch.float32)
+            if self._forward is not None:
+                return self._forward(obs).numpy()
+            return torch.stack([net(row) for net, row in zip(self.nets, obs)]).numpy()
+
+
+def run_group(trade_config, agents):
+    """
+    Trade one env's ``agents`` (a list of ``(name, run config, model path)``)
+    side by side; returns the trade dates, the env's market and, for every
+    agent, its daily account values and turnover.
+    """
+    from finrl_deepseek.cli import make_env
+    from finrl_deepseek.data import load_market
+
+    market = load_market(trade_config)
+    env = make_env(trade_config, market)
+    actors = [load_agent(config, path, env.observation_space, env.action_space).pi
+              for _, config, path in agents]
+    policy = PolicyMeans(actors)
+    stock_dim = market.n_tickers
+
+    obs = env.reset()
+    values = [np.full(env.num_envs, float(env.initial_amount))]
+    turnover = []
+    for _ in range(market.n_days - 1):
+        begin_total_asset = values[-1]
+        prices = env.state[:, 1:stock_dim + 1].copy()
+        obs, _, _, infos = env.step(policy(obs))
+        values.append(infos["end_total_asset"])
+        traded = np.abs(infos["actions"]) * prices
+        turnover.append(traded.sum(axis=1) / begin_total_asset)
+    return market.dates, market, np.array(values).T, np.array(turnover).T
+
+
+def backtest(agents, overrides=(), benchmark=None):
+    """
+    Backtest ``agents``, a list of ``(name, resolved run config, model
+    path)``; ``overrides`` apply to their trade configs (after
+    :data:`TRADE_ENV`). Returns one row of :data:`METRICS` per agent,
+    with its ``agent`` name, and the daily account values
+    ``{name: (dates, values)}``.
+    """
+    groups = {}
+    for name, config, path in agents:
+        trade_config = resolve_config(
+            config, [{"dataset": config["trade_dataset"], "env": TRADE_ENV}] + list(overrides))
+        key = json.dumps([trade_config[k] for k in ("dataset", "variant", "env", "market_cache",
+                                                    "indicators")])
+        groups.setdefault(key, (trade_config, []))[1].append((name, config, path))
+
+    rows, account_values = [], {}
+    for trade_config, members in groups.values():
+        trade_config = resolve_config(trade_config, [{"env": {"num_envs": len(members)}}])
+        dates, market, values, turnover = run_group(trade_config, members)
+        if benchmark is None:
+            bench = equal_weight_benchmark(market, trade_config["env"]["initial_amount"])
+        else:
+            bench = read_benchmark(benchmark, dates)
+        common = ~np.isnan(bench)
+        days = np.flatnonzero(common)
+        # the trades of the days the returns cover, from the first to the
+        # last day with a benchmark value (turnover[i]: day i -> i + 1)
+        steps = slice(days[0], days[-1]) if len(days) else slice(0, 0)
+        for (name, _, _), agent_values, agent_turnover in zip(members, values, turnover):
+            row = performance_metrics(agent_values[common], bench[common], agent_turnover[steps])
+            rows.append(dict(agent=name, **row))
+            account_values[name] = (dates, agent_values)
+    return rows, account_values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m finrl_deepseek.backtest",
+        description="Backtest trained PPO / CPPO agents on the trade data.")
+    parser.add_argument('configs', nargs='+', help='run config files of the agents')
+    parser.add_argument('--model', action='append', default=[],
+                        help="saved agent to test with every config (default: its model_path)")
+    parser.add_argument('--checkpoints', action='store_true',
+                        help="also test every checkpoint in each run's checkpoint_dir")
+    parser.add_argument('--set', dest='overrides', action='append', default=[],
+                        metavar='KEY=VALUE', help='override a config entry, e.g. env.hmax=50')
+    parser.add_argument('--benchmark', help='CSV with date and close columns')
+    parser.add_argument('--output', help='write the metrics table to this CSV')
+    parser.add_argument('--values', help='write the daily account values to this CSV')
+    args = parser.parse_args(argv)
+
+    agents = []
+    try:
+        for path in args.configs:
+            config = resolve_config(path, args.overrides)
+            models = args.model or [config["model_path"]]
+            if args.checkpoints:
+                models = models + checkpoint_paths(config["checkpoint_dir"])
+            for model in models:
+                if not os.path.exists(model):
+                    parser.error(f"no saved agent {model}")
+                agents.append((f"{config['exp_name']}:{os.path.basename(model)}", config, model))
+    except ValueError as err:
+        parser.error(str(err))
+
+    import pandas as pd
+
+    rows, account_values = backtest(agents, args.overrides, args.benchmark)
+    table = pd.DataFrame(rows).set_index("agent")
+    if args.output:
+        table.to_csv(args.output)
+    if args.values:
+        pd.DataFrame({name: pd.Series(values, index=dates)
+                      for name, (dates, values) in account_values.items()}).to_csv(args.values)
+    with pd.option_context("display.width", 200, "display.max_columns", None,
+                           "display.max_rows", None):
+        print(table.to_string(float_format=lambda x: f"{x:.4f}"))
+    return table
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Rollout buffers of PPO and CPPO over the envs of a batched env."""
+
+from __future__ import annotations
+
+import copy
+
+import numpy as np
+import torch
+
+import serial_mpi
+serial_mpi.install_if_missing()
+from gae import gae_lambda
+from spinup.utils.mpi_tools import mpi_statistics_scalar
+
+from finrl_deepseek.models import combined_shape
+
+
+class PPOBuffer:
+    """
+    A buffer for storing trajectories experienced by a PPO agent interacting
+    with the environment, and using Generalized Advantage Estimation (GAE-Lambda)
+    for calculating the advantages of state-action pairs.
+
+    Steps are stored as (timestep, env) arrays. Advantages and rewards-to-go
+    of all envs and trajectories are computed together in ``get`` (see
+    gae.py). The arrays are NumPy views of torch tensors allocated once, so
+    ``get`` hands out the same tensors every epoch without copying. With
+    ``shared=True`` they are allocated in shared memory, for rollout worker
+    processes that each fill the columns of their envs (``env_slice``).
+    """
+
+    # the arrays a rollout worker stores into
+    _step_bufs = ('obs_buf', 'act_buf', 'rew_buf', 'val_buf',
+                  'logp_buf', 'end_buf', 'last_val_buf')
+
+    def __init__(self, obs_dim, act_dim, size, gamma=0.99, lam=0.95, num_envs=1,
+                 shared=False):
+        # one column per env: size // num_envs timesteps of num_envs envs
+        size = size // num_envs
+        shape = (size, num_envs)
+        self._tensors = {}
+        self._shared = shared
+        self.obs_buf = self._zeros(combined_shape(size, (num_envs, *obs_dim)), 'obs')
+        self.act_buf = self._zeros(combined_shape(size, (num_envs, *act_dim)), 'act')
+        self.adv_buf = self._zeros(shape, 'adv')
+        self.rew_buf = self._zeros(shape)
+        self.ret_buf = self._zeros(shape, 'ret')
+        self.val_buf = self._zeros(shape)
+        self.logp_buf = self._zeros(shape, 'logp')
+        # end of trajectory after a step, and the value to bootstrap it with
+        self.end_buf = self._zeros(shape, dtype=torch.bool)
+        self.last_val_buf = self._zeros(shape)
+        self.gamma, self.lam = gamma, lam
+        self.ptr, self.max_size = 0, size
+
+    def _zeros(self, shape, name=None, dtype=torch.float32):
+        tensor = torch.zeros(shape, dtype=dtype)
+        if self._shared:
+            tensor.share_memory_()
+        if name is not None:
+            # (timestep, env) -> one flat batch, as a view
+            self._tensors[name] = tensor.view(-1, *shape[2:])
+        return tensor.numpy()
+
+    def env_slice(self, start, stop):
+        """
+        A buffer that stores into the columns of envs ``start:stop`` of this
+        one (views, not copies), for a rollout worker running those envs.
+        Only ``store`` and ``finish_paths`` are meant to be used on it.
+        """
+        view = copy.copy(self)
+        for name in self._step_bufs:
+            setattr(view, name, getattr(self, name)[:, start:stop])
+        view.ptr = 0
+        return view
+
+    def store(self, obs, act, rew, val, logp):
+        """
+        Append one timestep of agent-environment interaction to the buffer
+        (one row per env).
+        """
+        assert self.ptr < self.max_size     # buffer has to have room so you can store
+        self.obs_buf[self.ptr] = obs
+        self.act_buf[self.ptr] = act
+        self.rew_buf[self.ptr] = rew
+        self.val_buf[self.ptr] = val
+        self.logp_buf[self.ptr] = logp
+        self.ptr += 1
+
+    def finish_paths(self, done, last_val):
+        """
+        Call this at the end of trajectories, or when they get cut off
+        by an epoch ending. ``done`` is the mask of the envs whose trajectory
+        ends with the last stored step.
+
+        The "last_val" entry of an env should be 0 if the trajectory ended
+        because the agent reached a terminal state (died), and otherwise
+        should be V(s_T), the value function estimated for the last state.
+        This allows us to bootstrap the reward-to-go calculation to account
+        for timesteps beyond the arbitrary episode horizon (or epoch cutoff).
+        """
+        self.end_buf[self.ptr - 1] |= done
+        self.last_val_buf[self.ptr - 1] = np.where(done, last_val, 0)
+
+    def _advantages(self):
+        # GAE-Lambda advantages and rewards-to-go (value function targets)
+        adv, ret = gae_lambda(self.rew_buf, self.val_buf, self.end_buf,
+                              self.last_val_buf, self.gamma, self.lam)
+        self.ret_buf[:] = ret
+        return adv
+
+    def get(self):
+        """
+        Call this at the end of an epoch to get all of the data from
+        the buffer, with advantages appropriately normalized (shifted to have
+        mean zero and std one). Also, resets some pointers in the buffer.
+        """
+        assert self.ptr == self.max_size    # buffer has to be full before you can get
+        assert self.end_buf[-1].all()       # every trajectory has to be finished
+        self.ptr = 0
+        adv = self._advantages()
+        self.end_buf[:] = False
+        # the next two lines implement the advantage normalization trick
+        adv_mean, adv_std = mpi_statistics_scalar(adv)
+        self.adv_buf[:] = (adv - adv_mean) / adv_std
+        return dict(self._tensors)
+
+
+class CPPOBuffer(PPOBuffer):
+    """
+    A :class:`PPOBuffer` that also stores the CVaR statistic ``d_pi`` of
+    every step. The learner computes the CVaR penalties of all steps from
+    it (see cvar.py) into ``valupdate_buf`` before ``get``, which takes
+    them off the advantages.
+    """
+
+    _step_bufs = PPOBuffer._step_bufs + ('dpi_buf',)
+
+    def __init__(self, obs_dim, act_dim, size, gamma=0.99, lam=0.95, num_envs=1,
+                 shared=False):
+        super().__init__(obs_dim, act_dim, size, gamma, lam, num_envs, shared)
+        shape = (self.max_size, num_envs)
+        self.valupdate_buf = self._zeros(shape)
+        self.dpi_buf = self._zeros(shape, dtype=torch.float64)
+
+    def store(self, obs, act, rew, val, d_pi, logp):
+        """
+        Append one timestep of agent-environment interaction to the buffer
+        (one row per env), with the CVaR statistic ``d_pi`` of the step.
+        """
+        self.dpi_buf[self.ptr] = d_pi
+        super().store(obs, act, rew, val, logp)
+
+    def _advantages(self):
+        # CVaR penalties, as the single-env CPPOBuffer took them: every
+        # finish_path took the penalties of the whole buffer off the
+        # advantages, so a step is penalized once for the end of its own
+        # trajectory and once for every later one of its env
+        ends = np.cumsum(self.end_buf[::-1], axis=0)[::-1]
+        return super()._advantages() - ends * self.valupdate_buf
@@ -0,0 +1,199 @@
+"""Command line of the training entry point.
+
+Run from the FinRL_DeepSeek-main directory::
+
+    python -m finrl_deepseek configs/cppo_llm_risk.json
+    python -m finrl_deepseek configs/ppo.json --set train.epochs=10 --set env.num_envs=8
+    python -m finrl_deepseek configs/ppo.json --print-config
+
+or with MPI, as the train_*.py scripts::
+
+    mpirun -np 4 python -m finrl_deepseek configs/ppo.json
+
+The train_*.py scripts train their config of ``configs/`` with
+:func:`script_main`, which keeps their flags (``--hid``, ``--seed``, ...).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+
+from finrl_deepseek.config import VARIANTS, resolve_config
+
+
+def make_env(config, market, seed=None):
+    """The ``BatchedStockTradingEnv`` of a resolved run config on ``market``."""
+    from action_shaping import SHAPING_PRESETS, ActionShaping
+    from env_stocktrading_batched import BatchedStockTradingEnv
+
+    from finrl_deepseek.data import indicators_of
+
+    variant = VARIANTS[config["variant"]]
+    env = config["env"]
+    stock_dim = market.n_tickers
+    shaping = SHAPING_PRESETS[variant["shaping"]] if "shaping" in variant else None
+    if env["shaping"] is not None:
+        shaping = ActionShaping.from_sentiment(**{
+            factor: env["shaping"].get(factor, 1.0)
+            for factor in ("strong_mismatch", "moderate_mismatch", "strong_match",
+                           "moderate_match", "neutral")})
+    return BatchedStockTradingEnv(
+        df=None,
+        market=market,
+        stock_dim=stock_dim,
+        hmax=env["hmax"],
+        initial_amount=env["initial_amount"],
+        num_stock_shares=[0] * stock_dim,
+        buy_cost_pct=[env["cost_pct"]] * stock_dim,
+        sell_cost_pct=[env["cost_pct"]] * stock_dim,
+        reward_scaling=env["reward_scaling"],
+        state_space=1 + 2 * stock_dim + market.obs_feature_size,
+        action_space=stock_dim,
+        tech_indicator_list=indicators_of(market, config["variant"]),
+        num_envs=env["num_envs"],
+        turbulence_threshold=env["turbulence_threshold"],
+        risk_indicator_col=env["risk_indicator_col"],
+        llm_sentiment_col=variant.get("llm_sentiment_col"),
+        llm_risk_col=variant.get("llm_risk_col"),
+        action_shaping=shaping,
+        random_start=env["random_start"],
+        seed=config["seed"] if seed is None else seed,
+    )
+
+
+def train(config, logger_kwargs=None, on_epoch=None):
+    """
+    Train the agent of a resolved run config and save its weights to
+    ``config["model_path"]``. Returns the trained actor-critic.
+    ``on_epoch`` is passed on to ``ppo()``.
+    """
+    import serial_mpi
+    serial_mpi.install_if_missing()
+    import torch
+    from spinup.utils.mpi_tools import proc_id
+    from spinup.utils.run_utils import setup_logger_kwargs
+
+    from finrl_deepseek import algos
+    from finrl_deepseek.data import load_market
+
+    market = load_market(config, rank=proc_id(), barrier=serial_mpi.barrier())
+    env_train = make_env(config, market)
+    print(f"Stock Dimension: {market.n_tickers}, "
+          f"State Space: {env_train.observation_space.shape[0]}", flush=True)
+
+    if logger_kwargs is None:
+        logger_kwargs = setup_logger_kwargs(config["exp_name"], config["seed"])
+    model = config["model"]
+    ac_kwargs = dict(hidden_sizes=model["hidden_sizes"],
+                     activation=getattr(torch.nn, model["activation"]),
+                     step_compile=model["step_compile"])
+    algo = algos.ppo if config["algo"] == "ppo" else algos.cppo
+    ac = algo(lambda: env_train, ac_kwargs=ac_kwargs, seed=config["seed"],
+              logger_kwargs=logger_kwargs,
+              checkpoint_dir=config["checkpoint_dir"] if config["checkpoint_freq"] else None,
+              checkpoint_freq=max(config["checkpoint_freq"], 1), resume=config["resume"],
+              on_epoch=on_epoch, **config["train"])
+
+    if proc_id() == 0:
+        os.makedirs(os.path.dirname(config["model_path"]) or ".", exist_ok=True)
+        torch.save(ac.state_dict(), config["model_path"])
+        print("Training finished and saved in " + config["model_path"])
+    return ac
+
+
+# flags of the train_*.py scripts -> config entries they override
+SCRIPT_FLAGS = {
+    "seed": "seed",
+    "exp_name": "exp_name",
+    "gamma": "train.gamma",
+    "steps": "train.steps_per_epoch",
+    "epochs": "train.epochs",
+    "num_envs": "env.num_envs",
+    "minibatch_size": "train.minibatch_size",
+    "update_epochs": "train.update_epochs",
+    "grad_accum": "train.grad_accum_steps",
+    "workers": "train.rollout_workers",
+    "compile_step": "model.step_compile",
+    "checkpoint_dir": "checkpoint_dir",
+    "checkpoint_freq": "checkpoint_freq",
+}
+
+
+def script_overrides(args, config):
+    """The config overrides of the parsed flags of a train_*.py script."""
+    from finrl_deepseek.config import nested
+
+    overrides = [nested(key, getattr(args, flag)) for flag, key in SCRIPT_FLAGS.items()
+                 if getattr(args, flag) is not None]
+    if args.hid is not None or args.l is not None:
+        hidden_sizes = config["model"]["hidden_sizes"]
+        hid = hidden_sizes[0] if args.hid is None else args.hid
+        layers = len(hidden_sizes) if args.l is None else args.l
+        overrides.append(nested("model.hidden_sizes", [hid] * layers))
+    if args.random_start:
+        overrides.append(nested("env.random_start", True))
+    if args.no_overlap:
+        overrides.append(nested("train.overlap_rollouts", False))
+    if args.resume:
+        overrides.append({"resume": True})
+    return overrides
+
+
+def script_main(config, argv=None):
+    """
+    Command line of the train_*.py scripts: train the run config file
+    ``config`` with the scripts' flags (``--hid``, ``--l``, ``--seed``,
+    ``--steps``, ``--epochs``, ``--num_envs``, ...) applied on top.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_envs', type=int)  # portfolios stepped together in one process
+    parser.add_argument('--random_start', action='store_true')  # start each episode on a random day
+    parser.add_argument('--hid', type=int)  # width of the hidden layers
+    parser.add_argument('--l', type=int)  # number of hidden layers
+    parser.add_argument('--gamma', type=float)
+    parser.add_argument('--seed', '-s', type=int)
+    parser.add_argument('--cpu', type=int)  # unused: start the MPI processes with mpirun
+    parser.add_argument('--exp_name', type=str)
+    parser.add_argument('--steps', type=int)  # steps per epoch
+    parser.add_argument('--epochs', type=int)
+    parser.add_argument('--minibatch_size', type=int)  # minibatch SGD instead of full-batch steps
+    parser.add_argument('--update_epochs', type=int)  # passes over the data per update (minibatch mode)
+    parser.add_argument('--grad_accum', type=int)  # minibatches per allreduce / optimizer step
+    parser.add_argument('--workers', type=int)  # rollout worker processes (no MPI needed), 0: roll out here
+    parser.add_argument('--no_overlap', action='store_true')  # workers wait for the update instead of collecting ahead
+    parser.add_argument('--compile_step', type=str)  # rollout step function: script or compile
+    parser.add_argument('--checkpoint_dir', type=str)  # default: trained_models/checkpoints/<exp_name>_s<seed>
+    parser.add_argument('--checkpoint_freq', type=int)  # epochs between checkpoints, 0: none
+    parser.add_argument('--resume', action='store_true')  # continue from the latest checkpoint
+    parser.add_argument('-f', '--file', type=str, help='Kernel connection file')
+    parser.add_argument('extra_args', nargs=argparse.REMAINDER)  # Catch-all for unrecognized arguments
+    args = parser.parse_args(argv)
+
+    base = resolve_config(config)
+    return train(resolve_config(config, script_overrides(args, base)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m finrl_deepseek",
+        description="Train a PPO / CPPO trading agent from a JSON or YAML run config.")
+    parser.add_argument('config', nargs='?', help='run config file (default: all defaults)')
+    parser.add_argument('--set', dest='overrides', action='append', default=[],
+                        metavar='KEY=VALUE', help='override a config entry, e.g. train.epochs=10')
+    parser.add_argument('--resume', action='store_true')  # continue from the latest checkpoint
+    parser.add_argument('--print-config', action='store_true')  # show the resolved config and exit
+    args = parser.parse_args(argv)
+
+    overrides = list(args.overrides)
+    if args.resume:
+        overrides.append({"resume": True})
+    try:
+        config = resolve_config(args.config, overrides)
+    except ValueError as err:
+        parser.error(str(err))
+    if args.print_config:
+        print(json.dumps(config, indent=2))
+        return None
+    return train(config)
@@ -0,0 +1,199 @@
+"""Run configurations of the training entry point.
+
+A configuration is a JSON (or, with PyYAML installed, YAML) mapping with
+the sections of :data:`DEFAULTS`::
+
+    {
+      "algo": "cppo",
+      "variant": "llm_risk",
+      "exp_name": "cppo_deepseek_risk",
+      "env": {"num_envs": 8},
+      "train": {"epochs": 100, "steps_per_epoch": 20000}
+    }
+
+Anything not given takes its default from :data:`DEFAULTS` and from the
+``variant`` (see :data:`VARIANTS`), and the ``train`` section is passed
+on as keyword arguments to ``ppo()`` / ``cppo()``, whose own defaults
+apply to what it leaves out.  Only the standard library is imported here,
+so reading and checking a configuration is fast.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+
+# env variants: the training and trade (backtest) data (files of the
+# benstaf/nasdaq_2013_2023 dataset on Hugging Face, or local .csv / .arrow /
+# .parquet files), the LLM score columns in the state, the action shaping
+# preset (see action_shaping.py) and the weights of the LLM risk scores 1 to
+# 5 in the CPPO constraint (see algos.llm_risk_factor)
+VARIANTS = {
+    "plain": dict(dataset="train_data_2013_2018.csv",
+                  trade_dataset="trade_data_2019_2023.csv"),
+    "llm": dict(dataset="train_data_deepseek_sentiment_2013_2018.csv",
+                trade_dataset="trade_data_deepseek_sentiment_2019_2023.csv",
+                llm_sentiment_col="llm_sentiment", shaping="llm"),
+    "llm_1": dict(dataset="train_data_deepseek_sentiment_2013_2018.csv",
+                  trade_dataset="trade_data_deepseek_sentiment_2019_2023.csv",
+                  llm_sentiment_col="llm_sentiment", shaping="llm_1"),
+    "llm_01": dict(dataset="train_data_deepseek_sentiment_2013_2018.csv",
+                   trade_dataset="trade_data_deepseek_sentiment_2019_2023.csv",
+                   llm_sentiment_col="llm_sentiment", shaping="llm_01"),
+    "llama": dict(dataset="train_data_llama_sentiment_2013_2018.csv",
+                  trade_dataset="trade_data_llama_sentiment_2019_2023.csv",
+                  llm_sentiment_col="llm_sentiment", shaping="llama"),
+    "llm_risk": dict(dataset="train_data_deepseek_risk_2013_2018.csv",
+                     trade_dataset="trade_data_deepseek_risk_2019_2023.csv",
+                     llm_sentiment_col="llm_sentiment", llm_risk_col="llm_risk",
+                     shaping="llm_risk", risk_weights=[0.99, 0.995, 1.0, 1.005, 1.01]),
+    "llm_risk_1": dict(dataset="train_data_deepseek_risk_2013_2018.csv",
+                       trade_dataset="trade_data_deepseek_risk_2019_2023.csv",
+                       llm_sentiment_col="llm_sentiment", llm_risk_col="llm_risk",
+                       shaping="llm_risk_1", risk_weights=[0.99, 0.995, 1.0, 1.005, 1.01]),
+    "llm_risk_01": dict(dataset="train_data_deepseek_risk_2013_2018.csv",
+                        trade_dataset="trade_data_deepseek_risk_2019_2023.csv",
+                        llm_sentiment_col="llm_sentiment", llm_risk_col="llm_risk",
+                        shaping="llm_risk_01", risk_weights=[0.999, 0.9995, 1.0, 1.0005, 1.001]),
+    "llama_risk": dict(dataset="train_data_llama_risk_2013_2018.csv",
+                       trade_dataset="trade_data_llama_risk_2019_2023.csv",
+                       llm_sentiment_col="llm_sentiment", llm_risk_col="llm_risk",
+                       shaping="llama_risk", risk_weights=[0.95, 0.975, 1.0, 1.025, 1.05]),
+    # local files of train_trade_data_qwen_risk.py
+    "qwen_risk": dict(dataset="train_data_qwen_risk.csv",
+                      trade_dataset="trade_data_qwen_risk.csv",
+                      llm_sentiment_col="llm_sentiment", llm_risk_col="llm_risk",
+                      shaping="llm_risk", risk_weights=[0.9, 0.95, 1.0, 1.05, 1.1]),
+}
+
+ALGOS = ("ppo", "cppo")
+
+DEFAULTS = {
+    "algo": "ppo",
+    "variant": "plain",
+    "dataset": None,  # default: the variant's
+    "trade_dataset": None,  # backtest data, default: the variant's
+    "market_cache": "market_cache",  # memory-mapped market tensors, one directory per dataset
+    "indicators": None,  # default: finrl.config.INDICATORS (only read to build a tensor)
+    "exp_name": None,  # default: <algo>_<variant>
+    "seed": 42,
+    "env": {
+        "num_envs": 1,
+        "random_start": False,
+        "hmax": 100,
+        "initial_amount": 1000000,
+        "cost_pct": 0.001,
+        "reward_scaling": 1e-4,
+        "turbulence_threshold": None,
+        "risk_indicator_col": "turbulence",  # compared to turbulence_threshold
+        # None: the variant's action shaping, or the factors of
+        # ActionShaping.from_sentiment (strong_mismatch, moderate_mismatch,
+        # strong_match, moderate_match, neutral; 1.0 where not given)
+        "shaping": None,
+    },
+    "model": {
+        "hidden_sizes": [512, 512],
+        "activation": "Tanh",  # a torch.nn activation module
+        "step_compile": None,  # None, "script" or "compile" (see policy_step.py)
+    },
+    "train": {},  # ppo() / cppo() keyword arguments
+    "checkpoint_dir": None,  # default: <model_dir>/checkpoints/<exp_name>_s<seed>
+    "checkpoint_freq": 1,  # epochs between checkpoints, 0: none
+    "resume": False,
+    "model_dir": "trained_models",
+    "model_path": None,  # default: <model_dir>/agent_<exp_name>.pth
+}
+
+
+# sections whose keys are not checked against DEFAULTS
+OPEN_SECTIONS = ("train", "env.shaping")
+
+
+def _merge(base, update, path=""):
+    merged = copy.deepcopy(base)
+    for key, value in update.items():
+        if key not in base and path.rstrip(".") not in OPEN_SECTIONS:
+            raise ValueError(f"unknown config key {path + key!r}")
+        if isinstance(base.get(key), dict) and isinstance(value, dict):
+            merged[key] = _merge(base[key], value, path + key + ".")
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def read_config_file(path):
+    """The mapping in a ``.json``, ``.yaml`` or ``.yml`` file."""
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("YAML configs need PyYAML (pip install pyyaml), "
+                                  "or write the config as JSON") from None
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path} does not hold a mapping")
+    return config
+
+
+def nested(key, value):
+    """``("train.epochs", 10)`` -> ``{"train": {"epochs": 10}}``."""
+    for part in reversed(key.split(".")):
+        value = {part: value}
+    return value
+
+
+def parse_override(item):
+    """``"train.epochs=10"`` -> ``{"train": {"epochs": 10}}``; values are
+    read as JSON, and taken as strings if they are not valid JSON."""
+    key, sep, value = item.partition("=")
+    if not sep or not key:
+        raise ValueError(f"override {item!r} is not of the form key=value")
+    try:
+        value = json.loads(value)
+    except json.JSONDecodeError:
+        pass
+    return nested(key, value)
+
+
+def resolve_config(config=None, overrides=()):
+    """
+    The complete configuration for ``config`` (a mapping, or the path of a
+    config file) with ``overrides`` (mappings, or ``key=value`` strings)
+    applied on top, and the defaults of its algorithm and variant filled in.
+    Raises ``ValueError`` for unknown keys, algorithms and variants.
+    """
+    if config is None:
+        config = {}
+    elif isinstance(config, (str, os.PathLike)):
+        config = read_config_file(config)
+    resolved = _merge(DEFAULTS, config)
+    for override in overrides:
+        if isinstance(override, str):
+            override = parse_override(override)
+        resolved = _merge(resolved, override)
+
+    if resolved["algo"] not in ALGOS:
+        raise ValueError(f"unknown algo {resolved['algo']!r}, use one of {ALGOS}")
+    if resolved["variant"] not in VARIANTS:
+        raise ValueError(f"unknown variant {resolved['variant']!r}, "
+                         f"use one of {sorted(VARIANTS)}")
+    variant = VARIANTS[resolved["variant"]]
+    if resolved["dataset"] is None:
+        resolved["dataset"] = variant["dataset"]
+    if resolved["trade_dataset"] is None:
+        resolved["trade_dataset"] = variant["trade_dataset"]
+    if resolved["exp_name"] is None:
+        resolved["exp_name"] = f"{resolved['algo']}_{resolved['variant']}"
+    if resolved["checkpoint_dir"] is None:
+        resolved["checkpoint_dir"] = os.path.join(
+            resolved["model_dir"], "checkpoints", f"{resolved['exp_name']}_s{resolved['seed']}")
+    if resolved["model_path"] is None:
+        resolved["model_path"] = os.path.join(
+            resolved["model_dir"], f"agent_{resolved['exp_name']}.pth")
+    if resolved["algo"] == "cppo" and "risk_weights" in variant:
+        resolved["train"].setdefault("risk_weights", variant["risk_weights"])
+    return resolved
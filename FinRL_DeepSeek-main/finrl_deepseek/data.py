@@ -0,0 +1,96 @@
+"""Market data of a run, as a memory-mapped market tensor.
+
+The first run on a dataset loads it (a local ``.arrow`` / ``.parquet`` /
+``.csv`` file, a columnar copy of the CSV next to it, or the CSV from the
+benstaf/nasdaq_2013_2023 dataset on Hugging Face), builds the
+``MarketTensor`` the envs step on and saves it under ``market_cache``, in
+a directory keyed on the dataset, indicators and score columns it is built
+from.
+Every later run, and every other MPI rank or rollout worker, maps the saved
+tensor and never imports pandas' readers, ``datasets`` or ``finrl``.
+Delete the cache directory to rebuild it after the data changes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+from finrl_deepseek.config import VARIANTS
+
+HF_DATASET = "benstaf/nasdaq_2013_2023"
+
+
+def llm_cols(variant):
+    spec = VARIANTS[variant]
+    return [spec[key] for key in ("llm_sentiment_col", "llm_risk_col") if key in spec]
+
+
+def load_frame(dataset):
+    """The day-indexed frame of ``dataset``, with missing LLM scores filled."""
+    from dataset_cache import SCORE_FILL, index_by_day, read_dataset
+
+    if os.path.exists(dataset):
+        return read_dataset(dataset)
+    stem = os.path.splitext(dataset)[0]
+    for ext in (".arrow", ".parquet"):
+        if os.path.exists(stem + ext):
+            return read_dataset(stem + ext)
+
+    import pandas as pd
+    from datasets import load_dataset
+
+    frame = index_by_day(pd.DataFrame(load_dataset(HF_DATASET, data_files=dataset)["train"]))
+    for col, value in SCORE_FILL.items():
+        if col in frame.columns:
+            frame[col] = frame[col].fillna(value)
+    return frame
+
+
+def build_params(config):
+    """The dataset and the columns the ``MarketTensor`` of ``config`` is built from."""
+    return dict(dataset=config["dataset"],
+                indicators=config["indicators"],  # None: finrl's INDICATORS
+                llm_cols=llm_cols(config["variant"]),
+                risk_indicator_col=(config["env"]["risk_indicator_col"]
+                                    if config["env"]["turbulence_threshold"] is not None
+                                    else None))
+
+
+def cache_path(config):
+    """
+    The directory of the tensor of ``config``: the dataset name and a short
+    hash of its :func:`build_params`, so that runs on other indicators or
+    score columns never attach to a tensor built without them.
+    """
+    params = build_params(config)
+    name = os.path.splitext(os.path.basename(params["dataset"]))[0]
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(config["market_cache"], f"{name}_{digest}")
+
+
+def load_market(config, rank=0, barrier=None):
+    """
+    The ``MarketTensor`` of a resolved run config, built from the dataset by
+    rank 0 if it is not cached yet (see ``MarketTensor.attach``).
+    """
+    from market_tensor import MarketTensor
+
+    def build():
+        params = build_params(config)
+        indicators = params["indicators"]
+        if indicators is None:
+            from finrl.config import INDICATORS as indicators
+        return MarketTensor(load_frame(params["dataset"]), indicators,
+                            llm_cols=params["llm_cols"],
+                            risk_indicator_col=params["risk_indicator_col"])
+
+    os.makedirs(config["market_cache"], exist_ok=True)
+    return MarketTensor.attach(cache_path(config), build, rank=rank, barrier=barrier)
+
+
+def indicators_of(market, variant):
+    """The technical indicator columns of a tensor built for ``variant``."""
+    cols = llm_cols(variant)
+    return market.feature_cols[1:len(market.feature_cols) - len(cols)]
@@ -0,0 +1,296 @@
+"""Hyperparameter sweeps: many training runs of one config on the local cores.
+
+A sweep config (JSON or YAML) names a base run config and the entries to
+vary, as dotted keys of the run config (see config.py)::
+
+    {
+      "base": "configs/ppo_llm.json",
+      "set": {"train.epochs": 30, "train.steps_per_epoch": 8000},
+      "grid": {"env.shaping.strong_match": [1.02, 1.04, 1.1],
+               "env.shaping.strong_mismatch": [0.9, 0.96, 0.98]},
+      "random": {"train.pi_lr": {"loguniform": [1e-5, 3e-4]},
+                 "train.clip_ratio": {"uniform": [0.2, 0.7]}},
+      "trials": 2,
+      "early_stop": {"min_epochs": 5, "quantile": 0.5}
+    }
+
+Every point of the ``grid`` is run ``trials`` times with the ``random``
+entries drawn anew (``uniform``, ``loguniform``, ``randint`` [low, high] or
+``choice`` [values]; a plain list is a choice).  Trial ``n`` trains with
+the seed of the base config plus ``n``, so the trials of a grid point are
+independent replicates, unless the sweep sets or varies ``seed`` itself.
+Trials run in a process
+pool of ``workers`` processes (default: one per core) that share the
+memory-mapped market tensor, built once before the first trial starts.
+
+With ``early_stop`` a trial stops after an epoch (from ``min_epochs`` on)
+in which its mean EpRet is below the ``quantile`` of the other trials at
+the same epoch, once ``min_trials`` of them got that far (the median
+stopping rule for ``quantile`` 0.5).
+
+Each trial logs to ``<output_dir>/trials/<n>/`` (progress.txt, output.log,
+model.pth); ``<output_dir>/results.csv`` lists the trials and their seeds
+best first by their last EpRet.  Run from the FinRL_DeepSeek-main directory::
+
+    python -m finrl_deepseek.sweep configs/sweep_ppo_llm_shaping.json
+    python -m finrl_deepseek.sweep configs/sweep_ppo_llm_shaping.json --workers 4 --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import contextlib
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from finrl_deepseek.config import nested, read_config_file, resolve_config
+
+SWEEP_DEFAULTS = {
+    "base": None,  # run config (path or mapping) the trials start from
+    "set": {},  # dotted key -> value, the same for all trials
+    "grid": {},  # dotted key -> list of values, every combination is run
+    "random": {},  # dotted key -> distribution, drawn for every trial
+    "trials": 1,  # trials per grid point
+    "seed": 0,  # of the random draws
+    "workers": None,  # trials run at once, default: one per core
+    "torch_threads": None,  # per trial, default: cores / workers
+    "early_stop": None,  # {"min_epochs": 5, "quantile": 0.5, "min_trials": 3}
+    "output_dir": None,  # default: sweeps/<name of the sweep config>
+}
+
+EARLY_STOP_DEFAULTS = {"min_epochs": 5, "quantile": 0.5, "min_trials": 3}
+
+RESULT_FIELDS = ("trial", "seed", "status", "epochs", "final_ep_ret", "best_ep_ret", "seconds")
+
+
+def num_cores():
+    """Cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def sample(distribution, rng):
+    """One draw from a distribution of a sweep's ``random`` section."""
+    if isinstance(distribution, list):
+        distribution = {"choice": distribution}
+    if not isinstance(distribution, dict) or len(distribution) != 1:
+        raise ValueError(f"unknown distribution {distribution!r}")
+    (kind, args), = distribution.items()
+    if kind == "choice":
+        return args[rng.integers(len(args))]
+    low, high = args
+    if kind == "uniform":
+        return float(rng.uniform(low, high))
+    if kind == "loguniform":
+        return float(math.exp(rng.uniform(math.log(low), math.log(high))))
+    if kind == "randint":
+        return int(rng.integers(low, high + 1))
+    raise ValueError(f"unknown distribution {kind!r}, use uniform, loguniform, randint or choice")
+
+
+def trial_params(sweep):
+    """The varied entries of every trial of a sweep: a list of {dotted key: value}."""
+    rng = np.random.default_rng(sweep["seed"])
+    keys = list(sweep["grid"])
+    params = []
+    for values in itertools.product(*(sweep["grid"][key] for key in keys)):
+        for _ in range(sweep["trials"]):
+            drawn = dict(zip(keys, values))
+            for key, distribution in sweep["random"].items():
+                drawn[key] = sample(distribution, rng)
+            params.append(drawn)
+    return params
+
+
+def resolve_sweep(sweep, path=None):
+    """
+    A sweep config (mapping or path) with its defaults filled in and the
+    run config of every trial, as ``(sweep, [(params, run config), ...])``.
+    Raises ``ValueError`` for unknown keys, as :func:`resolve_config`.
+    """
+    if isinstance(sweep, (str, os.PathLike)):
+        path, sweep = sweep, read_config_file(sweep)
+    unknown = set(sweep) - set(SWEEP_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown sweep keys {sorted(unknown)}")
+    sweep = {**SWEEP_DEFAULTS, **sweep}
+    if sweep["output_dir"] is None:
+        name = os.path.splitext(os.path.basename(path))[0] if path else "sweep"
+        sweep["output_dir"] = os.path.join("sweeps", name)
+    if sweep["early_stop"] is not None:
+        sweep["early_stop"] = {**EARLY_STOP_DEFAULTS, **sweep["early_stop"]}
+
+    fixed = [nested(key, value) for key, value in sweep["set"].items()]
+    base_seed = resolve_config(sweep["base"], fixed)["seed"]
+    trials = []
+    for n, params in enumerate(trial_params(sweep)):
+        trial_dir = os.path.join(sweep["output_dir"], "trials", f"{n:03d}")
+        # one seed per trial, unless the sweep sets or varies it
+        seed = {} if "seed" in sweep["set"] or "seed" in params else {"seed": base_seed + n}
+        overrides = fixed + [nested(key, value) for key, value in params.items()] + [{
+            **seed,
+            "exp_name": f"trial_{n:03d}",
+            "checkpoint_freq": 0,
+            "resume": False,
+            "model_path": os.path.join(trial_dir, "model.pth"),
+        }]
+        trials.append((params, resolve_config(sweep["base"], overrides)))
+    return sweep, trials
+
+
+class EarlyStop:
+    """
+    The ``on_epoch`` callback of one trial: records the trial's mean EpRet
+    of each epoch in ``history`` (shared by all trials, trial -> list of
+    EpRet) and returns ``False`` when the trial falls below the
+    ``quantile`` of the others at the same epoch.
+    """
+
+    def __init__(self, trial, history, min_epochs=5, quantile=0.5, min_trials=3):
+        self.trial = trial
+        self.history = history
+        self.min_epochs = min_epochs
+        self.quantile = quantile
+        self.min_trials = min_trials
+        self.ep_rets = []
+
+    def __call__(self, epoch, ep_ret):
+        self.ep_rets.append(float(ep_ret))
+        self.history[self.trial] = self.ep_rets  # a Manager dict stores copies
+        if self.quantile is None or len(self.ep_rets) < self.min_epochs or np.isnan(ep_ret):
+            return True
+        index = len(self.ep_rets) - 1
+        others = [rets[index] for trial, rets in self.history.items()
+                  if trial != self.trial and len(rets) > index and not np.isnan(rets[index])]
+        if len(others) < self.min_trials:
+            return True
+        return bool(ep_ret >= np.quantile(others, self.quantile))
+
+
+def run_trial(trial, config, history, early_stop, torch_threads):
+    """Train one trial in a pool process; returns its row of the results table."""
+    import torch
+
+    from finrl_deepseek.cli import train
+
+    torch.set_num_threads(torch_threads)
+    trial_dir = os.path.dirname(config["model_path"])
+    os.makedirs(trial_dir, exist_ok=True)
+    callback = EarlyStop(trial, history, **(early_stop or dict(quantile=None)))
+    start = time.time()
+    status = "completed"
+    with open(os.path.join(trial_dir, "output.log"), "w") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            train(config, logger_kwargs=dict(output_dir=trial_dir, exp_name=config["exp_name"]),
+                  on_epoch=callback)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            status = "failed"
+    epochs = config["train"].get("epochs", 100)
+    if status == "completed" and len(callback.ep_rets) < epochs:
+        status = "stopped"
+    ep_rets = [ret for ret in callback.ep_rets if not np.isnan(ret)]
+    return dict(trial=trial, seed=config["seed"], status=status, epochs=len(callback.ep_rets),
+                final_ep_ret=ep_rets[-1] if ep_rets else float("nan"),
+                best_ep_ret=max(ep_rets) if ep_rets else float("nan"),
+                seconds=round(time.time() - start, 1))
+
+
+def write_results(rows, params, path):
+    """Write the results table to ``path`` best first; returns the sorted rows."""
+    keys = sorted({key for p in params for key in p})
+    rows = sorted(rows, key=lambda row: (row["status"] == "failed",
+                                         -np.nan_to_num(row["final_ep_ret"], nan=-np.inf)))
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_FIELDS + tuple(keys))
+        for row in rows:
+            writer.writerow([row[field] for field in RESULT_FIELDS]
+                            + [params[row["trial"]].get(key, "") for key in keys])
+    return rows
+
+
+def sweep(sweep_config, workers=None):
+    """
+    Run all trials of a sweep config (mapping or path); returns the rows of
+    the results table, best first.
+    """
+    from finrl_deepseek.data import cache_path, load_market
+
+    sweep_config, trials = resolve_sweep(sweep_config)
+    workers = min(workers or sweep_config["workers"] or num_cores(), len(trials))
+    torch_threads = sweep_config["torch_threads"] or max(num_cores() // workers, 1)
+    output_dir = sweep_config["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+    params = [p for p, _ in trials]
+    with open(os.path.join(output_dir, "sweep.json"), "w") as f:
+        json.dump(dict(sweep=sweep_config, trials=params), f, indent=2)
+
+    # build every market tensor the trials need before they start, so that
+    # they all attach to the same memory-mapped files
+    built = set()
+    for _, config in trials:
+        if cache_path(config) not in built:
+            load_market(config)
+            built.add(cache_path(config))
+
+    print(f"{len(trials)} trials, {workers} at a time, {torch_threads} torch threads each",
+          flush=True)
+    rows = []
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        history = manager.dict()
+        with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as pool:
+            futures = [pool.submit(run_trial, n, config, history,
+                                   sweep_config["early_stop"], torch_threads)
+                       for n, (_, config) in enumerate(trials)]
+            for future in concurrent.futures.as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                print(f"trial {row['trial']:03d} {row['status']} after {row['epochs']} epochs: "
+                      f"EpRet {row['final_ep_ret']:.4g} ({row['seconds']:.0f} s)", flush=True)
+                write_results(rows, params, os.path.join(output_dir, "results.csv"))
+    return write_results(rows, params, os.path.join(output_dir, "results.csv"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m finrl_deepseek.sweep",
+        description="Run a grid / random hyperparameter sweep of PPO / CPPO on the local cores.")
+    parser.add_argument('config', help='sweep config file')
+    parser.add_argument('--workers', type=int, default=None, help='trials run at once')
+    parser.add_argument('--dry-run', action='store_true')  # list the trials and exit
+    args = parser.parse_args(argv)
+
+    try:
+        sweep_config, trials = resolve_sweep(args.config)
+    except ValueError as err:
+        parser.error(str(err))
+    if args.dry_run:
+        for n, (params, config) in enumerate(trials):
+            print(f"{n:03d} seed {config['seed']} {json.dumps(params)}")
+        return None
+
+    rows = sweep(args.config, workers=args.workers)
+    print(f"\nresults in {os.path.join(sweep_config['output_dir'], 'results.csv')}:")
+    writer = csv.writer(sys.stdout, delimiter="\t")
+    with open(os.path.join(sweep_config["output_dir"], "results.csv")) as f:
+        writer.writerows(csv.reader(f))
+    return rows
+
+
+if __name__ == "__main__":
+    main()
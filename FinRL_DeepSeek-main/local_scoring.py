@@ -0,0 +1,261 @@
+"""Local CPU scoring of news, a :class:`~news_scoring.Scorer` without an API.
+
+A local model is a function ``model(texts) -> scores`` (1 to 5) made by a
+backend factory: a name of :data:`BACKENDS` or ``"module:function"``,
+called with the keyword arguments of the scorer in every worker process.
+The built-in ``finbert`` backend runs a transformers sequence classifier
+(by default ``ProsusAI/finbert``, or a local directory) on the CPU, int8
+quantized, and maps its class probabilities to the 1 to 5 scale: a
+negative / neutral / positive classifier gives the rounded expected value
+of 1 / 3 / 5, a classifier with 5 classes (e.g. one fine-tuned on the
+DeepSeek scores, as a risk model must be) its most likely class.  A
+``LocalScorer`` of the ``risk`` task refuses a classifier of sentiment
+classes.
+
+:class:`LocalScorer` collects the batches :func:`news_scoring.score_csv`
+hands it, from any symbols, into dynamic batches of up to ``max_batch``
+texts (or what arrived within ``max_wait`` seconds) and scores them on a
+pool of ``workers`` processes with ``threads`` torch threads each::
+
+    python sentiment_deepseek_deepinfra.py --backend finbert --workers 8 --output sentiment_finbert.csv
+    python compare_scores.py sentiment_deepseek_nasdaq_news_full.csv sentiment_finbert.csv
+
+The symbol is not part of a classifier's input; the scores are cached
+under the task, the backend, its model and its arguments.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import hashlib
+import importlib
+import json
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+from news_scoring import SCORE_RANGE, Scorer
+
+BACKENDS = {"finbert": "local_scoring:finbert"}
+
+# what a local model scores, on the 1 to 5 scale of the scripts' prompts
+TASKS = ("sentiment", "risk")
+
+# 1 to 5 value of the class labels of sentiment classifiers
+LABEL_SCORES = {"negative": 1, "somewhat negative": 2, "neutral": 3,
+                "somewhat positive": 4, "positive": 5}
+
+
+def label_scores(labels, task="sentiment"):
+    """
+    The 1 to 5 value of each class label: named sentiment classes by
+    :data:`LABEL_SCORES` (for the ``sentiment`` task only), else 5 classes
+    in the order of the scale.
+    """
+    labels = [str(label).lower().replace("_", " ") for label in labels]
+    if all(label in LABEL_SCORES for label in labels):
+        if task != "sentiment":
+            raise ValueError(f"the classes {labels} are sentiment classes, a {task} model "
+                             f"needs 5 classes in the order of the 1 to 5 {task} scale")
+        return np.array([LABEL_SCORES[label] for label in labels], dtype=np.float64)
+    if len(labels) == 5:
+        return np.arange(1, 6, dtype=np.float64)
+    raise ValueError(f"cannot map the classes {labels} to the 1 to 5 scale")
+
+
+def finbert(model="ProsusAI/finbert", quantize=True, max_length=256, batch_size=64):
+    """
+    A transformers sequence classifier (hub name or local directory) as a
+    local model.  Texts are scored ``batch_size`` at a time in order of
+    length, so each batch pads little.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    net = AutoModelForSequenceClassification.from_pretrained(model).eval()
+    if quantize:
+        net = torch.ao.quantization.quantize_dynamic(net, {torch.nn.Linear}, dtype=torch.qint8)
+    config = net.config
+    values = label_scores([config.id2label[i] for i in range(config.num_labels)])
+    expected = not (len(values) == 5 and np.array_equal(values, np.arange(1, 6)))
+
+    def score(texts):
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        probs = np.empty((len(texts), len(values)))
+        with torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                rows = order[start:start + batch_size]
+                inputs = tokenizer([texts[i] for i in rows], padding=True, truncation=True,
+                                   max_length=max_length, return_tensors="pt")
+                probs[rows] = net(**inputs).logits.softmax(-1).numpy()
+        if expected:
+            return np.clip(np.rint(probs @ values), 1, 5).astype(int).tolist()
+        return values[probs.argmax(axis=1)].astype(int).tolist()
+
+    return score
+
+
+def check_classes(model, task):
+    """Raise ``ValueError`` if the classes of a transformers classifier do not fit ``task``."""
+    from transformers import AutoConfig
+
+    config = AutoConfig.from_pretrained(model)
+    label_scores([config.id2label[i] for i in range(config.num_labels)], task)
+
+
+def backend_factory(backend):
+    """The ``(module, function)`` of a backend name or ``module:function``."""
+    module, _, function = BACKENDS.get(backend, backend).partition(":")
+    if not module or not function:
+        raise ValueError(f"unknown local backend {backend!r} (not in {sorted(BACKENDS)} "
+                         f"nor module:function)")
+    return module, function
+
+
+def load_backend(backend, **kwargs):
+    """The local model of a backend name or ``module:function``."""
+    module, function = backend_factory(backend)
+    return getattr(importlib.import_module(module), function)(**kwargs)
+
+
+_model = None
+
+
+def _load(backend, kwargs, threads):
+    # worker initializer: one model per process
+    global _model
+    try:
+        import torch
+    except ImportError:
+        pass
+    else:
+        torch.set_num_threads(threads)
+    _model = load_backend(backend, **kwargs)
+
+
+def _score(texts):
+    # nan for what is not a whole score of the scale, as in parse_scores
+    scores = []
+    for score in _model(texts):
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            score = np.nan
+        scores.append(int(score) if score in SCORE_RANGE else np.nan)
+    return (scores + [np.nan] * len(texts))[:len(texts)]
+
+
+class LocalScorer(Scorer):
+    """
+    Scores news with a local model (see :func:`load_backend`) on a pool of
+    ``workers`` processes (default: one per ``threads`` cores), in dynamic
+    batches of up to ``max_batch`` texts.  Outputs that are not a score of
+    the 1 to 5 scale, and every text of a batch whose model call raises,
+    score nan.
+
+    ``task`` (one of :data:`TASKS`) is what the model scores; it is part of
+    the cache keys, and the built-in ``finbert`` backend raises
+    ``ValueError`` for a model whose classes do not fit it.
+    """
+
+    def __init__(self, backend="finbert", workers=None, threads=1, max_batch=256,
+                 max_wait=0.05, version=None, task="sentiment", **backend_kwargs):
+        if task not in TASKS:
+            raise ValueError(f"unknown task {task!r}, use one of {TASKS}")
+        backend_factory(backend)
+        name = backend_kwargs.get("model", backend)
+        if BACKENDS.get(backend, backend) == BACKENDS["finbert"]:
+            check_classes(backend_kwargs.get("model", "ProsusAI/finbert"), task)
+        spec = json.dumps([task, backend, backend_kwargs], sort_keys=True)
+        super().__init__(f"local:{name}",
+                         version or hashlib.sha256(spec.encode()).hexdigest()[:12])
+        self.backend = backend
+        self.backend_kwargs = backend_kwargs
+        if workers is None:
+            try:
+                cores = len(os.sched_getaffinity(0))
+            except AttributeError:
+                cores = os.cpu_count() or 1
+            workers = max(cores // threads, 1)
+        self.workers = workers
+        self.threads = threads
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pool = None
+
+    def _start(self):
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=mp.get_context("spawn"), initializer=_load,
+            initargs=(self.backend, self.backend_kwargs, self.threads))
+        self._queue = []
+        self._queued = 0
+        self._timer = None
+
+    async def score(self, symbol, texts):
+        """
+        Scores of the ``texts``, once their dynamic batch was scored; nan
+        for the 0 entries (no text), which are not sent.
+        """
+        scores = [np.nan] * len(texts)
+        keep = [i for i, text in enumerate(texts) if text != 0]
+        texts = [str(texts[i]) for i in keep]
+        if not texts:
+            return scores
+        if self._pool is None:
+            self._start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((texts, future))
+        self._queued += len(texts)
+        if self._queued >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._dispatch)
+        for i, score in zip(keep, await future):
+            scores[i] = score
+        return scores
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        queue, self._queue, self._queued = self._queue, [], 0
+        if not queue:
+            return
+        texts = [text for batch, _ in queue for text in batch]
+        self.stats.requests += 1
+        self.stats.sent += len(texts)
+        try:
+            done = asyncio.wrap_future(self._pool.submit(_score, texts))
+        except Exception as err:  # a broken pool takes no more batches
+            done = asyncio.get_running_loop().create_future()
+            done.set_exception(err)
+
+        def resolve(done):
+            if done.cancelled():
+                for _, future in queue:
+                    future.cancel()
+                return
+            if done.exception() is not None:
+                # the batch failed: nan scores, as for a failed API request
+                print(f"Error: {done.exception()!r}")
+                self.stats.failed += 1
+                scores = [np.nan] * len(texts)
+            else:
+                scores = done.result()
+            start = 0
+            for batch, future in queue:
+                if not future.done():
+                    future.set_result(scores[start:start + len(batch)])
+                start += len(batch)
+
+        done.add_done_callback(resolve)
+
+    async def aclose(self):
+        """Stop the worker processes; a later run starts new ones."""
+        if self._pool is not None:
+            self._dispatch()
+            await asyncio.to_thread(self._pool.shutdown)
+            self._pool = None
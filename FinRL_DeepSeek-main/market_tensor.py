@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import weakref
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+@dataclass(frozen=True)
+class MarketSpec:
+    """Universe metadata of a trading DataFrame, computed once.
+
+    ``tickers`` and ``dates`` are in env order (``dates[day]`` is the date of
+    day index ``day``) and ``day_index`` maps a date back to its day.
+    Instances are immutable and shared by every env built on the same data.
+    """
+
+    tickers: tuple[str, ...]
+    dates: np.ndarray
+    day_index: Mapping[str, int]
+
+    @property
+    def n_days(self) -> int:
+        return len(self.dates)
+
+    @property
+    def stock_dim(self) -> int:
+        return len(self.tickers)
+
+    @property
+    def multi_stock(self) -> bool:
+        return len(self.tickers) > 1
+
+
+class MarketTensor:
+    """Dense day x ticker x feature copy of a day-indexed trading DataFrame.
+
+    The environments index their DataFrame by day (``df.loc[day, :]`` returns
+    one row per ticker).  Looking rows up through pandas on every step is the
+    bulk of the step cost for a ~100 ticker universe, so the columns the env
+    needs are copied once into a NumPy array of shape
+    ``(n_days, n_tickers, n_features)`` with features ordered as
+    ``["close"] + tech_indicator_list + llm_cols``.
+
+    Internally the data is kept feature-major (``(n_days, n_features,
+    n_tickers)``) so that the per-day observation block, which the env lays
+    out one indicator after the other, is a single contiguous slice.
+
+    The arrays are read-only, so one tensor can back any number of envs:
+    :meth:`shared` returns the tensor already built for the same DataFrame
+    and columns instead of copying the data again.  Across processes (MPI
+    ranks), :meth:`save` writes the tensor to ``.npy`` files once and
+    :meth:`load` / :meth:`attach` map them read-only, so every rank uses the
+    same pages of the OS page cache instead of its own copy.
+    """
+
+    _shared = {}  # (id(df), columns, dtype) -> MarketTensor
+
+    @classmethod
+    def shared(
+        cls,
+        df: pd.DataFrame,
+        tech_indicator_list: list[str],
+        llm_cols: tuple[str, ...] = (),
+        risk_indicator_col: str | None = None,
+        dtype=np.float64,
+    ) -> MarketTensor:
+        """Tensor of ``df`` built once per DataFrame and set of columns.
+
+        Envs created on the same DataFrame object (train and eval envs,
+        vectorized copies) share the result; the cache entry goes away with
+        the DataFrame.  ``df`` must not be modified once an env uses it.
+        """
+        key = (
+            id(df),
+            tuple(tech_indicator_list),
+            tuple(llm_cols),
+            risk_indicator_col,
+            np.dtype(dtype).str,
+        )
+        market = cls._shared.get(key)
+        if market is None:
+            market = cls(df, tech_indicator_list, llm_cols, risk_indicator_col, dtype)
+            cls._shared[key] = market
+            weakref.finalize(df, cls._shared.pop, key, None)
+        return market
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        tech_indicator_list: list[str],
+        llm_cols: tuple[str, ...] = (),
+        risk_indicator_col: str | None = None,
+        dtype=np.float64,
+    ):
+        self.feature_cols = ["close"] + list(tech_indicator_list) + list(llm_cols)
+
+        day_labels = df.index.to_numpy()
+        order = np.argsort(day_labels, kind="stable")
+        days, counts = np.unique(day_labels, return_counts=True)
+        if not (counts == counts[0]).all():
+            raise ValueError("every day must list the same number of tickers")
+        self.n_days = len(days)
+        self.n_tickers = int(counts[0])
+
+        tics = df["tic"].to_numpy()[order].reshape(self.n_days, self.n_tickers)
+        if not (tics == tics[0]).all():
+            raise ValueError("tickers must appear in the same order on every day")
+
+        first_rows = order[:: self.n_tickers]
+        if risk_indicator_col is not None:
+            turbulence = df[risk_indicator_col].to_numpy(dtype=dtype)[first_rows]
+        else:
+            turbulence = None
+        values = df[self.feature_cols].to_numpy(dtype=dtype)[order]
+        values = values.reshape(self.n_days, self.n_tickers, len(self.feature_cols))
+        self._set_arrays(
+            tics[0].copy(),
+            df["date"].to_numpy()[first_rows],
+            turbulence,
+            np.ascontiguousarray(values.transpose(0, 2, 1)),
+        )
+
+    def _set_arrays(self, tickers, dates, turbulence, feature_major):
+        self.n_days, _, self.n_tickers = feature_major.shape
+        self.tickers = _read_only(tickers)
+        self.dates = _read_only(dates)
+        self.turbulence = None if turbulence is None else _read_only(turbulence)
+        self.spec = MarketSpec(
+            tickers=tuple(self.tickers.tolist()),
+            dates=self.dates,
+            day_index=MappingProxyType(
+                {date: day for day, date in enumerate(self.dates.tolist())}
+            ),
+        )
+        self._feature_major = _read_only(feature_major)
+        self._feature_index = {col: i for i, col in enumerate(self.feature_cols)}
+
+    def save(self, path: str):
+        """Write the tensor to the directory ``path`` (one ``.npy`` per array).
+
+        The files are written to a temporary directory first and renamed into
+        place, so a concurrent :meth:`load` never sees a partial tensor.  Put
+        ``path`` on ``/dev/shm`` to keep it in shared memory instead of on disk.
+        """
+        tmp = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, "features.npy"), self._feature_major)
+        np.save(os.path.join(tmp, "tickers.npy"), self.tickers.astype(str))
+        np.save(os.path.join(tmp, "dates.npy"), self.dates.astype(str))
+        if self.turbulence is not None:
+            np.save(os.path.join(tmp, "turbulence.npy"), self.turbulence)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"feature_cols": self.feature_cols}, f)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # another process saved it first
+            shutil.rmtree(tmp)
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                raise
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str | None = "r") -> MarketTensor:
+        """Tensor saved by :meth:`save`, memory-mapped read-only by default."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        turbulence_path = os.path.join(path, "turbulence.npy")
+        market = cls.__new__(cls)
+        market.feature_cols = meta["feature_cols"]
+        market._set_arrays(
+            np.load(os.path.join(path, "tickers.npy")),
+            np.load(os.path.join(path, "dates.npy")),
+            (
+                np.load(turbulence_path, mmap_mode=mmap_mode)
+                if os.path.exists(turbulence_path)
+                else None
+            ),
+            np.load(os.path.join(path, "features.npy"), mmap_mode=mmap_mode),
+        )
+        return market
+
+    @classmethod
+    def attach(cls, path: str, build, rank: int = 0, barrier=None) -> MarketTensor:
+        """Memory-mapped tensor at ``path``, built by rank 0 if missing.
+
+        ``build()`` returns the ``MarketTensor`` to save and is only called on
+        rank 0, and only when ``path`` holds no tensor yet, so the other ranks
+        never load the source data.  ``barrier`` (e.g. ``MPI.COMM_WORLD.Barrier``)
+        makes them wait for it.  Delete ``path`` to rebuild after the data
+        changes.
+        """
+        if rank == 0 and not os.path.exists(os.path.join(path, "meta.json")):
+            build().save(path)
+        if barrier is not None:
+            barrier()
+        return cls.load(path)
+
+    def check_columns(
+        self,
+        tech_indicator_list: list[str],
+        llm_cols: tuple[str, ...] = (),
+        risk_indicator_col: str | None = None,
+    ):
+        """Raise ``ValueError`` if the tensor lacks the columns an env needs."""
+        feature_cols = ["close"] + list(tech_indicator_list) + list(llm_cols)
+        if self.feature_cols != feature_cols:
+            raise ValueError(
+                f"market tensor has features {self.feature_cols}, the env needs {feature_cols}"
+            )
+        if risk_indicator_col is not None and self.turbulence is None:
+            raise ValueError("market tensor has no risk indicator column")
+
+    @property
+    def values(self) -> np.ndarray:
+        """``(n_days, n_tickers, n_features)`` view of the market data."""
+        return self._feature_major.transpose(0, 2, 1)
+
+    @property
+    def obs_feature_size(self) -> int:
+        """Length of the per-day block written after cash, prices and holdings."""
+        return (len(self.feature_cols) - 1) * self.n_tickers
+
+    # ``day`` may also be an array of days (one per env of a batched env), in
+    # which case the results get a leading axis of the same length.
+
+    def close(self, day) -> np.ndarray:
+        return self._feature_major[day, 0]
+
+    def column(self, day, col: str) -> np.ndarray:
+        return self._feature_major[day, self._feature_index[col]]
+
+    def obs_features(self, day) -> np.ndarray:
+        """Indicators and LLM scores of ``day``, one feature after the other."""
+        return self._feature_major[day, 1:].reshape(*np.shape(day), self.obs_feature_size)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Daily LLM scores per ticker, from the per-article scores of the scoring
+# scripts (a scores CSV, or the parts directory of news_store.score_store).
+#
+# Each article goes to the trading session it can first act on: news
+# published before the close (16:00 New York time) of a trading day to that
+# day, news after the close, on a weekend or a holiday to the next trading
+# day of the calendar.  DailyNews maps all articles onto the env's day x
+# ticker grid at once; reduce() then gives one float32 (n_days, n_tickers)
+# matrix per reducer, nan where a ticker has no news that day:
+#
+#   mean      mean of the scores
+#   maxabs    the score farthest from the neutral 3 (the latest on ties)
+#   recency   mean weighted by 0.5 ** (hours before the close / half_life)
+#   count     number of scored articles (int32, 0 without news)
+#
+# add_daily_scores() adds a reduced score as one column of a train/trade
+# frame, by day and ticker, so every market row stays a single row.
+#
+#   python news_aggregation.py sentiment_deepseek.csv --market train_data_deepseek_risk_2013_2018.csv --reducer mean maxabs count
+
+from __future__ import annotations
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+REDUCERS = ("mean", "maxabs", "recency", "count")
+
+NEWS_TZ = "America/New_York"
+MARKET_CLOSE = "16:00"
+
+_HOUR = np.int64(3600 * 10**9)
+
+
+def _days(dates):
+    return pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[D]")
+
+
+def _timestamps(dates):
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return pd.to_datetime(pd.Series(dates), utc=True)
+    from news_store import parse_dates
+
+    return parse_dates(dates)
+
+
+def session_days(timestamps, calendar, close=MARKET_CLOSE, tz=NEWS_TZ):
+    """
+    Index into the sorted trading days ``calendar`` of the session each
+    timestamp (UTC, or naive UTC) first trades on; -1 for timestamps without
+    a date, before the first or after the last session.
+    """
+    calendar = _days(calendar)
+    local = _timestamps(timestamps).dt.tz_convert(tz)
+    day = local.dt.tz_localize(None).dt.normalize()
+    after = (local - local.dt.normalize()) >= pd.Timedelta(close + ":00")
+    day = (day + pd.to_timedelta(after.astype(np.int64), unit="D")).to_numpy()
+    known = ~np.isnat(day)
+    day = day.astype("datetime64[D]")
+    index = np.searchsorted(calendar, day, side="left")
+    known &= (index < len(calendar)) & (day >= calendar[0])
+    return np.where(known, index, -1)
+
+
+class DailyNews:
+    """
+    Scored articles (``dates``, ``symbols``, ``scores``) placed on the day x
+    ticker grid of the trading days ``grid_dates`` and the ``tickers``.
+    Sessions are the days of ``calendar`` (default: the grid's), so a split
+    of the data can take the full trading calendar and only keep its own
+    days.  Articles of other tickers or days, or without a score, are
+    counted in ``dropped``.
+    """
+
+    def __init__(self, dates, symbols, scores, grid_dates, tickers, calendar=None,
+                 close=MARKET_CLOSE, tz=NEWS_TZ):
+        grid = _days(grid_dates)
+        calendar = grid if calendar is None else np.unique(_days(calendar))
+        self.dates = grid
+        self.tickers = np.asarray(tickers)
+        self.shape = (len(grid), len(self.tickers))
+
+        timestamps = _timestamps(dates)
+        session = session_days(timestamps, calendar, close, tz)
+        day = np.searchsorted(grid, calendar[np.maximum(session, 0)])
+        day = np.minimum(day, len(grid) - 1)
+        tic = pd.Categorical(np.asarray(symbols), categories=self.tickers).codes
+        scores = pd.to_numeric(pd.Series(scores), errors="coerce").to_numpy(np.float64)
+        keep = ((session >= 0) & (grid[day] == calendar[np.maximum(session, 0)])
+                & (tic >= 0) & ~np.isnan(scores))
+        self.dropped = int((~keep).sum())
+
+        self.cell = (day * self.shape[1] + tic)[keep]
+        self.scores = scores[keep]
+        utc = timestamps.dt.tz_localize(None).to_numpy().astype("datetime64[ns]")
+        self.time = utc.view(np.int64)[keep]
+        # close of each article's session, in ns since the epoch (UTC)
+        closes = (pd.DatetimeIndex(calendar) + pd.Timedelta(close + ":00")).tz_localize(tz)
+        closes = closes.tz_convert("UTC").tz_localize(None).to_numpy().view(np.int64)
+        self.close = closes[session[keep]]
+        self.counts = np.bincount(self.cell, minlength=grid.size * self.shape[1])
+
+    def __len__(self):
+        return len(self.cell)
+
+    def _cells(self, values):
+        return np.bincount(self.cell, weights=values, minlength=self.counts.size)
+
+    def reduce(self, reducer="mean", half_life=24.0, center=3.0):
+        """The (n_days, n_tickers) matrix of a reducer of :data:`REDUCERS`."""
+        if reducer == "count":
+            return self.counts.astype(np.int32).reshape(self.shape)
+        if reducer == "mean":
+            weights = np.ones_like(self.scores)
+        elif reducer == "recency":
+            hours = (self.close - self.time) / _HOUR
+            weights = 0.5 ** (hours / half_life)
+        elif reducer == "maxabs":
+            # sorted by cell, then distance from the center, then time: last of each cell
+            order = np.lexsort((self.time, np.abs(self.scores - center), self.cell))
+            cells = self.cell[order]
+            last = np.append(cells[1:] != cells[:-1], True) if len(cells) else cells
+            matrix = np.full(self.counts.size, np.nan, dtype=np.float32)
+            matrix[cells[last]] = self.scores[order][last]
+            return matrix.reshape(self.shape)
+        else:
+            raise ValueError(f"unknown reducer {reducer!r}, use one of {REDUCERS}")
+        total = self._cells(weights)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            matrix = self._cells(weights * self.scores) / total
+        return np.where(total > 0, matrix, np.nan).astype(np.float32).reshape(self.shape)
+
+
+def as_int8(matrix, fill=0):
+    """A score matrix rounded to int8, ``fill`` where it is nan."""
+    return np.where(np.isnan(matrix), fill, np.rint(matrix)).astype(np.int8)
+
+
+def read_news_scores(path, column=None):
+    """
+    ``Date``, ``Stock_symbol`` and the score ``column`` (default: the
+    last) of a scores CSV or of the parts directory of a news store.
+    """
+    if os.path.isdir(path):
+        from news_store import read_scores
+
+        frame = read_scores(path)
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        names = {name.capitalize(): name for name in header}
+        frame = pd.read_csv(path, usecols=[names["Date"], names["Stock_symbol"],
+                                           column or header[-1]],
+                            on_bad_lines='warn')
+        frame = frame.rename(columns={names["Date"]: "Date",
+                                      names["Stock_symbol"]: "Stock_symbol"})
+    column = column or frame.columns[-1]
+    return frame[["Date", "Stock_symbol", column]]
+
+
+def daily_news(frame, news, column, calendar=None, **kwargs):
+    """:class:`DailyNews` of the scores ``news[column]`` on the grid of a train/trade frame."""
+    return DailyNews(news["Date"], news["Stock_symbol"], news[column],
+                     np.unique(_days(frame["date"])), np.unique(frame["tic"].to_numpy()),
+                     calendar, **kwargs)
+
+
+def add_daily_scores(frame, news, column, name, reducer="mean", calendar=None,
+                     half_life=24.0, **kwargs):
+    """
+    ``frame`` (a train/trade frame) with the ``reducer`` of the scores
+    ``news[column]`` of each row's day and ticker as column ``name``:
+    rounded to whole scores, nan without news.  ``date`` becomes a datetime
+    column, as with the old merge.
+    """
+    daily = daily_news(frame, news, column, calendar, **kwargs)
+    matrix = daily.reduce(reducer, half_life)
+    if reducer != "count":
+        matrix = np.rint(matrix)
+    day = np.searchsorted(daily.dates, _days(frame["date"]))
+    tic = pd.Categorical(frame["tic"].to_numpy(), categories=daily.tickers).codes
+    return frame.assign(date=pd.to_datetime(frame["date"]), **{name: matrix[day, tic]})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('scores', help='scores CSV, or scores directory of a news store')
+    parser.add_argument('--column', default=None, help='score column (default: the last)')
+    parser.add_argument('--market', required=True,
+                        help='train/trade dataset (.csv, .arrow or .parquet) giving the grid')
+    parser.add_argument('--reducer', nargs='+', default=['mean'], choices=REDUCERS)
+    parser.add_argument('--half_life', type=float, default=24.0, help='hours, for recency')
+    parser.add_argument('--int8', type=int, default=None, metavar='FILL',
+                        help='store scores rounded to int8, FILL without news')
+    parser.add_argument('--output', default=None, help='.npz of the matrices')
+    args = parser.parse_args()
+
+    from dataset_cache import read_dataset
+
+    market = read_dataset(args.market, fill_scores=False)
+    news = read_news_scores(args.scores, args.column)
+    daily = daily_news(market, news, news.columns[-1])
+    print(f"{len(news)} articles: {len(daily)} on a grid of {daily.shape[0]} days x "
+          f"{daily.shape[1]} tickers, {daily.dropped} dropped; "
+          f"{(daily.counts > 0).mean():.1%} of cells with news")
+    arrays = {"dates": daily.dates.astype(str), "tickers": daily.tickers.astype(str)}
+    for reducer in args.reducer:
+        matrix = daily.reduce(reducer, args.half_life)
+        if args.int8 is not None and reducer != "count":
+            matrix = as_int8(matrix, args.int8)
+        arrays[reducer] = matrix
+    output = args.output or os.path.splitext(args.scores.rstrip("/"))[0] + "_daily.npz"
+    np.savez_compressed(output, **arrays)
+    print(f"-> {output}: {', '.join(args.reducer)}")
@@ -0,0 +1,624 @@
+"""Concurrent LLM scoring of news, for the sentiment / risk scripts.
+
+``sentiment_deepseek_deepinfra.py`` and ``risk_deepseek_deepinfra.py`` send
+one batch of news at a time and wait for its answer.  :class:`AsyncScorer`
+keeps up to ``concurrency`` requests in flight on an ``AsyncOpenAI`` client
+instead, paced by token buckets (requests per second and tokens per
+minute, the two limits API providers enforce), and retries failed requests
+with exponential backoff and full jitter.  :func:`score_csv` feeds it the
+batches of the input CSV and still writes the output in input order, so
+the output file is that of the scripts' ``process_csv``.
+
+The output is appended in small batches (``commit_every`` rows), each
+fsynced and then recorded in a :class:`ResumeLog` next to it.  Rows are
+identified by their position among the parsed rows of the input, so a
+restarted run skips exactly the rows already committed, without reading
+the output, and cuts a batch that was only half written when it stopped.
+
+Requests are packed: the texts to send are grouped by symbol and each
+request carries as many of one symbol's texts as fit a ``token_budget``
+(counted with tiktoken when installed, else about 4 characters per
+token).  Texts whose score is missing or unreadable in an answer are sent
+again, alone among themselves, up to ``max_requeues`` times.
+
+Rows are scored by content: a text seen before (same model, prompt, symbol
+and text) takes its score from the :class:`~score_cache.ScoreCache`, and
+identical texts within the chunks in flight are sent once, their score
+fanned back out to every row that has them.
+
+Any OpenAI-compatible endpoint works (``base_url``), e.g. a local
+stand-in server for testing (see benchmark_news_scoring.py).  Other
+backends implement :class:`Scorer`, e.g. the local CPU models of
+local_scoring.py.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
+import json
+import math
+import os
+import random
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from score_cache import ScoreCache, content_key, prompt_version
+
+
+SCORE_RANGE = range(1, 6)
+
+# "2. 4", "2) 4", "2: 4" or "AAPL: 4"
+_LABELLED = re.compile(r"^(?:\d+\s*[.)]|[^:]*:)\s*(\S.*)$")
+
+
+def parse_scores(content, num_text, valid=SCORE_RANGE):
+    """
+    The integer scores of an answer, one per text: entries are separated by
+    commas, semicolons or newlines and may be numbered ("2. 4"), labelled
+    ("AAPL: 4") or bracketed.  nan where an entry is not an integer in ``valid``; padded
+    with nan (or cut) to ``num_text`` entries.
+    """
+    scores = []
+    for entry in re.split(r"[,;\n]", content):
+        entry = entry.strip().strip("[]().*").strip()
+        if not entry:
+            continue
+        labelled = _LABELLED.match(entry)
+        if labelled:
+            entry = labelled.group(1).strip("[]().*").strip()
+        try:
+            score = int(entry)
+        except ValueError:
+            score = None
+        if score in valid:
+            scores.append(score)
+        else:
+            print("content error, score was: " + entry)
+            scores.append(np.nan)
+    return (scores + [np.nan] * num_text)[:num_text]
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text):
+    """
+    Tokens of ``text``: tiktoken's cl100k_base count when tiktoken is
+    installed (close to, not exactly, the DeepSeek tokenizer), else one
+    per 4 characters.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenBucket:
+    """
+    ``rate`` tokens per second, at most ``capacity`` (default: one second's
+    worth) saved up.  ``await acquire(n)`` returns once ``n`` tokens were
+    taken; waiters are served in order.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1.0))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, n=1.0):
+        n = min(float(n), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                await asyncio.sleep((n - self._tokens) / self.rate)
+
+
+class ScoringStats:
+    """Throughput counters of a scoring run."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.rows = 0
+        self.cached = 0  # rows scored from the cache
+        self.duplicates = 0  # rows scored by the request of an identical row
+        self.sent = 0  # texts sent to the API
+        self.requeued = 0  # texts sent again for a missing or unreadable score
+        self.requests = 0
+        self.retries = 0
+        self.failed = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def report(self):
+        seconds = max(time.monotonic() - self.start, 1e-9)
+        tokens = self.prompt_tokens + self.completion_tokens
+        rows = max(self.rows, 1)
+        return (f"{self.rows} rows ({self.cached / rows:.1%} cached, "
+                f"{self.duplicates / rows:.1%} duplicates), {self.sent} texts "
+                f"({self.requeued} requeued) in {self.requests} requests "
+                f"({self.sent / max(self.requests, 1):.1f} texts/request, "
+                f"{self.retries} retries, {self.failed} failed) "
+                f"in {seconds:.1f} s: {self.rows / seconds:.1f} rows/s, "
+                f"{tokens / seconds:.0f} tokens/s")
+
+
+class Scorer:
+    """
+    A scoring backend of :func:`score_csv`: ``await score(symbol, texts)``
+    returns one score on the 1 to 5 scale (nan: none) per text, in order,
+    nan for a 0 (no text); :meth:`pack` splits the texts of one symbol into
+    the batches given to ``score``, and ``aclose()`` frees what the scorer started.  ``model``
+    and ``version`` name what produces the scores, for their cache keys;
+    ``stats`` counts the work done.
+    """
+
+    def __init__(self, model, version):
+        self.model = model
+        self.version = version
+        self.stats = ScoringStats()
+
+    def key(self, symbol, text):
+        """The cache key of the score of ``text`` about ``symbol``."""
+        return content_key(self.model, self.version, symbol, text)
+
+    def pack(self, symbol, texts, max_texts=None):
+        """The sizes of the batches of ``texts``, at most ``max_texts`` each."""
+        step = max_texts or max(len(texts), 1)
+        return [min(step, len(texts) - start) for start in range(0, len(texts), step)]
+
+    async def score(self, symbol, texts):
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class AsyncScorer(Scorer):
+    """
+    Scores batches of news with chat completions of ``model`` on an
+    OpenAI-compatible endpoint. ``conversation(symbol, texts)`` builds the
+    messages of a batch (the prompts of the scripts); its
+    :func:`~score_cache.prompt_version` (or ``version``) is part of the
+    cache keys of the scores.
+
+    A request holds at most ``token_budget`` prompt tokens (see
+    :meth:`pack`; None: no budget) and may answer with ``max_tokens``, or
+    4 per text if more.  Texts left without a readable score are sent again
+    ``max_requeues`` times.
+
+    At most ``concurrency`` requests are in flight, started at no more than
+    ``requests_per_second`` and ``tokens_per_minute`` (prompt estimated
+    with :func:`count_tokens`, plus the answer's limit); None: no limit.  Rate
+    limit, timeout, connection and server errors are retried up to
+    ``max_retries`` times after ``uniform(0, min(max_backoff, backoff *
+    2**attempt))`` seconds (or the server's ``Retry-After``); a batch that
+    still fails, or fails otherwise, scores nan, as in the scripts.
+    """
+
+    def __init__(self, conversation, model, client=None, api_key=None, base_url=None,
+                 concurrency=32, requests_per_second=None, tokens_per_minute=None,
+                 max_tokens=50, temperature=0, max_retries=6, backoff=1.0, max_backoff=60.0,
+                 timeout=60.0, version=None, token_budget=None, max_requeues=2):
+        self.client = client
+        self._own_client = client is None
+        self._client_kwargs = dict(api_key=api_key, base_url=base_url, timeout=timeout)
+        super().__init__(model, version or prompt_version(conversation))
+        self.conversation = conversation
+        self.max_tokens = max_tokens
+        self.token_budget = token_budget
+        self.max_requeues = max_requeues
+        self._overheads = {}
+        self.temperature = temperature
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self._semaphore = None
+
+    def _start(self):
+        import openai
+
+        self._retryable = (openai.RateLimitError, openai.APITimeoutError,
+                           openai.APIConnectionError, openai.InternalServerError)
+        self._error = openai.OpenAIError
+        if self._own_client:
+            # retries are ours, with jitter and shared rate limits
+            self.client = openai.AsyncOpenAI(max_retries=0, **self._client_kwargs)
+        # asyncio primitives are made on first use, inside the running loop
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._requests = (None if self.requests_per_second is None
+                          else TokenBucket(self.requests_per_second))
+        self._tokens = (None if self.tokens_per_minute is None
+                        else TokenBucket(self.tokens_per_minute / 60.0,
+                                         capacity=self.tokens_per_minute / 60.0 * 10))
+
+    async def aclose(self):
+        """Close the client made by the scorer; a later run makes a new one."""
+        if self._own_client and self.client is not None:
+            await self.client.close()
+            self.client = None
+        self._semaphore = None
+
+    def _retry_delay(self, err, attempt):
+        response = getattr(err, "response", None)
+        retry_after = None if response is None else response.headers.get("retry-after")
+        try:
+            return min(float(retry_after), self.max_backoff)
+        except (TypeError, ValueError):
+            return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def complete(self, messages, max_tokens=None):
+        """The answer to ``messages``, or None if the request failed."""
+        if self._semaphore is None:
+            self._start()
+        max_tokens = max_tokens or self.max_tokens
+        estimate = sum(count_tokens(m["content"]) for m in messages) + max_tokens
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                if self._requests is not None:
+                    await self._requests.acquire()
+                if self._tokens is not None:
+                    await self._tokens.acquire(estimate)
+                self.stats.requests += 1
+                try:
+                    completion = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=self.temperature,
+                        max_tokens=max_tokens,
+                    )
+                except self._retryable as err:
+                    if attempt == self.max_retries:
+                        print(f"Error: {err}")
+                        break
+                    self.stats.retries += 1
+                    await asyncio.sleep(self._retry_delay(err, attempt))
+                    continue
+                except self._error as err:
+                    print(f"Error: {err}")
+                    break
+                if completion.usage is not None:
+                    self.stats.prompt_tokens += completion.usage.prompt_tokens
+                    self.stats.completion_tokens += completion.usage.completion_tokens
+                try:
+                    return completion.choices[0].message.content
+                except (AttributeError, IndexError):
+                    print("response error")
+                    break
+        self.stats.failed += 1
+        return None
+
+    def _overhead(self, symbol):
+        # prompt tokens of a request about symbol without its texts, and per text
+        if symbol not in self._overheads:
+            def tokens(texts):
+                return sum(count_tokens(m["content"]) for m in self.conversation(symbol, texts))
+
+            one = tokens([""])
+            self._overheads[symbol] = one, max(tokens(["", ""]) - one, 0)
+        return self._overheads[symbol]
+
+    def pack(self, symbol, texts, max_texts=None):
+        """
+        Split the ``texts`` about ``symbol`` into requests, in order: each
+        takes texts while its prompt stays within the token budget and it
+        has at most ``max_texts`` of them (always at least one text).
+        Returns the number of texts of each request.
+        """
+        sizes, size, tokens = [], 0, 0
+        base, per_text = self._overhead(symbol)
+        for text in texts:
+            cost = per_text + count_tokens(str(text))
+            if size and ((max_texts is not None and size == max_texts)
+                         or (self.token_budget is not None
+                             and base + tokens + cost > self.token_budget)):
+                sizes.append(size)
+                size, tokens = 0, 0
+            size += 1
+            tokens += cost
+        if size:
+            sizes.append(size)
+        return sizes
+
+    async def score(self, symbol, texts):
+        """
+        Scores of the ``texts`` about ``symbol``, nan for those without one
+        and for the 0 entries (no text), which are not sent.  The texts an
+        answer leaves without a readable score (missing from a short answer,
+        or not an integer of the scale) are asked again.
+        """
+        scores = [np.nan] * len(texts)
+        todo = [i for i, text in enumerate(texts) if text != 0]
+        for attempt in range(self.max_requeues + 1):
+            if not todo:
+                break
+            if attempt:
+                self.stats.requeued += len(todo)
+            content = await self.complete(self.conversation(symbol, [texts[i] for i in todo]),
+                                          max(self.max_tokens, 4 * len(todo)))
+            self.stats.sent += len(todo)
+            if content is None:  # failed after its retries
+                break
+            for i, score in zip(todo, parse_scores(content, len(todo))):
+                scores[i] = score
+            todo = [i for i in todo if np.isnan(scores[i])]
+        return scores
+
+
+async def _score_batch(scorer, batch, futures, cache, in_flight):
+    # batch: (key, symbol, text) of one symbol; resolves the futures of its keys
+    try:
+        scores = await scorer.score(batch[0][1], [text for _, _, text in batch])
+    except BaseException as err:
+        for key, _, _ in batch:
+            if not futures[key].done():
+                futures[key].set_exception(err)
+            in_flight.pop(key, None)
+        raise
+    scores = (list(scores) + [np.nan] * len(batch))[:len(batch)]
+    for (key, _, _), score in zip(batch, scores):
+        if not futures[key].done():  # cancelled when the run stopped
+            futures[key].set_result(score)
+        in_flight.pop(key, None)
+    if cache is not None:
+        cache.put_many((key, score) for (key, _, _), score in zip(batch, scores))
+
+
+async def score_rows(scorer, symbols, texts, batch_size=5, cache=None, in_flight=None):
+    """
+    The scores of news rows (``symbols[i]``, ``texts[i]``).  Rows in the
+    ``cache`` are not sent; the other distinct texts are sent once, grouped
+    by symbol and packed into requests of up to ``batch_size`` texts (None:
+    no limit) within the scorer's token budget (:meth:`AsyncScorer.pack`).
+    ``in_flight`` (key -> future), shared by concurrent calls, lets them
+    wait for each other's requests instead of repeating them.
+    """
+    if in_flight is None:
+        in_flight = {}
+    loop = asyncio.get_running_loop()
+    keys = [scorer.key(symbol, text) for symbol, text in zip(symbols, texts)]
+    cached = {} if cache is None else cache.get_many(set(keys))
+    futures, todo = {}, []
+    for key, symbol, text in zip(keys, symbols, texts):
+        if key in cached or key in futures:
+            continue
+        if key in in_flight:
+            futures[key] = in_flight[key]
+            continue
+        futures[key] = in_flight[key] = loop.create_future()
+        todo.append((key, symbol, text))
+
+    by_symbol = {}
+    for item in todo:
+        by_symbol.setdefault(item[1], []).append(item)
+    batches = []
+    for symbol, items in by_symbol.items():
+        start = 0
+        for size in scorer.pack(symbol, [text for _, _, text in items], batch_size):
+            batches.append(items[start:start + size])
+            start += size
+    tasks = [asyncio.ensure_future(_score_batch(scorer, batch, futures, cache, in_flight))
+             for batch in batches]
+
+    stats = scorer.stats
+    stats.rows += len(keys)
+    stats.cached += sum(key in cached for key in keys)
+    stats.duplicates += len(keys) - sum(key in cached for key in keys) - len(todo)
+    scores = [cached[key] if key in cached else await futures[key] for key in keys]
+    await asyncio.gather(*tasks)
+    return scores
+
+
+class ResumeLog:
+    """
+    The progress of scoring an input CSV into an output CSV, as JSON lines
+    in ``path``: a header naming the input, then one ``{"rows", "bytes"}``
+    line per committed batch, written after the batch was appended to the
+    output and fsynced.  The input's first ``rows`` parsed rows are scored
+    and are the output's first ``bytes`` bytes; output beyond that is a
+    torn batch and is cut on opening.  Without a log, the rows of an
+    existing output (of an earlier version of the scripts) are counted once.
+    """
+
+    def __init__(self, path, input_csv_path, output_csv_path):
+        self.path = path
+        header = {"input": os.path.basename(input_csv_path),
+                  "input_size": os.path.getsize(input_csv_path)}
+        self.rows = self.bytes = 0
+        output_size = os.path.getsize(output_csv_path) if os.path.exists(output_csv_path) else 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            if not lines or json.loads(lines[0]) != header:
+                raise ValueError(f"{path} is the progress of another input than "
+                                 f"{input_csv_path}; remove it and {output_csv_path} to start over")
+            valid = 1
+            for line in lines[1:]:
+                try:
+                    entry = json.loads(line)
+                except ValueError:  # torn by a crash while writing it
+                    break
+                self.rows, self.bytes = entry["rows"], entry["bytes"]
+                valid += 1
+            lines = lines[:valid]
+            if output_size < self.bytes:
+                raise ValueError(f"{output_csv_path} is shorter than {path} records; "
+                                 f"remove both to start over")
+        else:
+            if output_size:
+                self.rows = len(pd.read_csv(output_csv_path, encoding="utf-8", on_bad_lines='warn'))
+                self.bytes = output_size
+            lines = [json.dumps(header), json.dumps({"rows": self.rows, "bytes": self.bytes})]
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        if output_size > self.bytes:
+            os.truncate(output_csv_path, self.bytes)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def commit(self, rows, output_bytes):
+        """Record that the first ``rows`` rows are the output's first ``output_bytes``."""
+        self._file.write(json.dumps({"rows": rows, "bytes": output_bytes}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.rows, self.bytes = rows, output_bytes
+
+    def close(self):
+        self._file.close()
+
+
+async def score_stream(batches, scorer, column, append, batch_size=5, max_pending=20,
+                       report_every=30.0, cache=None):
+    """
+    Score the ``Lsa_summary`` of every frame of ``batches`` (an iterator of
+    frames with ``Stock_symbol`` and ``Lsa_summary`` columns) into
+    ``column`` and hand the frames to ``append``, in order.  Up to
+    ``max_pending`` frames are scored concurrently (see :func:`score_rows`,
+    with the ``cache``, a :class:`ScoreCache` or its path); ``batches`` and
+    ``append`` run in worker threads, so requests keep flowing while they
+    parse or write.
+    """
+    if isinstance(cache, (str, os.PathLike)):
+        cache = ScoreCache(cache)
+    pending = collections.deque()
+    in_flight = {}
+    last_report = time.monotonic()
+
+    async def write(batch, scores):
+        batch[column] = await scores
+        if cache is not None:  # on the loop's thread, as the cache's connection
+            cache.commit()
+        await asyncio.to_thread(append, batch)
+
+    try:
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            pending.append((batch, asyncio.ensure_future(score_rows(
+                scorer, batch['Stock_symbol'].tolist(), batch['Lsa_summary'].tolist(),
+                batch_size, cache, in_flight))))
+            while len(pending) > max_pending:
+                await write(*pending.popleft())
+            if time.monotonic() - last_report > report_every:
+                print(scorer.stats.report(), flush=True)
+                last_report = time.monotonic()
+        while pending:
+            await write(*pending.popleft())
+    finally:
+        for _, scores in pending:
+            scores.cancel()
+    print(scorer.stats.report(), flush=True)
+    if cache is not None:
+        print(f"cache {cache.path}: {cache.hit_rate:.1%} hit rate, {len(cache)} scores",
+              flush=True)
+        cache.close()
+    return scorer.stats
+
+
+async def score_csv_async(input_csv_path, output_csv_path, scorer, column, batch_size=5,
+                          chunk_size=1000, chunks_in_flight=2, report_every=30.0, cache=None,
+                          commit_every=100):
+    """
+    Score the ``Lsa_summary`` of every row of the input CSV into ``column``
+    and append the rows to the output CSV, resuming at the first row not
+    committed to the :class:`ResumeLog` ``<output>.progress``.  The input
+    is parsed (by the C parser) ``chunk_size`` rows at a time; the rows of
+    up to ``chunks_in_flight`` chunks are scored concurrently (see
+    :func:`score_stream`) and written and committed in input order,
+    ``commit_every`` rows at a time.
+    """
+    log = ResumeLog(output_csv_path + ".progress", input_csv_path, output_csv_path)
+    if log.rows:
+        print(f"resuming at row {log.rows}", flush=True)
+    header = pd.read_csv(input_csv_path, encoding="utf-8", nrows=0).columns
+    chunks = pd.read_csv(input_csv_path, encoding="utf-8", chunksize=chunk_size,
+                         on_bad_lines='warn', header=0, names=header.str.capitalize())
+
+    def batches():
+        first_row = 0
+        for chunk in chunks:
+            # row ids: positions among the parsed rows, whatever lines the parser dropped
+            chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+            first_row += len(chunk)
+            chunk = chunk.iloc[max(log.rows - chunk.index[0], 0):]
+            for start in range(0, len(chunk), commit_every):
+                yield chunk.iloc[start:start + commit_every].copy()
+
+    output = open(output_csv_path, "a", encoding="utf-8", newline="")
+
+    def append(batch):
+        batch.to_csv(output, header=output.tell() == 0, index=False)
+        output.flush()
+        os.fsync(output.fileno())
+        log.commit(int(batch.index[-1]) + 1, output.tell())
+
+    try:
+        return await score_stream(batches(), scorer, column, append, batch_size,
+                                  chunks_in_flight * -(-chunk_size // commit_every),
+                                  report_every, cache)
+    finally:
+        output.close()
+        log.close()
+
+
+def run_scoring(scoring, scorer):
+    """Run the coroutine ``scoring`` to completion, then close its ``scorer``."""
+    async def run():
+        try:
+            return await scoring
+        finally:
+            await scorer.aclose()
+
+    return asyncio.run(run())
+
+
+def score_csv(input_csv_path, output_csv_path, scorer, *args, **kwargs):
+    """:func:`score_csv_async` run to completion."""
+    return run_scoring(score_csv_async(input_csv_path, output_csv_path, scorer, *args, **kwargs),
+                       scorer)
+
+
+def add_arguments(parser):
+    """Command line options of the scorer, for the scripts."""
+    parser.add_argument('--input', default='nasdaq_news_full.csv')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--model', default='deepseek-ai/DeepSeek-V3')
+    parser.add_argument('--base-url', default=os.environ.get(
+        "DEEPINFRA_BASE_URL", "https://api.deepinfra.com/v1/openai"))
+    parser.add_argument('--api-key', default=os.environ.get("DEEPINFRA_API_KEY", "mykey"))
+    parser.add_argument('--concurrency', type=int, default=32)  # requests in flight
+    parser.add_argument('--rps', type=float, default=None)  # requests per second
+    parser.add_argument('--tpm', type=float, default=None)  # tokens per minute
+    parser.add_argument('--max-retries', type=int, default=6)
+    parser.add_argument('--batch-size', type=int, default=50)  # most texts per request
+    parser.add_argument('--token-budget', type=int, default=4000)  # most prompt tokens per request
+    parser.add_argument('--backend', default='deepinfra',
+                        help="deepinfra, or a local model of local_scoring.py (e.g. finbert)")
+    parser.add_argument('--local-model', default=None)  # name or directory of the local model
+    parser.add_argument('--workers', type=int, default=None)  # local model processes
+    parser.add_argument('--cache', default='news_score_cache.sqlite')  # scores by content
+    parser.add_argument('--no-cache', dest='cache', action='store_const', const=None)
+    return parser
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Typed columnar copy of a raw news dump (nasdaq_news_full.csv) for the
+# scoring scripts.
+#
+# convert_news() parses the CSV once with pandas' C parser and writes one
+# Parquet file sorted by date, with a row group per month (or less): Date as
+# a UTC timestamp, text columns as strings, and Row, the position of each
+# row among the parsed rows of the CSV (the row id of news_scoring.py).
+# NewsStore yields its record batches and reports the read throughput;
+# score_store() scores them into a directory of Parquet parts (Row, Date,
+# Stock_symbol and the int8 score), one per committed batch, and resumes
+# after the last part.
+#
+#   python news_store.py nasdaq_news_full.csv          # -> nasdaq_news_full.parquet
+#   python sentiment_deepseek_deepinfra.py --input nasdaq_news_full.parquet
+#   python news_store.py --read nasdaq_news_full.parquet   # read throughput
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from news_scoring import run_scoring, score_stream
+
+# rows of a row group, at most (a month of the full dump is well below)
+ROW_GROUP_ROWS = 100_000
+
+_PART = re.compile(r"part-(\d+)-(\d+)\.parquet$")
+
+
+def parse_dates(values):
+    """
+    UTC timestamps of the dump's date strings ("2023-12-16 22:00:00 UTC"):
+    ISO 8601 with the zone name dropped, the fast path, else any format
+    pandas recognizes; NaT where none fits.
+    """
+    values = pd.Series(values, dtype="string")
+    dates = pd.to_datetime(values.str.removesuffix(" UTC"), utc=True, errors="coerce",
+                           format="ISO8601")
+    other = dates.isna() & values.notna()
+    if other.any():
+        dates[other] = pd.to_datetime(values[other], utc=True, errors="coerce", format="mixed")
+    return dates
+
+
+def _news_table(chunk, first_row):
+    import pyarrow as pa
+
+    chunk.insert(0, "Row", np.arange(first_row, first_row + len(chunk), dtype=np.int64))
+    dates = parse_dates(chunk["Date"])
+    chunk["Date"] = dates
+    # yyyymm, rows without a date last
+    chunk["Month"] = (dates.dt.year * 100 + dates.dt.month).fillna(999999).astype(np.int32)
+    return pa.Table.from_pandas(chunk, preserve_index=False)
+
+
+def convert_news(csv_path, store_path=None, chunk_size=200_000):
+    """
+    Write the news CSV ``csv_path`` as a Parquet store (default: next to
+    it, ``.parquet``) sorted by ``Date`` (then ``Row``), one row group per
+    month of at most :data:`ROW_GROUP_ROWS` rows.  Column names are
+    capitalized as the scripts expect.  Returns the store's path.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    store_path = store_path or os.path.splitext(csv_path)[0] + ".parquet"
+    header = pd.read_csv(csv_path, encoding="utf-8", nrows=0).columns
+    names = list(header.str.capitalize())
+    text = {name: "string" for name in names if name != "Date"}
+    start = time.perf_counter()
+    rows = 0
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(store_path))) as tmp:
+        # pass 1: chunks of the CSV, split by month
+        chunks = pd.read_csv(csv_path, encoding="utf-8", chunksize=chunk_size, header=0,
+                             names=names, dtype=text, on_bad_lines='warn')
+        for number, chunk in enumerate(chunks):
+            table = _news_table(chunk, rows)
+            rows += len(chunk)
+            ds.write_dataset(table, tmp, format="parquet", partitioning=["Month"],
+                             basename_template=f"chunk{number:06d}-{{i}}.parquet",
+                             existing_data_behavior="overwrite_or_ignore")
+        csv_seconds = time.perf_counter() - start
+        # pass 2: each month sorted by date, appended as its row groups
+        writer = None
+        for month in sorted(os.listdir(tmp), key=int):
+            table = ds.dataset(os.path.join(tmp, month), format="parquet").to_table()
+            table = table.sort_by([("Date", "ascending"), ("Row", "ascending")])
+            table = table.replace_schema_metadata(None)
+            if writer is None:
+                writer = pq.ParquetWriter(store_path, table.schema, compression="zstd")
+            writer.write_table(table, row_group_size=ROW_GROUP_ROWS)
+        if writer is None:
+            raise ValueError(f"{csv_path} has no rows")
+        writer.close()
+    mb = os.path.getsize(csv_path) / 2**20
+    print(f"{csv_path}: {rows} rows, {mb:.1f} MB parsed in {csv_seconds:.1f} s "
+          f"({mb / max(csv_seconds, 1e-9):.1f} MB/s) -> {store_path} "
+          f"({os.path.getsize(store_path) / 2**20:.1f} MB) in "
+          f"{time.perf_counter() - start:.1f} s", flush=True)
+    return store_path
+
+
+class ReadStats:
+    """Rows and (compressed) bytes read from a store, and the time since creation."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.rows = 0
+        self.bytes = 0
+
+    def report(self):
+        seconds = max(time.monotonic() - self.start, 1e-9)
+        mb = self.bytes / 2**20
+        return (f"read {self.rows} rows, {mb:.1f} MB in {seconds:.1f} s: "
+                f"{mb / seconds:.1f} MB/s, {self.rows / seconds:.0f} rows/s")
+
+
+class NewsStore:
+    """The Parquet news store ``path`` of :func:`convert_news`, read by row groups."""
+
+    def __init__(self, path):
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.file = pq.ParquetFile(path, memory_map=True)
+        self.stats = ReadStats()
+
+    def __len__(self):
+        return self.file.metadata.num_rows
+
+    def batches(self, batch_size=65536, columns=None, start=0):
+        """
+        Record batches of up to ``batch_size`` rows of the ``columns`` (all
+        by default), from store position ``start`` on; row groups before it
+        are not read.
+        """
+        metadata = self.file.metadata
+        names = self.file.schema_arrow.names if columns is None else columns
+        for group in range(metadata.num_row_groups):
+            rows = metadata.row_group(group).num_rows
+            if start >= rows:
+                start -= rows
+                continue
+            table = self.file.read_row_group(group, columns=columns)
+            info = metadata.row_group(group)
+            self.stats.bytes += sum(info.column(i).total_compressed_size
+                                    for i in range(info.num_columns)
+                                    if info.column(i).path_in_schema in names)
+            table = table.slice(start)
+            start = 0
+            self.stats.rows += len(table)
+            yield from table.to_batches(batch_size)
+
+
+def scored_rows(scores_path):
+    """Store rows already scored into the parts of ``scores_path``."""
+    ends = [int(_PART.search(path).group(2))
+            for path in glob.glob(os.path.join(scores_path, "part-*.parquet"))]
+    return max(ends, default=0)
+
+
+async def score_store_async(store_path, scores_path, scorer, column, batch_size=5,
+                            commit_every=5000, batches_in_flight=4, report_every=30.0,
+                            cache=None):
+    """
+    Score the ``Lsa_summary`` of every row of the store into ``column``,
+    ``commit_every`` rows (or a row group's remainder) at a time, each
+    written to ``scores_path`` as a Parquet part of its ``Row``, ``Date``,
+    ``Stock_symbol`` and int8 score (null: none).  Parts are renamed into
+    place once complete, so a restart resumes after the last one.  See
+    :func:`news_scoring.score_stream` for the rest.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    store = NewsStore(store_path)
+    os.makedirs(scores_path, exist_ok=True)
+    done = scored_rows(scores_path)
+    if done:
+        print(f"resuming at store row {done}", flush=True)
+    keep = ["Row", "Date", "Stock_symbol"]
+
+    def batches():
+        position = done
+        for batch in store.batches(commit_every, keep + ["Lsa_summary"], start=done):
+            frame = batch.to_pandas()
+            frame.index = pd.RangeIndex(position, position + len(frame))
+            position += len(frame)
+            yield frame
+
+    def append(frame):
+        scores = pd.to_numeric(frame[column], errors="coerce").to_numpy(np.float64)
+        known = ~np.isnan(scores)
+        table = pa.Table.from_pandas(frame[keep], preserve_index=False).append_column(
+            column, pa.array(np.where(known, scores, 0).astype(np.int8), mask=~known))
+        name = f"part-{frame.index[0]:012d}-{frame.index[-1] + 1:012d}.parquet"
+        path = os.path.join(scores_path, name)
+        pq.write_table(table, path + ".tmp")
+        with open(path + ".tmp", "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    stats = await score_stream(batches(), scorer, column, append, batch_size,
+                               batches_in_flight, report_every, cache)
+    print(store.stats.report(), flush=True)
+    return stats
+
+
+def score_store(store_path, scores_path, scorer, *args, **kwargs):
+    """:func:`score_store_async` run to completion."""
+    return run_scoring(score_store_async(store_path, scores_path, scorer, *args, **kwargs),
+                       scorer)
+
+
+def read_scores(scores_path, columns=None):
+    """The scores of the parts in ``scores_path``, in store order."""
+    import pyarrow.dataset as ds
+
+    paths = sorted(glob.glob(os.path.join(scores_path, "part-*.parquet")))
+    return ds.dataset(paths, format="parquet").to_table(columns=columns).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('csv', nargs='*')
+    parser.add_argument('--output', default=None)  # store path, with one csv
+    parser.add_argument('--chunk_size', type=int, default=200_000)
+    parser.add_argument('--read', nargs='+', default=[], help='measure reading these stores')
+    args = parser.parse_args()
+
+    for csv_path in args.csv:
+        convert_news(csv_path, args.output if len(args.csv) == 1 else None, args.chunk_size)
+    for store_path in args.read:
+        store = NewsStore(store_path)
+        for _ in store.batches():
+            pass
+        print(f"{store_path}: {store.stats.report()}")
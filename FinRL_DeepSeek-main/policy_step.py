@@ -0,0 +1,88 @@
+"""Rollout-time ``step`` of the MLP actor-critics with a Gaussian policy.
+
+``MLPActorCritic.step`` is called once per env step.  Built the generic way
+it converts the observations to a new tensor, constructs a ``Normal``
+(with its argument validation), samples and evaluates ``log_prob``, which
+for these small MLPs costs about as much as the forward pass itself.
+:class:`RolloutStep` does the same in one module call: both heads on the
+batch of observations, the action as ``mu + std * noise`` and its log
+probability from the noise directly, under ``torch.inference_mode``.
+
+The noise is drawn with ``randn_like`` on the shape of ``mu``, which
+consumes the generator exactly as ``Normal(mu, std).sample()`` does, so
+seeded rollouts keep their actions (eager and TorchScript; code generated
+by ``torch.compile`` draws its random numbers differently).
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+LOG_SQRT_2PI = 0.5 * math.log(2 * math.pi)
+
+
+class _GaussianStep(nn.Module):
+    # holds the actor-critic's own submodules and log_std, so the weights
+    # stay those of the model being trained
+
+    def __init__(self, mu_net, log_std, v_net):
+        super().__init__()
+        self.mu_net = mu_net
+        self.log_std = log_std
+        self.v_net = v_net
+        self.log_sqrt_2pi = LOG_SQRT_2PI
+
+    def forward(self, obs):
+        mu = self.mu_net(obs)
+        noise = torch.randn_like(mu)
+        a = mu + torch.exp(self.log_std) * noise
+        logp_a = -(0.5 * noise * noise + self.log_std + self.log_sqrt_2pi).sum(-1)
+        v = self.v_net(obs).squeeze(-1)
+        return a, v, logp_a
+
+
+class RolloutStep:
+    """
+    ``step(obs) -> (a, v, logp_a)`` as NumPy arrays, for a Gaussian MLP
+    policy ``mu_net`` / ``log_std`` and value net ``v_net``.
+
+    ``obs`` may be a NumPy array of any float dtype (copied into a float32
+    input tensor that is reused for every call with the same shape, pinned
+    when the model is on a GPU) or a tensor.
+
+    ``compile`` is None (eager), ``"script"`` (TorchScript) or
+    ``"compile"`` (``torch.compile``).
+    """
+
+    def __init__(self, mu_net, log_std, v_net, compile=None):
+        fn = _GaussianStep(mu_net, log_std, v_net)
+        if compile == "script":
+            fn = torch.jit.script(fn)
+        elif compile == "compile":
+            fn = torch.compile(fn)
+        elif compile is not None:
+            raise ValueError(f"unknown compile mode {compile!r}, use 'script' or 'compile'")
+        self._fn = fn
+        self.device = log_std.device
+        self._inputs = {}
+
+    def _input(self, obs):
+        if isinstance(obs, torch.Tensor):
+            return obs.to(self.device, torch.float32)
+        obs = np.asarray(obs)
+        if obs.shape not in self._inputs:
+            tensor = torch.empty(obs.shape, dtype=torch.float32,
+                                 pin_memory=self.device.type == "cuda")
+            self._inputs[obs.shape] = (tensor, tensor.numpy())
+        tensor, array = self._inputs[obs.shape]
+        array[...] = obs
+        return tensor.to(self.device, non_blocking=True)
+
+    def __call__(self, obs):
+        with torch.inference_mode():
+            a, v, logp_a = self._fn(self._input(obs))
+        return a.cpu().numpy(), v.cpu().numpy(), logp_a.cpu().numpy()
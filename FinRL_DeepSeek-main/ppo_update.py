@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import torch
+from spinup.utils.mpi_tools import mpi_avg
+
+
+def mpi_avg_flat_grads(module, *scalars):
+    """Average the gradients of ``module`` and ``scalars`` across MPI processes.
+
+    ``spinup``'s ``mpi_avg_grads`` runs one allreduce per parameter tensor;
+    here all gradients (and the extra scalars, e.g. the approximate KL) are
+    packed into one vector and reduced at once.  Returns the averaged
+    scalars.
+    """
+    params = [p for p in module.parameters() if p.grad is not None]
+    flat = torch.cat([p.grad.reshape(-1) for p in params]
+                     + [torch.tensor(scalars, dtype=torch.float32)])
+    flat = torch.as_tensor(mpi_avg(flat.numpy()), dtype=torch.float32)
+    offset = 0
+    for p in params:
+        p.grad.copy_(flat[offset:offset + p.numel()].view_as(p.grad))
+        offset += p.numel()
+    return flat[offset:].tolist()
+
+
+def minibatch_sgd(data, compute_loss, module, optimizer, update_epochs,
+                  minibatch_size, grad_accum_steps=1, max_kl=None):
+    """
+    Minibatch version of the full-batch gradient loops of ``update()``.
+
+    Each of the ``update_epochs`` passes goes over ``data`` (a dict of
+    equally long tensors) in shuffled minibatches of ``minibatch_size``.
+    The gradients of ``grad_accum_steps`` minibatches are accumulated
+    (weighted by their size) before one flat allreduce across MPI processes
+    and one optimizer step, so a pass takes about
+    ``len(data) / (minibatch_size * grad_accum_steps)`` allreduces.
+
+    ``compute_loss(batch)`` returns the loss, or ``(loss, info)`` with the
+    approximate KL in ``info['kl']``. With ``max_kl`` the update stops
+    before the first step whose KL, averaged over its minibatches and
+    processes, exceeds ``max_kl``, as the full-batch loop does.
+
+    Returns the number of optimizer steps taken.
+    """
+    n = len(next(iter(data.values())))
+    steps = 0
+    for _ in range(update_epochs):
+        order = torch.randperm(n)
+        batches = [order[i:i + minibatch_size] for i in range(0, n, minibatch_size)]
+        for k in range(0, len(batches), grad_accum_steps):
+            group = batches[k:k + grad_accum_steps]
+            group_size = sum(len(idx) for idx in group)
+            optimizer.zero_grad()
+            kl = 0.0
+            for idx in group:
+                out = compute_loss({key: value[idx] for key, value in data.items()})
+                loss, info = out if isinstance(out, tuple) else (out, None)
+                (loss * (len(idx) / group_size)).backward()
+                if info is not None:
+                    kl += info['kl'] * len(idx) / group_size
+            kl, = mpi_avg_flat_grads(module, kl)
+            if max_kl is not None and kl > max_kl:
+                return steps
+            optimizer.step()
+            steps += 1
+    return steps
@@ -1,12 +1,15 @@
+import argparse
 import os
 import time
 import numpy as np
 import pandas as pd
 from openai import OpenAI
 
+from news_scoring import AsyncScorer, add_arguments, parse_scores, score_csv
+
 # Set your OpenAI API key and base URL
 openai = OpenAI(
-    api_key=  # Replace with your actual DeepInfra token
+    api_key=os.environ.get("DEEPINFRA_API_KEY", "mykey"),  # Replace with your actual DeepInfra token
     base_url="https://api.deepinfra.com/v1/openai",
 )
 stream = False  # Set to True if you want to stream the response
@@ -16,12 +19,12 @@ stream = False  # Set to True if you want to stream the response
 
 model_used='risk_deepseek'
 
-def get_risk(symbol, *texts):
-    texts = [text for text in texts if text != 0]
+def conversation(symbol, texts):
+    """The chat messages asking for the risk scores of ``texts``."""
     num_text = len(texts)
     text_content = " ".join([f"### News to Stock Symbol -- {symbol}: {text}" for text in texts])
 
-    conversation = [
+    return [
         {"role": "system",
          "content": f"Forget all your previous instructions. You are a financial expert specializing in risk assessment for stock recommendations. Based on a specific stock, provide a risk score from 1 to 5, where: 1 indicates very low risk, 2 indicates low risk, 3 indicates moderate risk (default if the news lacks any clear indication of risk), 4 indicates high risk, and 5 indicates very high risk. {num_text} summarized news will be passed in each time. Provide the score in the format shown below in the response from the assistant."},
         {"role": "user",
@@ -33,13 +36,16 @@ def get_risk(symbol, *texts):
         {"role": "user", "content": text_content},
     ]
 
+def get_risk(symbol, *texts):
+    texts = [text for text in texts if text != 0]
+
     risks = []
     try:
         chat_completion = openai.chat.completions.create(
           #  model="meta-llama/Llama-3.3-70B-Instruct",
       #      model="Qwen/Qwen2.5-72B-Instruct",
             model='deepseek-ai/DeepSeek-V3',
-            messages=conversation,
+            messages=conversation(symbol, texts),
             temperature=0,
             max_tokens=50,
             stream=stream,
@@ -71,15 +77,7 @@ def get_risk(symbol, *texts):
         risks.append(risk_value)
         return risks
 
-    for risk in content.split(','):
-        try:
-            risk_value = int(risk.strip())
-        except ValueError:
-            print("content error")
-            print(' content is: ' + str(risk.strip()))
-            risk_value = np.nan
-        risks.append(risk_value)
-    return risks
+    return parse_scores(content, len(texts))
 
 def from_csv_get_risk(df, saving_path, batch_size=4):
     df.sort_values(by=model_used, ascending=False, na_position='last', inplace=True)
@@ -100,52 +98,61 @@ def from_csv_get_risk(df, saving_path, batch_size=4):
     return df
 
 
-def process_csv(input_csv_path, output_csv_path, batch_size=5, chunk_size=1000):
+def process_csv(input_csv_path, output_csv_path, batch_size=5, chunk_size=1000, cache=None,
+                scorer=None, **scorer_kwargs):
+    """
+    Score every row of the input CSV into the ``model_used`` column of the
+    output CSV, with up to ``concurrency`` requests in flight (see
+    news_scoring.py for the ``scorer_kwargs``), resuming after the rows
+    already in the output.  Texts already scored in the ``cache`` (an
+    SQLite file, see score_cache.py) are not sent again.  A ``.parquet``
+    input is a news store of news_store.py.  Another backend,
+    e.g. a local model of local_scoring.py, scores as ``scorer``.
+    """
     start_time = time.time()
-
-    # Check if the output file exists and load the last processed row
-    if os.path.exists(output_csv_path):
-        output_df = pd.read_csv(output_csv_path, 
-        on_bad_lines='warn',
-        engine='python'
-)
-        last_processed_row = len(output_df)
+    scorer_kwargs.setdefault("model", 'deepseek-ai/DeepSeek-V3')
+    scorer_kwargs.setdefault("base_url", "https://api.deepinfra.com/v1/openai")
+    scorer_kwargs.setdefault("api_key", os.environ.get("DEEPINFRA_API_KEY", "mykey"))
+    if scorer is None:
+        scorer = AsyncScorer(conversation, **scorer_kwargs)
+    if input_csv_path.endswith('.parquet'):
+        # a news store of news_store.py; the scores go to a directory of parts
+        from news_store import score_store
+
+        score_store(input_csv_path, output_csv_path, scorer, model_used,
+                    batch_size=batch_size, cache=cache)
     else:
-        last_processed_row = 0
-
-    # Read the CSV file in chunks
-    chunks = pd.read_csv(input_csv_path, encoding="utf-8", chunksize=chunk_size,
-    on_bad_lines='warn', 
-    engine='python'     # Print a warning for each skipped line
-    )
-
-    for chunk_number, chunk in enumerate(chunks):
-        # Skip already processed chunks
-        if chunk_number * chunk_size < last_processed_row:
-            continue
-
-        chunk.columns = chunk.columns.str.capitalize()
-        if model_used not in chunk.columns:
-            chunk[model_used] = np.nan
-
-        for i in range(0, len(chunk), batch_size):
-            batch = chunk.iloc[i:i + batch_size]
-            texts = batch['Lsa_summary'].tolist()
-            symbol = batch.iloc[0]['Stock_symbol']  # Extract the stock symbol for the current batch
-            risks = get_risk(symbol, *texts)
-
-            for j, risk in enumerate(risks):
-                if i + j < len(chunk):
-                    chunk.loc[chunk.index[i + j], model_used] = risk
-
-        # Append the processed chunk to the output file
-        chunk.to_csv(output_csv_path, mode='a', header=not os.path.exists(output_csv_path), index=False)
-
+        score_csv(input_csv_path, output_csv_path, scorer, model_used,
+                  batch_size=batch_size, chunk_size=chunk_size, cache=cache)
     print(f"Process completed in {time.time() - start_time:.2f} seconds.")
     
 
 
 if __name__ == "__main__":
-    input_file='nasdaq_news_full.csv'
-    output_file= model_used + '_' + input_file
-    process_csv(input_file, output_file, batch_size=4)
+    parser = add_arguments(argparse.ArgumentParser())
+    args = parser.parse_args()
+    input_file = args.input  # nasdaq_news_full.csv by default
+    if args.backend == 'deepinfra':
+        output_file = args.output or model_used + '_' + os.path.basename(input_file)
+        process_csv(input_file, output_file, batch_size=args.batch_size,
+                    model=args.model, base_url=args.base_url, api_key=args.api_key,
+                    concurrency=args.concurrency, requests_per_second=args.rps,
+                    tokens_per_minute=args.tpm, max_retries=args.max_retries,
+                    token_budget=args.token_budget, cache=args.cache)
+    else:
+        # needs a classifier of the 1 to 5 risk scale, e.g. fine-tuned on DeepSeek risk
+        # scores: the default local models are sentiment classifiers
+        from local_scoring import LocalScorer
+
+        if args.local_model is None:
+            parser.error(f"--backend {args.backend} needs --local-model, a classifier "
+                         "of the 1 to 5 risk scale")
+        backend_name = args.backend.rpartition(':')[2]
+        output_file = args.output or f'risk_{backend_name}_' + os.path.basename(input_file)
+        try:
+            scorer = LocalScorer(args.backend, workers=args.workers, task='risk',
+                                 model=args.local_model)
+        except ValueError as err:
+            parser.error(str(err))
+        process_csv(input_file, output_file, batch_size=args.batch_size, cache=args.cache,
+                    scorer=scorer)
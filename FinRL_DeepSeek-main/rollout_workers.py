@@ -0,0 +1,146 @@
+"""Rollout worker processes for PPO/CPPO, an alternative to MPI.
+
+The learner (the ``ppo()`` / ``cppo()`` process) keeps the policy and does
+the updates.  Each of N worker processes steps its own copy of the batched
+env with a CPU copy of the policy and writes its steps into a column slice
+of a rollout buffer allocated in shared memory, so nothing but episode
+statistics goes through the queues.  After an update the learner publishes
+the new weights into a shared copy of the policy, which the workers load
+at the start of their next rollout.
+
+With two buffers the workers collect the next epoch while the learner
+updates on the previous one; that rollout then runs with the weights from
+one update earlier (its log probs are those of the policy that acted, so
+the PPO ratio stays correct).
+
+Workers are forked, so ``env_fn`` and ``collect`` may be closures; this
+needs Linux (or another platform with ``fork``).
+"""
+
+from __future__ import annotations
+
+import copy
+import multiprocessing as mp
+import queue
+import traceback
+
+import numpy as np
+import torch
+
+
+class RolloutWorkers:
+    """
+    ``num_workers`` processes collecting rollouts into ``buffers``.
+
+    ``buffers`` are PPOBuffer-like objects whose arrays live in shared
+    memory and that have an ``env_slice(start, stop)`` method; worker ``i``
+    writes envs (columns) ``i * n : (i + 1) * n`` where ``n`` is the
+    ``num_envs`` of the env it builds with ``env_fn()``.
+
+    ``collect(env, ac, buf, **kwargs)`` runs one epoch of interaction into
+    ``buf`` and returns a small picklable summary (e.g. episode returns).
+    """
+
+    def __init__(self, env_fn, ac, collect, buffers, num_workers, seed=0):
+        ctx = mp.get_context("fork")
+        self.buffers = buffers
+        self.num_workers = num_workers
+        # the published weights, read by the workers under the lock
+        self.policy = copy.deepcopy(ac).share_memory()
+        self._lock = ctx.Lock()
+        self._tasks = [ctx.SimpleQueue() for _ in range(num_workers)]
+        self._results = ctx.Queue()
+        self._submitted = self._received = 0
+        self._pending = {}
+
+        n_cols = buffers[0].obs_buf.shape[1]
+        if n_cols % num_workers:
+            raise ValueError(f"{n_cols} buffer envs cannot be split over {num_workers} workers")
+        width = n_cols // num_workers
+        self._procs = [
+            ctx.Process(target=self._work,
+                        args=(i, env_fn, collect, i * width, (i + 1) * width, seed + 1000 * (i + 1)),
+                        daemon=True)
+            for i in range(num_workers)
+        ]
+        for proc in self._procs:
+            proc.start()
+
+    def _work(self, index, env_fn, collect, start, stop, seed):
+        torch.set_num_threads(1)
+        torch.manual_seed(seed)
+        np.random.seed(seed)
+        env = env_fn()
+        if hasattr(env, "np_random"):
+            # forked copies of one env would otherwise draw the same starts
+            env.np_random = np.random.default_rng(seed)
+        if env.num_envs != stop - start:
+            self._results.put((None, index, False, f"env has {env.num_envs} envs, "
+                                                   f"buffer slice has {stop - start}"))
+            return
+        ac = copy.deepcopy(self.policy)
+        views = [buf.env_slice(start, stop) for buf in self.buffers]
+        while True:
+            task = self._tasks[index].get()
+            if task is None:
+                return
+            task_id, kwargs = task
+            with self._lock:
+                ac.load_state_dict(self.policy.state_dict())
+            view = views[task_id % len(views)]
+            view.ptr = 0
+            try:
+                result = collect(env, ac, view, **kwargs)
+            except Exception:
+                self._results.put((task_id, index, False, traceback.format_exc()))
+                return
+            self._results.put((task_id, index, True, result))
+
+    def publish(self, ac):
+        """Make the weights of ``ac`` the ones used by the next rollouts."""
+        with self._lock:
+            self.policy.load_state_dict(ac.state_dict())
+
+    def submit(self, **kwargs):
+        """Start one rollout on every worker, into the next free buffer."""
+        if self._submitted - self._received >= len(self.buffers):
+            raise RuntimeError("all rollout buffers are in use, wait() for one first")
+        for tasks in self._tasks:
+            tasks.put((self._submitted, kwargs))
+        self._submitted += 1
+
+    def wait(self):
+        """
+        Block until the oldest submitted rollout is complete. Returns its
+        (filled) buffer and the list of the workers' ``collect`` results.
+        """
+        task_id = self._received
+        if task_id == self._submitted:
+            raise RuntimeError("no rollout submitted")
+        results = self._pending.setdefault(task_id, {})
+        while len(results) < self.num_workers:
+            try:
+                done_id, index, ok, result = self._results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [i for i, proc in enumerate(self._procs) if not proc.is_alive()]
+                if dead:
+                    raise RuntimeError(f"rollout worker {dead[0]} exited "
+                                       f"(exit code {self._procs[dead[0]].exitcode})")
+                continue
+            if not ok:
+                raise RuntimeError(f"rollout worker {index} failed:\n{result}")
+            self._pending.setdefault(done_id, {})[index] = result
+        del self._pending[task_id]
+        self._received += 1
+        buf = self.buffers[task_id % len(self.buffers)]
+        buf.ptr = buf.max_size
+        return buf, [results[i] for i in range(self.num_workers)]
+
+    def close(self):
+        for tasks, proc in zip(self._tasks, self._procs):
+            if proc.is_alive():
+                tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
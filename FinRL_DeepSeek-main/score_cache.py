@@ -0,0 +1,86 @@
+"""Persistent cache of LLM news scores, keyed by content.
+
+A score is stored under a hash of everything that determines it: the
+model, the version of the prompt template, the stock symbol and the news
+text.  Re-running a scoring script with another chunk size, after a crash,
+or on a dump where the same summary appears for several days therefore
+asks the API only for texts it has never scored.  Changing the prompt
+(see :func:`prompt_version`) or the model starts a fresh set of keys in
+the same file.
+
+The cache is one SQLite file in WAL mode; only scores (never failures, which
+should be retried) are stored, integers as integers so cached rows are
+written exactly as freshly scored ones.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import sqlite3
+
+# parameters per SELECT, below SQLite's default limit
+_QUERY_SIZE = 500
+
+
+def prompt_version(conversation):
+    """A short hash of a ``conversation(symbol, texts)`` prompt template."""
+    template = conversation("{symbol}", ["{text}"])
+    return hashlib.sha256(json.dumps(template, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def content_key(model, version, symbol, text):
+    """The 16 byte cache key of one (model, prompt version, symbol, text)."""
+    payload = json.dumps([model, version, str(symbol), str(text)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).digest()[:16]
+
+
+class ScoreCache:
+    """
+    Scores by :func:`content_key` in the SQLite file ``path``.  Writes
+    become durable on :meth:`commit`; ``hits`` and ``misses`` count the
+    keys looked up.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS scores "
+                         "(key BLOB PRIMARY KEY, score NUMERIC NOT NULL) WITHOUT ROWID")
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def get_many(self, keys):
+        """The cached scores of ``keys``, as a dict of the keys found."""
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), _QUERY_SIZE):
+            part = keys[start:start + _QUERY_SIZE]
+            found.update(self._db.execute(
+                f"SELECT key, score FROM scores WHERE key IN ({','.join('?' * len(part))})",
+                part))
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store ``(key, score)`` pairs; nan scores are skipped."""
+        self._db.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?)",
+                             [(key, score) for key, score in items if not math.isnan(score)])
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    @property
+    def hit_rate(self):
+        return self.hits / max(self.hits + self.misses, 1)
@@ -1,24 +1,27 @@
+import argparse
 import os
 import time
 import numpy as np
 import pandas as pd
 from openai import OpenAI
 
+from news_scoring import AsyncScorer, add_arguments, parse_scores, score_csv
+
 # Set your OpenAI API key and base URL
 openai = OpenAI(
-    api_key= "mykey",  #Replace with your actual DeepInfra api key
+    api_key=os.environ.get("DEEPINFRA_API_KEY", "mykey"),  #Replace with your actual DeepInfra api key
     base_url="https://api.deepinfra.com/v1/openai",
 )
 
 stream = False  # Set to True if you want to stream the response
 model_used = 'sentiment_deepseek'  # Define the model_used variable
 
-def get_sentiment(symbol, *texts):
-    texts = [text for text in texts if text != 0]
+def conversation(symbol, texts):
+    """The chat messages asking for the sentiment scores of ``texts``."""
     num_text = len(texts)
     text_content = " ".join([f"### News to Stock Symbol -- {symbol}: {text}" for text in texts])
 
-    conversation = [
+    return [
         {"role": "system",
          "content": f"Forget all your previous instructions. You are a financial expert with stock recommendation experience. Based on a specific stock, score for range from 1 to 5, where 1 is negative, 2 is somewhat negative, 3 is neutral, 4 is somewhat positive, 5 is positive. {num_text} summarized news will be passed in each time, you will give score in format as shown below in the response from assistant."},
         {"role": "user",
@@ -30,11 +33,15 @@ def get_sentiment(symbol, *texts):
         {"role": "user", "content": text_content},
     ]
 
+def get_sentiment(symbol, *texts):
+    texts = [text for text in texts if text != 0]
+    num_text = len(texts)
+
     try:
         chat_completion = openai.chat.completions.create(
     #        model='deepseek-ai/DeepSeek-R1-Distill-Llama-70B',
             model='deepseek-ai/DeepSeek-V3',
-            messages=conversation,
+            messages=conversation(symbol, texts),
             temperature=0,
             max_tokens=50,
             stream=stream,
@@ -59,61 +66,54 @@ def get_sentiment(symbol, *texts):
         print(f"Error: {e}")
         return [np.nan] * num_text
 
-    sentiments = []
-    for sentiment in content.split(','):
-        try:
-            sentiment_value = int(sentiment.strip())
-        except ValueError:
-            print("content error")
-            print("sentiment was: " + str(sentiment.strip()))
-            sentiment_value = np.nan
-        sentiments.append(sentiment_value)
-    return sentiments
-
-def process_csv(input_csv_path, output_csv_path, batch_size=5, chunk_size=1000):
+    return parse_scores(content, num_text)
+
+def process_csv(input_csv_path, output_csv_path, batch_size=5, chunk_size=1000, cache=None,
+                scorer=None, **scorer_kwargs):
+    """
+    Score every row of the input CSV into the ``model_used`` column of the
+    output CSV, with up to ``concurrency`` requests in flight (see
+    news_scoring.py for the ``scorer_kwargs``), resuming after the rows
+    already in the output.  Texts already scored in the ``cache`` (an
+    SQLite file, see score_cache.py) are not sent again.  A ``.parquet``
+    input is a news store of news_store.py.  Another backend,
+    e.g. a local model of local_scoring.py, scores as ``scorer``.
+    """
     start_time = time.time()
-
-    # Check if the output file exists and load the last processed row
-    if os.path.exists(output_csv_path):
-        output_df = pd.read_csv(output_csv_path, 
-        on_bad_lines='warn',
-        engine='python'
-)
-        last_processed_row = len(output_df)
+    scorer_kwargs.setdefault("model", 'deepseek-ai/DeepSeek-V3')
+    scorer_kwargs.setdefault("base_url", "https://api.deepinfra.com/v1/openai")
+    scorer_kwargs.setdefault("api_key", os.environ.get("DEEPINFRA_API_KEY", "mykey"))
+    if scorer is None:
+        scorer = AsyncScorer(conversation, **scorer_kwargs)
+    if input_csv_path.endswith('.parquet'):
+        # a news store of news_store.py; the scores go to a directory of parts
+        from news_store import score_store
+
+        score_store(input_csv_path, output_csv_path, scorer, model_used,
+                    batch_size=batch_size, cache=cache)
     else:
-        last_processed_row = 0
-
-    # Read the CSV file in chunks
-    chunks = pd.read_csv(input_csv_path, encoding="utf-8", chunksize=chunk_size,
-    on_bad_lines='warn', 
-    engine='python'     # Print a warning for each skipped line
-    )
-
-    for chunk_number, chunk in enumerate(chunks):
-        # Skip already processed chunks
-        if chunk_number * chunk_size < last_processed_row:
-            continue
-
-        chunk.columns = chunk.columns.str.capitalize()
-        if model_used not in chunk.columns:
-            chunk[model_used] = np.nan
-
-        for i in range(0, len(chunk), batch_size):
-            batch = chunk.iloc[i:i + batch_size]
-            texts = batch['Lsa_summary'].tolist()
-            symbol = batch.iloc[0]['Stock_symbol']  # Extract the stock symbol for the current batch
-            sentiments = get_sentiment(symbol, *texts)
-
-            for j, sentiment in enumerate(sentiments):
-                if i + j < len(chunk):
-                    chunk.loc[chunk.index[i + j], model_used] = sentiment
-
-        # Append the processed chunk to the output file
-        chunk.to_csv(output_csv_path, mode='a', header=not os.path.exists(output_csv_path), index=False)
-
+        score_csv(input_csv_path, output_csv_path, scorer, model_used,
+                  batch_size=batch_size, chunk_size=chunk_size, cache=cache)
     print(f"Process completed in {time.time() - start_time:.2f} seconds.")
 
 if __name__ == "__main__":
-    input_file = 'nasdaq_news_full.csv'  # Replace with your input file path
-    output_file = 'sentiment_deepseek_' + input_file
-    process_csv(input_file, output_file, batch_size=5, chunk_size=100000)
+    parser = add_arguments(argparse.ArgumentParser())
+    args = parser.parse_args()
+    input_file = args.input  # nasdaq_news_full.csv by default
+    if args.backend == 'deepinfra':
+        output_file = args.output or 'sentiment_deepseek_' + os.path.basename(input_file)
+        process_csv(input_file, output_file, batch_size=args.batch_size, chunk_size=100000,
+                    model=args.model, base_url=args.base_url, api_key=args.api_key,
+                    concurrency=args.concurrency, requests_per_second=args.rps,
+                    tokens_per_minute=args.tpm, max_retries=args.max_retries,
+                    token_budget=args.token_budget, cache=args.cache)
+    else:
+        from local_scoring import LocalScorer
+
+        backend_name = args.backend.rpartition(':')[2]
+        output_file = args.output or f'sentiment_{backend_name}_' + os.path.basename(input_file)
+        model_kwargs = {} if args.local_model is None else {'model': args.local_model}
+        process_csv(input_file, output_file, batch_size=args.batch_size, chunk_size=100000,
+                    cache=args.cache,
+                    scorer=LocalScorer(args.backend, workers=args.workers, task='sentiment',
+                                       **model_kwargs))
@@ -0,0 +1,109 @@
+"""Single-process stand-ins for spinup's MPI helpers.
+
+``spinup.utils.mpi_tools`` and ``spinup.utils.mpi_pytorch`` import mpi4py at
+module level, and the rest of spinup (the logger included) imports them, so
+nothing from spinup can be imported on a machine without MPI.
+:func:`install_if_missing` registers this module under both names when
+mpi4py cannot be loaded; every function then behaves as it does in a run
+with one MPI process.  Parallel rollouts are still available there through
+the multiprocessing workers (see rollout_workers.py).
+"""
+
+from __future__ import annotations
+
+import sys
+
+import numpy as np
+
+
+def mpi_available():
+    try:
+        from mpi4py import MPI  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def install_if_missing():
+    """Use this module for spinup's MPI helpers if mpi4py is not usable.
+
+    Must run before the first ``spinup`` import.  Returns whether MPI is
+    available.
+    """
+    if mpi_available():
+        return True
+    for name in ("spinup.utils.mpi_tools", "spinup.utils.mpi_pytorch"):
+        sys.modules.setdefault(name, sys.modules[__name__])
+    return False
+
+
+def barrier():
+    """``MPI.COMM_WORLD.Barrier`` for ``MarketTensor.attach``, or None."""
+    if not mpi_available():
+        return None
+    from mpi4py import MPI
+
+    return MPI.COMM_WORLD.Barrier
+
+
+# spinup.utils.mpi_tools
+
+def mpi_fork(n, bind_to_core=False):
+    if n > 1:
+        raise RuntimeError("mpi_fork(%d) needs mpi4py; use rollout workers instead" % n)
+
+
+def msg(m, string=''):
+    print(('Message from %d: %s \t ' % (proc_id(), string)) + str(m))
+
+
+def proc_id():
+    return 0
+
+
+def num_procs():
+    return 1
+
+
+def allreduce(x, buff, op=None):
+    buff[...] = x
+
+
+def broadcast(x, root=0):
+    pass
+
+
+def mpi_op(x, op):
+    x, scalar = ([x], True) if np.isscalar(x) else (x, False)
+    x = np.asarray(x, dtype=np.float32)
+    return x[0] if scalar else x.copy()
+
+
+def mpi_sum(x):
+    return mpi_op(x, None)
+
+
+def mpi_avg(x):
+    return mpi_sum(x) / num_procs()
+
+
+def mpi_statistics_scalar(x, with_min_and_max=False):
+    x = np.array(x, dtype=np.float32)
+    mean, std = np.mean(x), np.std(x)
+    if with_min_and_max:
+        return mean, std, np.min(x) if len(x) > 0 else np.inf, np.max(x) if len(x) > 0 else -np.inf
+    return mean, std
+
+
+# spinup.utils.mpi_pytorch
+
+def setup_pytorch_for_mpi():
+    pass
+
+
+def mpi_avg_grads(module):
+    pass
+
+
+def sync_params(module):
+    pass
@@ -0,0 +1,243 @@
+"""The table-driven env variants against the mask-based envs they replaced.
+
+``BaselineVariant`` is the multi-stock step of the former
+``env_stocktrading_<variant>.py`` envs: the LLM sentiment read from the
+DataFrame, the actions scaled by the boolean masks of the variant, and the
+per-ticker sell / buy loops.  Every preset of ``SHAPING_PRESETS`` must give
+the same executed actions, state and reward on the same seeded actions and
+scores.
+"""
+
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from action_shaping import SHAPING_PRESETS
+from execution_numba import NUMBA_AVAILABLE
+
+# (strong mismatch, moderate mismatch, strong match, moderate match, neutral)
+# factors of the mask-based variants; neutral None: no factor for sentiment 3
+BASELINE_FACTORS = {
+    "llm": (0.9, 0.95, 1.1, 1.05, 0.98),
+    "llm_risk": (0.9, 0.95, 1.1, 1.05, None),
+    "llm_1": (0.99, 0.995, 1.01, 1.005, None),
+    "llm_risk_1": (0.99, 0.995, 1.01, 1.005, None),
+    "llm_01": (0.999, 0.9995, 1.001, 1.0005, None),
+    "llm_risk_01": (0.999, 0.9995, 1.001, 1.0005, None),
+    "llama": (0.99, 0.995, 1.01, 1.005, None),
+    "llama_risk": (0.99, 0.995, 1.01, 1.005, None),
+}
+
+INDICATORS = ["macd", "rsi_30", "cci_30", "dx_30"]
+N_DAYS = 30
+N_TICKERS = 5
+HMAX = 100
+COST_PCT = 0.001
+REWARD_SCALING = 1e-4
+
+
+def market_frame(seed=0):
+    """A day-indexed frame with every kind of LLM score the envs can see:
+    whole scores, 0 (missing), nan and a score that is not whole."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2020-01-01", periods=N_DAYS).strftime("%Y-%m-%d")
+    df = pd.DataFrame(
+        {
+            "date": np.repeat(dates, N_TICKERS),
+            "tic": np.tile([f"T{i}" for i in range(N_TICKERS)], N_DAYS),
+        },
+        index=pd.Index(np.repeat(np.arange(N_DAYS), N_TICKERS), name="new_idx"),
+    )
+    n = len(df)
+    df["close"] = 20 + rng.random(n) * 80
+    for col in INDICATORS:
+        df[col] = rng.normal(size=n)
+    # the first indicator equal to 1 disables trading the ticker that day
+    df.loc[df.index % 7 == 3, INDICATORS[0]] = 1.0
+    df["turbulence"] = np.repeat(rng.random(N_DAYS) * 100, N_TICKERS)
+    scores = np.array([0, 1, 2, 3, 4, 5, np.nan, 2.5])
+    df["llm_sentiment"] = rng.choice(scores, n)
+    df["llm_risk"] = rng.choice(scores, n)
+    return df
+
+
+class BaselineVariant:
+    """Step of the mask-based env variants (multiple tickers, initial state)."""
+
+    def __init__(self, df, factors, llm_cols, initial_amount, turbulence_threshold):
+        self.df = df
+        self.factors = factors
+        self.llm_cols = llm_cols
+        self.stock_dim = N_TICKERS
+        self.turbulence_threshold = turbulence_threshold
+        self.cost_pct = [COST_PCT] * N_TICKERS
+        self.day = 0
+        self.data = df.loc[0, :]
+        self.turbulence = 0
+        self.cost = 0
+        self.trades = 0
+        self.state = (
+            [initial_amount]
+            + self.data.close.values.tolist()
+            + [0] * N_TICKERS
+            + self._market_part()
+        )
+
+    def _market_part(self):
+        return sum(
+            (self.data[col].values.tolist() for col in INDICATORS + self.llm_cols),
+            [],
+        )
+
+    def _total_asset(self):
+        return self.state[0] + sum(
+            np.array(self.state[1 : (self.stock_dim + 1)])
+            * np.array(self.state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)])
+        )
+
+    def _shape(self, actions):
+        strong_mismatch, moderate_mismatch, strong_match, moderate_match, neutral = (
+            self.factors
+        )
+        llm_sentiments = self.data["llm_sentiment"].values
+        buy_mask = actions > 0
+        sell_mask = actions < 0
+        strong_sell_mask = llm_sentiments == 1
+        moderate_sell_mask = llm_sentiments == 2
+        hold_mask = llm_sentiments == 3
+        moderate_buy_mask = llm_sentiments == 4
+        strong_buy_mask = llm_sentiments == 5
+        actions[(strong_sell_mask & buy_mask) | (strong_buy_mask & sell_mask)] *= strong_mismatch
+        actions[(moderate_sell_mask & buy_mask) | (moderate_buy_mask & sell_mask)] *= moderate_mismatch
+        if neutral is not None:
+            actions[hold_mask] *= neutral
+        actions[(strong_sell_mask & sell_mask) | (strong_buy_mask & buy_mask)] *= strong_match
+        actions[(moderate_sell_mask & sell_mask) | (moderate_buy_mask & buy_mask)] *= moderate_match
+        return actions
+
+    def _sell_stock(self, index, action):
+        if self.turbulence_threshold is not None and self.turbulence >= self.turbulence_threshold:
+            if self.state[index + 1] > 0 and self.state[index + self.stock_dim + 1] > 0:
+                sell_num_shares = self.state[index + self.stock_dim + 1]
+                self.state[0] += self.state[index + 1] * sell_num_shares * (1 - self.cost_pct[index])
+                self.state[index + self.stock_dim + 1] = 0
+                self.cost += self.state[index + 1] * sell_num_shares * self.cost_pct[index]
+                self.trades += 1
+                return sell_num_shares
+            return 0
+        if self.state[index + 2 * self.stock_dim + 1] != True:  # noqa: E712
+            if self.state[index + self.stock_dim + 1] > 0:
+                sell_num_shares = min(abs(action), self.state[index + self.stock_dim + 1])
+                self.state[0] += self.state[index + 1] * sell_num_shares * (1 - self.cost_pct[index])
+                self.state[index + self.stock_dim + 1] -= sell_num_shares
+                self.cost += self.state[index + 1] * sell_num_shares * self.cost_pct[index]
+                self.trades += 1
+                return sell_num_shares
+        return 0
+
+    def _buy_stock(self, index, action):
+        if self.turbulence_threshold is not None and self.turbulence >= self.turbulence_threshold:
+            return 0
+        if self.state[index + 2 * self.stock_dim + 1] != True:  # noqa: E712
+            available_amount = self.state[0] // (self.state[index + 1] * (1 + self.cost_pct[index]))
+            buy_num_shares = min(available_amount, action)
+            self.state[0] -= self.state[index + 1] * buy_num_shares * (1 + self.cost_pct[index])
+            self.state[index + self.stock_dim + 1] += buy_num_shares
+            self.cost += self.state[index + 1] * buy_num_shares * self.cost_pct[index]
+            self.trades += 1
+            return buy_num_shares
+        return 0
+
+    def step(self, actions):
+        if self.day >= len(self.df.index.unique()) - 1:
+            return self.state, None, True
+        actions = self._shape(actions)
+        actions = (actions * HMAX).astype(int)
+        if self.turbulence_threshold is not None and self.turbulence >= self.turbulence_threshold:
+            actions = np.array([-HMAX] * self.stock_dim)
+        begin_total_asset = self._total_asset()
+        argsort_actions = np.argsort(actions)
+        sell_index = argsort_actions[: np.where(actions < 0)[0].shape[0]]
+        buy_index = argsort_actions[::-1][: np.where(actions > 0)[0].shape[0]]
+        for index in sell_index:
+            actions[index] = self._sell_stock(index, actions[index]) * (-1)
+        for index in buy_index:
+            actions[index] = self._buy_stock(index, actions[index])
+        self.executed = actions
+
+        self.day += 1
+        self.data = self.df.loc[self.day, :]
+        if self.turbulence_threshold is not None:
+            self.turbulence = self.data["turbulence"].values[0]
+        self.state = (
+            [self.state[0]]
+            + self.data.close.values.tolist()
+            + list(self.state[(self.stock_dim + 1) : (self.stock_dim * 2 + 1)])
+            + self._market_part()
+        )
+        reward = (self._total_asset() - begin_total_asset) * REWARD_SCALING
+        return self.state, reward, False
+
+
+def variant_env(variant, df, initial_amount, turbulence_threshold, engine):
+    module = importlib.import_module(f"env_stocktrading_{variant}")
+    llm_features = 2 if "risk" in variant else 1
+    return module.StockTradingEnv(
+        df=df,
+        stock_dim=N_TICKERS,
+        hmax=HMAX,
+        initial_amount=initial_amount,
+        num_stock_shares=[0] * N_TICKERS,
+        buy_cost_pct=[COST_PCT] * N_TICKERS,
+        sell_cost_pct=[COST_PCT] * N_TICKERS,
+        reward_scaling=REWARD_SCALING,
+        state_space=1 + (2 + len(INDICATORS) + llm_features) * N_TICKERS,
+        action_space=N_TICKERS,
+        tech_indicator_list=INDICATORS,
+        turbulence_threshold=turbulence_threshold,
+        engine=engine,
+    )
+
+
+def test_every_preset_has_a_baseline():
+    assert set(SHAPING_PRESETS) == set(BASELINE_FACTORS)
+
+
+ENGINES = ["numpy"] + (["numba"] if NUMBA_AVAILABLE else [])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "initial_amount, turbulence_threshold",
+    [(1_000_000, None), (20_000, None), (1_000_000, 50.0)],
+    ids=["cash", "cash-bound", "turbulence"],
+)
+@pytest.mark.parametrize("variant", sorted(BASELINE_FACTORS))
+def test_variant_matches_mask_based_env(variant, initial_amount, turbulence_threshold, engine):
+    df = market_frame()
+    llm_cols = ["llm_sentiment", "llm_risk"] if "risk" in variant else ["llm_sentiment"]
+    baseline = BaselineVariant(
+        df, BASELINE_FACTORS[variant], llm_cols, initial_amount, turbulence_threshold
+    )
+    env = variant_env(variant, df, initial_amount, turbulence_threshold, engine)
+    obs, _ = env.reset()
+    np.testing.assert_array_equal(obs, np.array(baseline.state, dtype=np.float64))
+
+    rng = np.random.default_rng(1)
+    for day in range(N_DAYS):
+        actions = rng.uniform(-1, 1, N_TICKERS).astype(np.float32)
+        actions[rng.random(N_TICKERS) < 0.2] = 0
+        state, reward, terminal = baseline.step(actions.copy())
+        obs, env_reward, env_terminal, _, _ = env.step(actions.copy())
+
+        assert env_terminal == terminal
+        np.testing.assert_array_equal(obs, np.array(state, dtype=np.float64))
+        if terminal:
+            assert day == N_DAYS - 1
+            break
+        np.testing.assert_array_equal(env.actions_memory[-1], baseline.executed)
+        assert env_reward == reward
+        assert env.cost == baseline.cost
+        assert env.trades == baseline.trades
@@ -1,633 +1,17 @@
 #!/usr/bin/env python
 # coding: utf-8
-#run with the command: OMPI_ALLOW_RUN_AS_ROOT=1 OMPI_ALLOW_RUN_AS_ROOT_CONFIRM=1 mpirun -np 4 python3 train_cppo.py
+#run with the command: OMPI_ALLOW_RUN_AS_ROOT=1 OMPI_ALLOW_RUN_AS_ROOT_CONFIRM=1 mpirun -np 4 python3 train_cppo_llm_risk_01.py
+#
+# CPPO-DeepSeek with a weaker LLM influence: risk weights 0.999 to 1.001.
+# The run is configs/cppo_llm_risk_01.json, trained by the finrl_deepseek package
+# (the same as python -m finrl_deepseek configs/cppo_llm_risk_01.json);
+# the flags (--hid, --l, --seed, --exp_name, ...) override its entries.
 
+import os
 
-from datasets import load_dataset
-import pandas as pd
-#from finrl.agents.stablebaselines3.models import DRLAgent
-from finrl.config import INDICATORS, TRAINED_MODEL_DIR, RESULTS_DIR
-from finrl.main import check_and_make_directories
-from env_stocktrading_llm_risk_01 import StockTradingEnv
+from finrl_deepseek.cli import script_main
 
-check_and_make_directories([TRAINED_MODEL_DIR])
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs", "cppo_llm_risk_01.json")
 
-
-import numpy as np
-import scipy.signal
-from gymnasium.spaces import Box, Discrete
-
-import torch
-import torch.nn as nn
-from torch.distributions.normal import Normal
-from torch.distributions.categorical import Categorical
-
-###############
-
-import numpy as np
-import torch
-from torch.optim import Adam
-import gymnasium as gym
-import time
-import spinup.algos.pytorch.ppo.core as core
-from spinup.utils.logx import EpochLogger
-from spinup.utils.mpi_pytorch import setup_pytorch_for_mpi, sync_params, mpi_avg_grads
-from spinup.utils.mpi_tools import mpi_fork, mpi_avg, proc_id, mpi_statistics_scalar, num_procs
-
-
-# from Huggging Face :
-dataset = load_dataset("benstaf/nasdaq_2013_2023", data_files="train_data_deepseek_risk_2013_2018.csv")
-
-# Convert to pandas DataFrame
-train = pd.DataFrame(dataset['train'])
-
-#train = pd.read_csv('train_data_qwen_risk.csv')
-
-train = train.drop('Unnamed: 0',axis=1)
-
-# Create a new index based on unique dates
-unique_dates = train['date'].unique()
-date_to_idx = {date: idx for idx, date in enumerate(unique_dates)}
-
-# Create new index based on the date mapping
-train['new_idx'] = train['date'].map(date_to_idx)
-
-# Set this as the index
-train = train.set_index('new_idx')
-
-
-#missing values with 0
-train['llm_sentiment'].fillna(0, inplace=True) #0 is outside scope of sentiment scores (min is 1)
-
-train['llm_risk'].fillna(3, inplace=True) #neutral risk score is 3
-
-
-
-#### end data loading and preparation
-
-
-
-
-stock_dimension = len(train.tic.unique())
-state_space = 1 + 2*stock_dimension + (2+len(INDICATORS))*stock_dimension  #add dimensions for LLM sentiment and risk
-print(f"Stock Dimension: {stock_dimension}, State Space: {state_space}")
-
-
-# In[16]:
-
-
-buy_cost_list = sell_cost_list = [0.001] * stock_dimension
-num_stock_shares = [0] * stock_dimension
-
-env_kwargs = {
-    "hmax": 100,
-    "initial_amount": 1000000,
-    "num_stock_shares": num_stock_shares,
-    "buy_cost_pct": buy_cost_list,
-    "sell_cost_pct": sell_cost_list,
-    "state_space": state_space,
-    "stock_dim": stock_dimension,
-    "tech_indicator_list": INDICATORS,
-    "action_space": stock_dimension,
-    "reward_scaling": 1e-4
-}
-
-
-e_train_gym = StockTradingEnv(df = train, **env_kwargs)
-
-
-# ## Environment for training
-
-# In[17]:
-
-
-env_train, _ = e_train_gym.get_sb_env()
-#print(type(env_train))
-
-#Custom CPPO agent
-
-
-def combined_shape(length, shape=None):
-    if shape is None:
-        return (length,)
-    return (length, shape) if np.isscalar(shape) else (length, *shape)
-
-
-def mlp(sizes, activation, output_activation=nn.Identity):
-    layers = []
-    for j in range(len(sizes)-1):
-        act = activation if j < len(sizes)-2 else output_activation
-        layers += [nn.Linear(sizes[j], sizes[j+1]), act()]
-    return nn.Sequential(*layers)
-
-
-def count_vars(module):
-    return sum([np.prod(p.shape) for p in module.parameters()])
-
-
-def discount_cumsum(x, discount):
-    """
-    magic from rllab for computing discounted cumulative sums of vectors.
-
-    input:
-        vector x,
-        [x0,
-         x1,
-         x2]
-
-    output:
-        [x0 + discount * x1 + discount^2 * x2,
-         x1 + discount * x2,
-         x2]
-    """
-    return scipy.signal.lfilter([1], [1, float(-discount)], x[::-1], axis=0)[::-1]
-
-
-class Actor(nn.Module):
-
-    def _distribution(self, obs):
-        raise NotImplementedError
-
-    def _log_prob_from_distribution(self, pi, act):
-        raise NotImplementedError
-
-    def forward(self, obs, act=None):
-        # Produce action distributions for given observations, and
-        # optionally compute the log likelihood of given actions under
-        # those distributions.
-        pi = self._distribution(obs)
-        logp_a = None
-        if act is not None:
-            logp_a = self._log_prob_from_distribution(pi, act)
-        return pi, logp_a
-
-
-class MLPCategoricalActor(Actor):
-
-    def __init__(self, obs_dim, act_dim, hidden_sizes, activation):
-        super().__init__()
-        self.logits_net = mlp([obs_dim] + list(hidden_sizes) + [act_dim], activation)
-
-    def _distribution(self, obs):
-        logits = self.logits_net(obs)
-        return Categorical(logits=logits)
-
-    def _log_prob_from_distribution(self, pi, act):
-        return pi.log_prob(act)
-
-
-class MLPGaussianActor(Actor):
-
-    def __init__(self, obs_dim, act_dim, hidden_sizes, activation):
-        super().__init__()
-        log_std = -0.5 * np.ones(act_dim, dtype=np.float32)
-        self.log_std = torch.nn.Parameter(torch.as_tensor(log_std))
-        self.mu_net = mlp([obs_dim] + list(hidden_sizes) + [act_dim], activation)
-
-    def _distribution(self, obs):
-        mu = self.mu_net(obs)
-        std = torch.exp(self.log_std)
-        return Normal(mu, std)
-
-    def _log_prob_from_distribution(self, pi, act):
-        return pi.log_prob(act).sum(axis=-1)    # Last axis sum needed for Torch Normal distribution
-
-
-class MLPCritic(nn.Module):
-
-    def __init__(self, obs_dim, hidden_sizes, activation):
-        super().__init__()
-        self.v_net = mlp([obs_dim] + list(hidden_sizes) + [1], activation)
-
-    def forward(self, obs):
-        return torch.squeeze(self.v_net(obs), -1) # Critical to ensure v has right shape.
-
-
-
-class MLPActorCritic(nn.Module):
-    def __init__(self, observation_space, action_space,
-                 hidden_sizes=(64, 64), activation=nn.Tanh):
-        super().__init__()
-
-        obs_dim = observation_space.shape[0]
-
-        # policy builder depends on action space
-        if isinstance(action_space, Box):
-            self.pi = MLPGaussianActor(obs_dim, action_space.shape[0], hidden_sizes, activation)
-        elif isinstance(action_space, Discrete):
-            self.pi = MLPCategoricalActor(obs_dim, action_space.n, hidden_sizes, activation)
-
-        # build value function
-        self.v = MLPCritic(obs_dim, hidden_sizes, activation)
-
-    def step(self, obs):
-        with torch.no_grad():
-            pi = self.pi._distribution(obs)
-            a = pi.sample()
-            logp_a = self.pi._log_prob_from_distribution(pi, a)
-            v = self.v(obs)
-        return a.numpy(), v.numpy(), logp_a.numpy()
-
-    def act(self, obs):
-        return self.step(obs)[0]
-
-
-###############################
-
-
-class CPPOBuffer:
-    """
-    A buffer for storing trajectories experienced by a PPO agent interacting
-    with the environment, and using Generalized Advantage Estimation (GAE-Lambda)
-    for calculating the advantages of state-action pairs.
-    """
-
-    def __init__(self, obs_dim, act_dim, size, gamma=0.99, lam=0.95):
-        self.obs_buf = np.zeros(core.combined_shape(size, obs_dim), dtype=np.float32)
-        self.act_buf = np.zeros(core.combined_shape(size, act_dim), dtype=np.float32)
-        self.adv_buf = np.zeros(size, dtype=np.float32)
-        self.rew_buf = np.zeros(size, dtype=np.float32)
-        self.ret_buf = np.zeros(size, dtype=np.float32)
-        self.val_buf = np.zeros(size, dtype=np.float32)
-        self.valupdate_buf = np.zeros(size, dtype=np.float32)
-        self.logp_buf = np.zeros(size, dtype=np.float32)
-        self.gamma, self.lam = gamma, lam
-        self.ptr, self.path_start_idx, self.max_size = 0, 0, size
-
-    def store(self, obs, act, rew, val, valupdate, logp):
-        """
-        Append one timestep of agent-environment interaction to the buffer.
-        """
-        assert self.ptr < self.max_size     # buffer has to have room so you can store
-        self.obs_buf[self.ptr] = obs
-        self.act_buf[self.ptr] = act
-        self.rew_buf[self.ptr] = rew.item()
-        self.val_buf[self.ptr] = val.item()
-        self.valupdate_buf[self.ptr] = valupdate.item()
-        self.logp_buf[self.ptr] = logp.item()
-        self.ptr += 1
-
-    def finish_path(self, last_val=0):
-        """
-        Call this at the end of a trajectory, or when one gets cut off
-        by an epoch ending. This looks back in the buffer to where the
-        trajectory started, and uses rewards and value estimates from
-        the whole trajectory to compute advantage estimates with GAE-Lambda,
-        as well as compute the rewards-to-go for each state, to use as
-        the targets for the value function.
-
-        The "last_val" argument should be 0 if the trajectory ended
-        because the agent reached a terminal state (died), and otherwise
-        should be V(s_T), the value function estimated for the last state.
-        This allows us to bootstrap the reward-to-go calculation to account
-        for timesteps beyond the arbitrary episode horizon (or epoch cutoff).
-        """
-
-        path_slice = slice(self.path_start_idx, self.ptr)
-        rews = np.append(self.rew_buf[path_slice], last_val)
-        vals = np.append(self.val_buf[path_slice], last_val)
-
-        # the next two lines implement GAE-Lambda advantage calculation
-        deltas = rews[:-1] + self.gamma * vals[1:] - vals[:-1]
-        self.adv_buf[path_slice] = core.discount_cumsum(deltas, self.gamma * self.lam)
-
-        self.adv_buf = self.adv_buf - self.valupdate_buf
-
-        # the next line computes rewards-to-go, to be targets for the value function
-        self.ret_buf[path_slice] = core.discount_cumsum(rews, self.gamma)[:-1]
-
-        self.path_start_idx = self.ptr
-
-    def get(self):
-        """
-        Call this at the end of an epoch to get all of the data from
-        the buffer, with advantages appropriately normalized (shifted to have
-        mean zero and std one). Also, resets some pointers in the buffer.
-        """
-        assert self.ptr == self.max_size    # buffer has to be full before you can get
-        self.ptr, self.path_start_idx = 0, 0
-        # the next two lines implement the advantage normalization trick
-        adv_mean, adv_std = mpi_statistics_scalar(self.adv_buf)
-        self.adv_buf = (self.adv_buf - adv_mean) / adv_std
-        data = dict(obs=self.obs_buf, act=self.act_buf, ret=self.ret_buf,
-                    adv=self.adv_buf, logp=self.logp_buf)
-        return {k: torch.as_tensor(v, dtype=torch.float32) for k,v in data.items()}
-
-
-def cppo(env_fn,
-         actor_critic=core.MLPActorCritic,
-         ac_kwargs=dict(hidden_sizes=[256, 128], activation=torch.nn.ReLU),
-         seed=42,
-         steps_per_epoch=20000,  # Larger batch size to handle market variability
-         epochs=100,  # More epochs for better convergence
-         gamma=0.995,  # Higher discount factor for long-term trends
-         clip_ratio=0.7,  # Lower clip ratio for smoother updates
-         pi_lr=3e-5,  # Slower learning for the policy
-         vf_lr=1e-4,  # Slower learning for the value function
-         train_pi_iters=100,  # Increased policy update iterations
-         train_v_iters=100,  # Increased value function update iterations
-         lam=0.95,  # GAE smoothing factor for advantage estimation
-         max_ep_len=3000,  # Extended maximum episode length for longer trading horizons
-         target_kl=0.35,  # Slightly relaxed KL divergence target
-         logger_kwargs=dict(),
-         save_freq=10,
-         alpha=0.85,  # Adjusted risk sensitivity
-         beta=3000.0,  # Adjusted beta for risk constraints
-         nu_lr=5e-4,  # Learning rate for Lagrange multiplier (slightly slower)
-         lam_lr=5e-4,  # Learning rate for CVaR Lagrange multiplier
-         nu_start=0.1,  # Starting value for nu
-         lam_start=0.01,  # Starting value for lambda
-         nu_delay=0.75,  # Delayed nu updates for better stability
-         lam_low_bound=0.001,  # Lower bound for lambda
-         delay=1.0,  # Update delay for constraints
-         cvar_clip_ratio=0.05):  # CVaR clipping ratio
-
-
-
-    # Special function to avoid certain slowdowns from PyTorch + MPI combo.
-    setup_pytorch_for_mpi()
-
-    # Set up logger and save configuration
-    logger = EpochLogger(**logger_kwargs)
-    logger.save_config(locals())
-
-    # Random seed
-    seed += 10000 * proc_id()
-    torch.manual_seed(seed)
-    np.random.seed(seed)
-
-    # Instantiate environment
-    env = env_fn()
-    obs_dim = env.observation_space.shape
-    act_dim = env.action_space.shape
-
-    # Create actor-critic module
-    ac = actor_critic(env.observation_space, env.action_space, **ac_kwargs)
-
-    # Sync params across processes
-    sync_params(ac)
-
-    # Count variables
-    var_counts = tuple(core.count_vars(module) for module in [ac.pi, ac.v])
-    logger.log('\nNumber of parameters: \t pi: %d, \t v: %d\n'%var_counts)
-
-    # Set up experience buffer
-    local_steps_per_epoch = int(steps_per_epoch / num_procs())
-    buf = CPPOBuffer(obs_dim, act_dim, local_steps_per_epoch, gamma, lam)
-
-    # parameter of cvar
-    nu = nu_start
-    cvarlam = lam_start
-
-    # Set up function for computing PPO policy loss
-    def compute_loss_pi(data):
-        obs, act, adv, logp_old = data['obs'], data['act'], data['adv'], data['logp']
-
-        # Policy loss
-        pi, logp = ac.pi(obs, act)
-        ratio = torch.exp(logp - logp_old)
-        clip_adv = torch.clamp(ratio, 1-clip_ratio, 1+clip_ratio) * adv
-        loss_pi = -(torch.min(ratio * adv, clip_adv)).mean()
-
-        # Useful extra info
-        approx_kl = (logp_old - logp).mean().item()
-        ent = pi.entropy().mean().item()
-        clipped = ratio.gt(1+clip_ratio) | ratio.lt(1-clip_ratio)
-        clipfrac = torch.as_tensor(clipped, dtype=torch.float32).mean().item()
-        pi_info = dict(kl=approx_kl, ent=ent, cf=clipfrac)
-
-        return loss_pi, pi_info
-
-    # Set up function for computing value loss
-    def compute_loss_v(data):
-        obs, ret = data['obs'], data['ret']
-        return ((ac.v(obs) - ret)**2).mean()
-
-    # Set up optimizers for policy and value function
-    pi_optimizer = Adam(ac.pi.parameters(), lr=pi_lr)
-    vf_optimizer = Adam(ac.v.parameters(), lr=vf_lr)
-
-    # Set up model saving
-    logger.setup_pytorch_saver(ac)
-
-    def update():
-        data = buf.get()
-
-        pi_l_old, pi_info_old = compute_loss_pi(data)
-        pi_l_old = pi_l_old.item()
-        v_l_old = compute_loss_v(data).item()
-
-        # Train policy with multiple steps of gradient descent
-        for i in range(train_pi_iters):
-            pi_optimizer.zero_grad()
-            loss_pi, pi_info = compute_loss_pi(data)
-            kl = mpi_avg(pi_info['kl'])
-            if kl > 1.5 * target_kl:
-                logger.log('Early stopping at step %d due to reaching max kl.'%i)
-                break
-            loss_pi.backward()
-            mpi_avg_grads(ac.pi)    # average grads across MPI processes
-            pi_optimizer.step()
-
-        logger.store(StopIter=i)
-
-        # Value function learning
-        for i in range(train_v_iters):
-            vf_optimizer.zero_grad()
-            loss_v = compute_loss_v(data)
-            loss_v.backward()
-            mpi_avg_grads(ac.v)    # average grads across MPI processes
-            vf_optimizer.step()
-
-        # Log changes from update
-        kl, ent, cf = pi_info['kl'], pi_info_old['ent'], pi_info['cf']
-        logger.store(LossPi=pi_l_old, LossV=v_l_old,
-                     KL=kl, Entropy=ent, ClipFrac=cf,
-                     DeltaLossPi=(loss_pi.item() - pi_l_old),
-                     DeltaLossV=(loss_v.item() - v_l_old))
-
-    # Prepare for interaction with environment
-    start_time = time.time()
-    o, ep_ret, ep_len = env.reset(), 0, 0
-
-    # Main loop: collect experience in env and update/log each epoch
-    for epoch in range(epochs):
-        trajectory_num = 0
-        bad_trajectory_num = 0
-        # nu = nu + nu_lr * cvarlam
-        cvarlam = cvarlam + lam_lr * (beta - nu)
-        lam_delta = 0
-        nu_delta = 0
-        update_num = 0
-
-        for t in range(local_steps_per_epoch):
-            a, v, logp = ac.step(torch.as_tensor(o, dtype=torch.float32))
-
-            next_o, r, d, _ = env.step(a)
-            ep_ret += r
-            ep_len += 1
-
-    #        llm_risks = next_o[stock_dimension:]     #extract llm risks scores
-#            print("next_o State shape:", next_o.shape)
- #           print("next_o State contents:", next_o)
-
-            llm_risks = np.array(next_o[0,-stock_dimension:])
-
-  #          print("our stock dimension is " + str(stock_dimension))
-   #         print("llm risks length is: " + str(llm_risks.shape))
-    #        print("llm risks scores are  : " + str(llm_risks))
-             
-            # Define the mapping of LLM risk scores to weights
-            risk_to_weight = {1: 0.999, 2: 0.9995, 3: 1.0, 4: 1.0005, 5: 1.001}
-
-            # Apply the mapping to generate llm_risks_weights
-            llm_risks_weights = np.vectorize(risk_to_weight.get)(llm_risks)
-#            llm_risks_weights = llm_risks_weights.flatten() 
-
-     #       print("llm risks weights are  : " + str(llm_risks_weights))
-
-
-
-            #extract individual weights of each stock in the portfolio 
-            prices = np.array(next_o[0,1:stock_dimension+1])
-            shares = np.array(next_o[0,stock_dimension+1:stock_dimension*2+1])
- 
-      #      print("prices length is: " + str(prices.shape))
-
-   
-            # Calculate position values
-            stock_values = prices * shares
-            total_value = np.sum(stock_values)
-            if total_value==0:
-                  llm_risk_factor=1
-            #      print("total_value is problematic: " +str(total_value))
-             #     print("stock values is " + str(stock_values))
-            # Renormalize the stock values so that their sum is 1
-            else: 
-                stock_weights = stock_values / total_value
-                llm_risk_factor= np.dot(stock_weights,llm_risks_weights)
-
-            adjusted_D_pi = llm_risk_factor*(ep_ret + v - r) #that's where llm risk scores are taken into account 
-            # the num of trajectories
-            trajectory_num += 1
-            nu_delta += adjusted_D_pi
-            updates = np.float32(0.0)
-            if adjusted_D_pi < nu:
-                bad_trajectory_num += 1
-                lam_delta += adjusted_D_pi
-                updates = delay * cvarlam / (1 - alpha) * (nu - adjusted_D_pi)
-                if updates > abs(v) * cvar_clip_ratio:
-                    # print("update: ", updates)
-                    updates = abs(v) * cvar_clip_ratio
-                    update_num += 1
-                    # print("v", v)
-                updates = np.float32(updates)
-
-            # save and log
-            # print("updates: ", updates)
-            buf.store(o, a, r, v, updates, logp)
-            # buf.store(o, a, r, v, logp)
-            logger.store(VVals=v)
-
-            # Update obs (critical!)
-            o = next_o
-
-            timeout = ep_len == max_ep_len
-            terminal = d or timeout
-            epoch_ended = t==local_steps_per_epoch-1
-
-            if terminal or epoch_ended:
-                if epoch_ended and not(terminal):
-                    print('Warning: trajectory cut off by epoch at %d steps.'%ep_len, flush=True)
-                # if trajectory didn't reach terminal state, bootstrap value target
-                if timeout or epoch_ended:
-                    _, v, _ = ac.step(torch.as_tensor(o, dtype=torch.float32))
-                else:
-                    v = 0
-                buf.finish_path(v)
-                if terminal:
-                    # only save EpRet / EpLen if trajectory finished
-                    logger.store(EpRet=ep_ret, EpLen=ep_len)
-                o, ep_ret, ep_len = env.reset(), 0, 0
-
-        if bad_trajectory_num > 0:
-            lam_delta = lam_delta / bad_trajectory_num
-        if trajectory_num > 0:
-            nu_delta = nu_delta / trajectory_num
-        nu = nu_delta * nu_delay
-
-
-
-        # Save model
-        if (epoch % save_freq == 0) or (epoch == epochs-1):
-            logger.save_state({'env': env}, None)
-
-        # Perform PPO update!
-        update()
-
-        # Log info about epoch
-        logger.log_tabular('Epoch', epoch)
-        logger.log_tabular('EpRet', with_min_and_max=True)
-        logger.log_tabular('EpLen', average_only=True)
-        logger.log_tabular('VVals', with_min_and_max=True)
-        logger.log_tabular('TotalEnvInteracts', (epoch+1)*steps_per_epoch)
-        logger.log_tabular('LossPi', average_only=True)
-        logger.log_tabular('LossV', average_only=True)
-        logger.log_tabular('DeltaLossPi', average_only=True)
-        logger.log_tabular('DeltaLossV', average_only=True)
-        logger.log_tabular('Entropy', average_only=True)
-        logger.log_tabular('KL', average_only=True)
-        logger.log_tabular('ClipFrac', average_only=True)
-        logger.log_tabular('StopIter', average_only=True)
-        logger.log_tabular('Time', time.time()-start_time)
-        logger.dump_tabular()
-
-        print("-" * 37)
-        print("bad_trajectory_num:", bad_trajectory_num)
-        print("update num:", update_num)
-        print("nu:", nu)
-        print("lam:", cvarlam)
-        print("-" * 37, flush=True)
-    return ac
-
-
-#####################################################################
-
-
-
-import argparse
-parser = argparse.ArgumentParser()
-parser.add_argument('--env', type=str, default=env_train) #'HalfCheetah-v2')
-parser.add_argument('--hid', type=int, default=512)
-parser.add_argument('--l', type=int, default=2)
-parser.add_argument('--seed', '-s', type=int, default=0)
-parser.add_argument('--cpu', type=int, default=4)
-parser.add_argument('--exp_name', type=str, default='cppo')
-
-
-parser.add_argument('-f', '--file', type=str, help='Kernel connection file')  # Add this line
-parser.add_argument('extra_args', nargs=argparse.REMAINDER)  # Catch-all for unrecognized arguments
-
-
-args = parser.parse_args()
-
-#    mpi_fork(args.cpu)  # run parallel code with mpi
-
-from spinup.utils.run_utils import setup_logger_kwargs
-logger_kwargs = setup_logger_kwargs(args.exp_name, args.seed)
-
-trained_cppo=cppo(lambda : args.env, actor_critic=MLPActorCritic,
-        ac_kwargs=dict(hidden_sizes=[args.hid]*args.l), 
-        seed=args.seed, logger_kwargs=logger_kwargs)
-
-
-# Save the model
-model_path = TRAINED_MODEL_DIR + "/agent_cppo_deepseek_100_epochs_20k_01.pth"
-torch.save(trained_cppo.state_dict(), model_path)
-print("Training finished and saved in " + model_path)
-
-# Trained agents should have already been saved in the "trained_models" drectory after you run the code blocks above.
-# 
-# For Colab users, the zip files should be at "./trained_models" or "/content/trained_models".
-# 
-# For users running on your local environment, the zip files should be at "./trained_models".
+if __name__ == "__main__":
+    script_main(CONFIG)
@@ -226,3 +226,8 @@ trade = data_split(processed_full, TRADE_START_DATE,TRADE_END_DATE)
 
 train.to_csv('train_data_2013_2018.csv')
 trade.to_csv('trade_data_2019_2023.csv')
+
+# columnar copies, read memory-mapped by the training scripts (see dataset_cache.py)
+from dataset_cache import export_dataset
+export_dataset(train, 'train_data_2013_2018.arrow')
+export_dataset(trade, 'trade_data_2019_2023.arrow')
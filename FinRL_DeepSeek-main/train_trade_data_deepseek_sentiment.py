@@ -199,59 +199,21 @@ trade = data_split(processed_full, TRADE_START_DATE,TRADE_END_DATE)
 
 
 
-# Step 1: Create a copy of sentiment_small to avoid warnings
-def add_sentiment(train, sentiment, column_name='sentiment_deepseek'):
-    sentiment_small = sentiment
-    train_new = train
-    train_new['date'] = pd.to_datetime(train_new['date'])
-
-    # Step 2: Convert 'Date' to datetime without timezone
-    sentiment_small['Date'] = pd.to_datetime(sentiment_small['Date']).dt.tz_localize(None)
-
-    # Step 3: Rename 'Stock_symbol' to 'tic' and the sentiment column
-    sentiment_small.rename(
-        columns={'Stock_symbol': 'tic', column_name: 'llm_sentiment'},
-        inplace=True
-    )
-
-    # Step 4: Merge train and sentiment_small into a new DataFrame
-    train_new = train.merge(
-        sentiment_small[['Date', 'tic', 'llm_sentiment']],
-        left_on=['date', 'tic'],
-        right_on=['Date', 'tic'],
-        how='left'
-    )
-
-    # Step 5: Drop the additional 'Date' column
-    train_new.drop(columns=['Date'], inplace=True)
-    return train_new
-
-
-def add_risk(train, risk, column_name='risk_deepseek'):
-    train_new = train
-    risk_new=risk
-    train_new['date'] = pd.to_datetime(train_new['date'])
-
-    # Step 2: Convert 'Date' to datetime without timezone
-    risk_new['Date'] = pd.to_datetime(risk_new['Date']).dt.tz_localize(None)
-
-    # Step 3: Rename 'Stock_symbol' to 'tic' and the sentiment column
-    risk_new.rename(
-        columns={'Stock_symbol': 'tic', column_name: 'llm_risk'},
-        inplace=True
-    )
-
-    # Step 4: Merge train and sentiment_small into a new DataFrame
-    train_new = train.merge(
-        risk_new[['Date', 'tic', 'llm_risk']],
-        left_on=['date', 'tic'],
-        right_on=['Date', 'tic'],
-        how='left'
-    )
-
-    # Step 5: Drop the additional 'Date' column
-    train_new.drop(columns=['Date'], inplace=True)
-    return train_new
+# One score per ticker and trading day: the articles of a day are reduced
+# (mean by default, see news_aggregation.py for maxabs, recency and count),
+# news after the close, on weekends or holidays counts for the next session,
+# and every market row stays a single row.
+from news_aggregation import add_daily_scores
+
+calendar = processed_full['date']
+
+
+def add_sentiment(train, sentiment, column_name='sentiment_deepseek', reducer='mean'):
+    return add_daily_scores(train, sentiment, column_name, 'llm_sentiment', reducer, calendar)
+
+
+def add_risk(train, risk, column_name='risk_deepseek', reducer='mean'):
+    return add_daily_scores(train, risk, column_name, 'llm_risk', reducer, calendar)
 
 
 
@@ -267,3 +229,8 @@ trade_sentiment=add_sentiment(trade,sentiment)
 
 train_sentiment.to_csv('train_data_deepseek_sentiment_2013_2018.csv')
 trade_sentiment.to_csv('trade_data_deepseek_sentiment_2019_2023.csv')
+
+# columnar copies, read memory-mapped by the training scripts (see dataset_cache.py)
+from dataset_cache import export_dataset
+export_dataset(train_sentiment, 'train_data_deepseek_sentiment_2013_2018.arrow')
+export_dataset(trade_sentiment, 'trade_data_deepseek_sentiment_2019_2023.arrow')